@@ -34,6 +34,7 @@ import sys
 import threading
 import time
 import uuid
+from contextlib import closing
 from ctypes import wintypes
 from pathlib import Path
 from typing import Any, Dict, Generator, List, Optional
@@ -60,10 +61,9 @@ import requests
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.status import HTTP_401_UNAUTHORIZED
-from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from core.appdb.engine import DB_PATH as DB_FILE, dispose_engine, get_engine, get_session
+from core.appdb.engine import DB_PATH as DB_FILE, WRITE_GATE, dispose_engine, get_engine, get_session
 
 from core.services.capabilities import registry
 from core.services.capabilities.registry import MANIFEST_PATH
@@ -116,8 +116,8 @@ from core.config.paths import (
     IMPORTS_DIR,
     DB_URL,
 )
-from core.appdb.migrate import ensure_vendors_flags
-from core.appdb.models import Base
+from core.appdb.migrate import run_migrations
+from core.appdb.checkpoints import ensure_month_end_checkpoints
 from core.appdb.paths import ui_dir
 
 if os.name == "nt":  # pragma: no cover - windows specific
@@ -250,76 +250,17 @@ def root():
 UI_STATIC_DIR = UI_DIR
 
 
-def _ensure_schema_upgrades(db: Session) -> None:
-    def _col_exists(table: str, col: str) -> bool:
-        rows = db.execute(text(f"PRAGMA table_info('{table}')")).fetchall()
-        return any(r[1] == col for r in rows)  # r[1] = column name
-
-    def _ensure_column(table: str, column: str, ddl: str) -> None:
-        if not _col_exists(table, column):
-            db.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
-
-    # vendors: additive columns
-    if not _col_exists("vendors", "role"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN role TEXT DEFAULT 'vendor'"))
-    if not _col_exists("vendors", "kind"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN kind TEXT DEFAULT 'org'"))
-    if not _col_exists("vendors", "organization_id"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN organization_id INTEGER"))
-    if not _col_exists("vendors", "meta"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN meta TEXT"))
-
-    # items: additive column
-    _ensure_column("items", "item_type", "item_type TEXT DEFAULT 'product'")
-    _ensure_column("items", "location", "location TEXT")
-
-    # Backfill (idempotent)
-    db.execute(text("UPDATE vendors SET role='vendor' WHERE role IS NULL"))
-    db.execute(text("UPDATE vendors SET kind='org' WHERE kind IS NULL"))
-    db.execute(text("UPDATE vendors SET meta='{}' WHERE meta IS NULL OR trim(meta)=''"))
-    db.execute(text("UPDATE items SET item_type='product' WHERE item_type IS NULL OR trim(item_type)=''"))
-
-    # Helpful indexes (idempotent)
-    db.execute(text("CREATE INDEX IF NOT EXISTS vendors_role_idx ON vendors(role)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS vendors_kind_idx ON vendors(kind)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS vendors_org_idx  ON vendors(organization_id)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS items_item_type_idx ON items(item_type)"))
-
-    # ---- ensure vendors.name is NOT unique (unified Vendors/Contacts table) ----
-    # Drop any unique index on vendors(name), then create a non-unique index.
-    try:
-        idx_list = db.execute(text("PRAGMA index_list('vendors')")).fetchall()
-        for row in idx_list:
-            # PRAGMA index_list columns: seq, name, unique, origin, partial
-            idx_name = row[1]
-            is_unique = bool(row[2])
-            if not is_unique:
-                continue
-            cols = db.execute(text(f"PRAGMA index_info('{idx_name}')")).fetchall()
-            col_names = [c[2] for c in cols]  # seqno, cid, name
-            if len(col_names) == 1 and col_names[0] == "name":
-                db.execute(text(f'DROP INDEX IF EXISTS "{idx_name}"'))
-        # Ensure a non-unique index exists for performance
-        db.execute(text("CREATE INDEX IF NOT EXISTS ix_vendors_name ON vendors(name)"))
-    except Exception:
-        # As a fallback, try the common SQLAlchemy-generated name directly
-        db.execute(text("DROP INDEX IF EXISTS ix_vendors_name"))
-        db.execute(text("CREATE INDEX IF NOT EXISTS ix_vendors_name ON vendors(name)"))
-
-    db.commit()
-
-
 @app.on_event("startup")
 def startup_migrations():
-    engine = get_engine()
-    # Ensure all declared tables exist before running additive patches.
-    Base.metadata.create_all(bind=engine)
-    ensure_vendors_flags(engine)
+    report = run_migrations(get_engine())
+    log(f"[migrate] {report.summary()}")
     db = next(get_session())
     try:
-        _ensure_schema_upgrades(db)
+        if ensure_month_end_checkpoints(db):
+            db.commit()
     finally:
         db.close()
+    resume_manufacturing_jobs()
 
 
 def get_db(request: Request) -> Generator[Session, None, None]:
@@ -372,6 +313,12 @@ def ensure_core_initialized():
         build_app()
 
 
+@app.on_event("shutdown")
+def close_core() -> None:
+    if CORE is not None:
+        CORE.close()
+
+
 @app.get("/dev/paths")
 def dev_paths():
     from core.config import paths
@@ -747,6 +694,7 @@ protected.include_router(organizer_router)
 from core.api.routes.items import router as items_router
 from core.api.routes.vendors import router as vendors_router
 from core.api.routes.recipes import router as recipes_router
+from core.api.routes.manufacturing import resume_jobs as resume_manufacturing_jobs
 from core.api.routes.manufacturing import router as manufacturing_router
 from core.api.routes import logs_api
 from core.api.routes.ledger_api import public_router as ledger_public_router, router as ledger_router
@@ -942,7 +890,7 @@ def inventory_run(
     for iid in ids:
         deltas[iid] = outputs.get(iid, 0.0) - inputs.get(iid, 0.0)
 
-    with _db_conn() as con:
+    with closing(_db_conn()) as con:
         existing: set[int] = set()
         if ids:
             placeholders = ",".join("?" * len(ids))
@@ -961,17 +909,19 @@ def inventory_run(
             )
 
         cur = con.cursor()
-        try:
-            cur.execute("BEGIN")
-            for iid, delta in deltas.items():
-                cur.execute(
-                    "UPDATE items SET qty_stored = COALESCE(qty_stored, 0) + ? WHERE id = ?",
-                    (delta, iid),
-                )
-            con.commit()
-        except Exception:
-            con.rollback()
-            raise
+        # Queue behind ORM writers instead of racing them for the SQLite lock.
+        with WRITE_GATE.hold():
+            try:
+                cur.execute("BEGIN")
+                for iid, delta in deltas.items():
+                    cur.execute(
+                        "UPDATE items SET qty_stored = COALESCE(qty_stored, 0) + ? WHERE id = ?",
+                        (delta, iid),
+                    )
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
 
     snapshot_version = int(time.time())
     record = {
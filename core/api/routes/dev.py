@@ -6,7 +6,8 @@ from pydantic import BaseModel
 
 from core.api.security import writes_enabled
 from core.api.utils.devguard import require_dev
-from core.appdb.engine import debug_db_where
+from core.appdb import migrate
+from core.appdb.engine import db_stats, debug_db_where
 
 # Add require_dev dependency
 router = APIRouter(prefix="/dev", tags=["dev"], dependencies=[Depends(require_dev)])
@@ -30,3 +31,10 @@ def set_writes(_payload: WritesPayload, _request: Request):
 @router.get("/db/where")
 def dev_db_where():
     return debug_db_where()
+
+
+@router.get("/db/stats")
+def dev_db_stats():
+    """Write-queue wait times, connection pool usage and the startup migration report."""
+    report = migrate.LAST_REPORT
+    return {**db_stats(), "migrations": report.as_dict() if report else None}
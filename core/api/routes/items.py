@@ -1,15 +1,19 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # core/api/routes/items.py
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
-from sqlalchemy import asc, func
 from sqlalchemy.orm import Session
 
-from core.appdb.engine import get_session
+from core.appdb import queries
+from core.appdb.batch_archive import archived_batches_page
+from core.appdb.engine import get_read_session, get_session
+from core.appdb.listing import get_item_row, list_items_page
 from core.config.writes import require_writes
+from core.manufacturing import bom
 from core.policy.guard import require_owner_commit
-from core.appdb.models import Item, ItemBatch, Vendor
+from core.appdb.models import Item, ItemBatch, ItemBatchClosed, Vendor
+from core.appdb.stock_summary import drop_summary
 from core.metrics.metric import UNIT_MULTIPLIER, default_unit_for, from_base
 from tgc.security import require_token_ctx
 from tgc.state import AppState, get_state
@@ -49,37 +53,10 @@ def _cents_to_display(cents: int) -> str:
     return f"${cents / 100:,.2f}"
 
 
-def _fifo_unit_cost(db: Session, item_id: int, unit_label: str) -> Tuple[Optional[int], Optional[str]]:
-    batch = (
-        db.query(ItemBatch)
-        .filter(ItemBatch.item_id == item_id, ItemBatch.qty_remaining > 0)
-        .order_by(asc(ItemBatch.created_at), asc(ItemBatch.id))
-        .first()
-    )
-    if not batch:
-        return None, None
-
-    cents: Optional[int] = getattr(batch, "unit_cost_cents", None)
-    if cents is None:
-        unit_cost = getattr(batch, "unit_cost", None)
-        if unit_cost is not None:
-            try:
-                cents = int(round(float(unit_cost) * 100))
-            except Exception:
-                cents = None
+def _fifo_display(cents: Optional[int], unit_label: str) -> Optional[str]:
     if cents is None:
-        total_cost_cents = getattr(batch, "total_cost_cents", None)
-        qty_initial = getattr(batch, "qty_initial", None)
-        if total_cost_cents is not None and qty_initial:
-            try:
-                cents = int(total_cost_cents) // int(qty_initial)
-            except Exception:
-                cents = None
-    if cents is None:
-        return None, None
-
-    cents_int = int(cents)
-    return cents_int, f"{_cents_to_display(cents_int)} / {unit_label}"
+        return None
+    return f"{_cents_to_display(int(cents))} / {unit_label}"
 
 
 def _apply_qty_fields(it: Item, payload: Dict[str, Any], resp: Optional[Response] = None):
@@ -107,22 +84,6 @@ def _apply_qty_fields(it: Item, payload: Dict[str, Any], resp: Optional[Response
     if used_legacy and resp is not None:
         resp.headers["X-BUS-Deprecation"] = "qty/unit"
 
-def _items_with_onhand(db: Session):
-    onhand_sq = (
-        db.query(
-            ItemBatch.item_id.label("item_id"),
-            func.coalesce(func.sum(ItemBatch.qty_remaining), 0).label("on_hand"),
-        )
-        .filter(ItemBatch.qty_remaining > 0)
-        .group_by(ItemBatch.item_id)
-        .subquery()
-    )
-    return (
-        db.query(Item, func.coalesce(onhand_sq.c.on_hand, 0).label("on_hand"))
-        .outerjoin(onhand_sq, onhand_sq.c.item_id == Item.id)
-    )
-
-
 def _on_hand_fields(it: Item, on_hand: int) -> Dict[str, Any]:
     dimension = it.dimension if getattr(it, "dimension", None) in UNIT_MULTIPLIER else "count"
     unit = (getattr(it, "uom", None) or default_unit_for(dimension)).lower()
@@ -177,76 +138,94 @@ def _row(it: Item, vendor_name: Optional[str] = None, on_hand: Optional[int] = N
 
 @router.get("/items")
 def list_items(
-    db: Session = Depends(get_session),
+    response: Response,
+    item_type: Optional[str] = None,
+    location: Optional[str] = None,
+    vendor_id: Optional[int] = None,
+    low_stock: Optional[int] = Query(None, ge=0, description="Only items with on-hand <= this base quantity"),
+    sort: str = "id",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_session),
     _token: str = Depends(require_token_ctx),
     _state: AppState = Depends(get_state),
 ) -> List[Dict[str, Any]]:
-    items = _items_with_onhand(db).all()
-    vmap = {v.id: v.name for v in db.query(Vendor).all()}
+    try:
+        page = list_items_page(
+            db,
+            item_type=item_type,
+            location=location,
+            vendor_id=vendor_id,
+            low_stock=low_stock,
+            sort=sort,
+            order=order,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+
     rows: List[Dict[str, Any]] = []
-    for it, on_hand in items:
-        row = _row(it, vmap.get(it.vendor_id), on_hand)
+    for it, vendor_name, on_hand, fifo_cents in page.rows:
+        row = _row(it, vendor_name, on_hand)
         display_unit = row.get("stock_on_hand_display", {}).get("unit") or default_unit_for(
             getattr(it, "dimension", "count") or "count"
         )
-        fifo_cents, fifo_display = _fifo_unit_cost(db, it.id, display_unit)
         row["fifo_unit_cost_cents"] = fifo_cents
-        row["fifo_unit_cost_display"] = fifo_display
+        row["fifo_unit_cost_display"] = _fifo_display(fifo_cents, display_unit)
         rows.append(row)
     return rows
 
+def _batch_summary_row(b: Any, display_unit: str) -> Dict[str, Any]:
+    unit_cost_cents = getattr(b, "unit_cost_cents", None)
+    if unit_cost_cents is None:
+        unit_cost = getattr(b, "unit_cost", None)
+        if unit_cost is not None:
+            try:
+                unit_cost_cents = int(round(float(unit_cost) * 100))
+            except Exception:
+                unit_cost_cents = None
+    if unit_cost_cents is None:
+        unit_cost_cents = 0
+    return {
+        "entered": b.created_at.isoformat() if getattr(b, "created_at", None) else "",
+        "remaining_int": int(getattr(b, "qty_remaining", 0) or 0),
+        "original_int": int(getattr(b, "qty_initial", getattr(b, "qty_remaining", 0)) or 0),
+        "unit_cost_display": f"{_cents_to_display(int(unit_cost_cents))} / {display_unit}",
+    }
+
+
 @router.get("/items/{item_id}")
 def get_item(
     item_id: int,
-    db: Session = Depends(get_session),
+    archived_limit: Optional[int] = Query(None, ge=1, le=500),
+    archived_offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_session),
     _token: str = Depends(require_token_ctx),
     _state: AppState = Depends(get_state),
 ) -> Dict[str, Any]:
-    row = _items_with_onhand(db).filter(Item.id == item_id).first()
+    row = get_item_row(db, item_id)
     if not row:
         raise HTTPException(status_code=404, detail="item not found")
-    it, on_hand = row
-    vname = None
-    if it.vendor_id:
-        v = db.query(Vendor).get(it.vendor_id)
-        vname = v.name if v else None
+    it, vname, on_hand, fifo_cents = row
 
     base_row = _row(it, vname, on_hand)
     display_unit = base_row.get("stock_on_hand_display", {}).get("unit") or default_unit_for(
         getattr(it, "dimension", "count") or "count"
     )
-    fifo_cents, fifo_display = _fifo_unit_cost(db, it.id, display_unit)
     base_row["fifo_unit_cost_cents"] = fifo_cents
-    base_row["fifo_unit_cost_display"] = fifo_display
-
-    batches = (
-        db.query(ItemBatch)
-        .filter(ItemBatch.item_id == item_id)
-        .order_by(asc(ItemBatch.created_at), asc(ItemBatch.id))
-        .all()
-    )
-    summary: List[Dict[str, Any]] = []
-    for b in batches:
-        unit_cost_cents = getattr(b, "unit_cost_cents", None)
-        if unit_cost_cents is None:
-            unit_cost = getattr(b, "unit_cost", None)
-            if unit_cost is not None:
-                try:
-                    unit_cost_cents = int(round(float(unit_cost) * 100))
-                except Exception:
-                    unit_cost_cents = None
-        if unit_cost_cents is None:
-            unit_cost_cents = 0
-        summary.append(
-            {
-                "entered": b.created_at.isoformat() if getattr(b, "created_at", None) else "",
-                "remaining_int": int(getattr(b, "qty_remaining", 0) or 0),
-                "original_int": int(getattr(b, "qty_initial", getattr(b, "qty_remaining", 0)) or 0),
-                "unit_cost_display": f"{_cents_to_display(int(unit_cost_cents))} / {display_unit}",
-            }
-        )
-
-    base_row["batches_summary"] = summary
+    base_row["fifo_unit_cost_display"] = _fifo_display(fifo_cents, display_unit)
+
+    batches = db.execute(queries.ITEM_BATCHES, {"item_id": item_id}).scalars().all()
+    base_row["batches_summary"] = [_batch_summary_row(b, display_unit) for b in batches]
+    # Archived (depleted) layers are only read when the caller pages into them.
+    if archived_limit is not None:
+        archived, total = archived_batches_page(db, item_id, limit=archived_limit, offset=archived_offset)
+        base_row["archived_batches_summary"] = [_batch_summary_row(b, display_unit) for b in archived]
+        base_row["archived_batches_total"] = total
     return base_row
 
 @router.post("/items")
@@ -328,6 +307,9 @@ def create_item(
         db.add(it)
 
     db.commit()
+    if item_id:
+        # Compiled recipes copy item names and units.
+        bom.clear()
     db.refresh(it)
     vname = None
     if it.vendor_id:
@@ -393,6 +375,7 @@ def update_item(
     payload = {**payload, "uom": uom}
     _apply_qty_fields(it, payload, resp)
     db.commit()
+    bom.clear()
     db.refresh(it)
     vname = None
     if it.vendor_id:
@@ -417,6 +400,9 @@ def delete_item(
 
     # Remove dependent batches to avoid orphaned rows if SQLite reuses item ids after delete
     db.query(ItemBatch).filter(ItemBatch.item_id == item_id).delete(synchronize_session=False)
+    db.query(ItemBatchClosed).filter(ItemBatchClosed.item_id == item_id).delete(synchronize_session=False)
+    drop_summary(db, item_id)
     db.delete(it)
     db.commit()
+    bom.clear()
     return {"ok": True}
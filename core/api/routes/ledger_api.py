@@ -1,28 +1,50 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
+import io
 import json
 import logging
 import os
 import sqlite3
 import sys
+import tempfile
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from datetime import datetime
 from pathlib import Path
 from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import asc, func
+from sqlalchemy import asc
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from core.api.utils.devguard import require_dev
-from core.appdb.engine import get_session
+from core.appdb.batch_archive import archive_depleted_batches, archive_min_age_days, resolve_batches
+from core.appdb.checkpoints import parse_as_of, valuation_as_of, write_checkpoint
+from core.appdb.engine import (
+    SessionLocal,
+    get_engine,
+    get_read_engine,
+    get_read_session,
+    get_refresh_session,
+    get_session,
+    write_session,
+)
+from core.appdb.fifo_simulator import StockView
 from core.appdb.ledger import (
     InsufficientStock,
     add_batch,
     fifo_consume as sa_fifo_consume,
+    fifo_consume_many,
 )
-from core.appdb.models import Item, ItemBatch, ItemMovement
+from core.appdb.models import Item, ItemBatch, ItemBatchClosed, ItemMovement, ItemStockSummary
+from core.appdb.movement_export import MovementQuery, encode_pages, iter_movements, next_cursor, parse_since
+from core.appdb.purchase_import import import_purchases, iter_rows
+from core.appdb.stock_summary import ensure_summaries, rebuild_summary, record_layer_added, verify_summary
+from core.appdb.write_gate import begin_immediate, wait_limit
 from core.appdb.paths import resolve_db_path
+from core.ledger.health import audit_status, health_report, reconcile_incremental, start_full_audit
 from core.api.schemas_ledger import QtyDisplay, StockInReq, StockInResp
 from core.metrics.metric import (
     UNIT_MULTIPLIER,
@@ -62,22 +84,36 @@ def _append_inventory_journal(entry: dict) -> None:
         pass
 
 def _has_items_qty_stored() -> bool:
-    con = sqlite3.connect(DB_PATH); cur = con.cursor()
-    try:
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='items'")
-        if not cur.fetchone():
-            return False
-        cur.execute("PRAGMA table_info(items)")
-        cols = {r[1] for r in cur.fetchall()}
-        return "qty_stored" in cols
-    finally:
-        con.close()
+    # A pooled read-only connection; no table means no rows here.
+    with get_read_engine().connect() as conn:
+        cols = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(items)")}
+    return "qty_stored" in cols
 
 @router.get("/health")
-def health():
+def health(full: bool = False, db: Session = Depends(get_refresh_session)):
+    """Stored reconciliation report, refreshed for items moved since the last call.
+
+    ``full=true`` also starts a background audit of every item, as does any
+    call before the first audit has completed.
+    """
     if not _has_items_qty_stored():
         return {"desync": True, "problems": [{"reason": "items.qty_stored missing"}]}
-    return {"desync": False, "note": "Using items.qty_stored for on-hand checks"}
+    try:
+        # Take the gate before the mark is read, without queueing for it.
+        conn = db.connection()
+        with wait_limit(conn, 0):
+            begin_immediate(conn)
+            reconcile_incremental(db)
+            db.flush()
+        db.commit()
+    except OperationalError:
+        # Writer is busy; serve the last stored report rather than queue.
+        db.rollback()
+    report = health_report(db)
+    if full or report["last_full_audit_at"] is None:
+        start_full_audit(write_session)
+        report["audit"] = audit_status()
+    return report
 
 class PurchaseIn(BaseModel):
     item_id: int
@@ -155,6 +191,126 @@ def consume(body: ConsumeIn, db: Session = Depends(get_session)):
         raise HTTPException(status_code=400, detail={"shortages": e.shortages})
 
 
+class ConsumeLineIn(BaseModel):
+    item_id: int
+    qty: int = Field(gt=0)
+
+
+class ConsumeBatchIn(BaseModel):
+    lines: list[ConsumeLineIn] = Field(min_length=1, max_length=1000)
+    source_kind: str = "consume"
+    source_id: Optional[str] = None
+
+
+@router.post("/consume/batch")
+@public_router.post("/consume/batch")
+def consume_batch(body: ConsumeBatchIn, db: Session = Depends(get_session)):
+    """Consume many items in one transaction; all-or-nothing on shortages."""
+    try:
+        moves = fifo_consume_many(
+            db,
+            [(int(line.item_id), int(line.qty)) for line in body.lines],
+            body.source_kind,
+            body.source_id,
+        )
+        db.commit()
+    except InsufficientStock as e:
+        raise HTTPException(status_code=400, detail={"shortages": e.shortages})
+
+    totals: dict[int, int] = {}
+    for line in body.lines:
+        totals[int(line.item_id)] = totals.get(int(line.item_id), 0) + int(line.qty)
+    for item_id, qty in totals.items():
+        _append_inventory_journal(
+            {
+                "type": "consume",
+                "item_id": item_id,
+                "qty_change": -qty,
+                "source_kind": body.source_kind,
+                "source_id": body.source_id,
+            }
+        )
+    lines = [
+        {
+            "item_id": int(m.item_id),
+            "batch_id": int(m.batch_id),
+            "qty": -int(m.qty_change),
+            "unit_cost_cents": int(m.unit_cost_cents or 0),
+        }
+        for m in moves
+    ]
+    return {"ok": True, "lines": lines}
+
+
+class SimulateScenarioIn(BaseModel):
+    lines: list[ConsumeLineIn] = Field(min_length=1, max_length=1000)
+
+
+class SimulateIn(BaseModel):
+    scenarios: list[SimulateScenarioIn] = Field(min_length=1, max_length=100)
+    cumulative: bool = False
+
+
+@router.post("/simulate")
+@public_router.post("/simulate")
+def simulate(body: SimulateIn, db: Session = Depends(get_read_session)):
+    """What-if FIFO consumption; reads open layers once and writes nothing.
+
+    Scenarios are independent unless ``cumulative`` is set, in which case each
+    one is evaluated against the stock left by the previous successful ones.
+    """
+    item_ids = {int(line.item_id) for sc in body.scenarios for line in sc.lines}
+    view = StockView.load(db, item_ids)
+    results = [
+        view.simulate([(int(line.item_id), int(line.qty)) for line in sc.lines], apply=body.cumulative).as_dict()
+        for sc in body.scenarios
+    ]
+    return {"ok": all(r["ok"] for r in results), "scenarios": results}
+
+
+@router.post("/purchase/import")
+@public_router.post("/purchase/import")
+async def purchase_import(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    source_kind: str = "purchase",
+):
+    """Bulk purchase import from a raw CSV or NDJSON request body.
+
+    The body is spooled (to disk past a few MB) and imported in chunked
+    transactions on a worker thread; per-row errors come back in the result.
+    """
+    fmt = format
+    if fmt is None:
+        ctype = (request.headers.get("content-type") or "").lower()
+        fmt = "ndjson" if ("ndjson" in ctype or "jsonl" in ctype) else "csv"
+
+    spool = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    def _journal_chunk(count: int, first_batch_id: int, last_batch_id: int) -> None:
+        _append_inventory_journal(
+            {
+                "type": "purchase_import",
+                "source_kind": source_kind,
+                "rows": count,
+                "first_batch_id": first_batch_id,
+                "last_batch_id": last_batch_id,
+            }
+        )
+
+    def _run() -> dict:
+        stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        with stream, SessionLocal(bind=get_engine()) as db:
+            return import_purchases(
+                db, iter_rows(stream, fmt), source_kind=source_kind, on_chunk=_journal_chunk
+            ).as_dict()
+
+    return await run_in_threadpool(_run)
+
+
 # -------------------------
 # POST /app/ledger/adjust
 # -------------------------
@@ -244,38 +400,134 @@ def stock_out(body: StockOutIn, db: Session = Depends(get_session)):
 
 @router.get("/valuation")
 @public_router.get("/valuation")
-def valuation(item_id: Optional[int] = None, db: Session = Depends(get_session)):
+def valuation(item_id: Optional[int] = None, as_of: Optional[str] = None, db: Session = Depends(get_read_session)):
+    if as_of is not None:
+        try:
+            cutoff = parse_as_of(as_of)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid_as_of")
+        snap = valuation_as_of(db, cutoff, item_id)
+        meta = {
+            "as_of": cutoff.isoformat(),
+            "checkpoint_id": snap.checkpoint_id,
+            "replayed_movements": snap.replayed_movements,
+        }
+        if item_id is not None:
+            on_hand, total = snap.items.get(int(item_id), (0, 0))
+            return {"item_id": int(item_id), "on_hand": on_hand, "total_value_cents": total, **meta}
+        totals = [
+            {"item_id": i, "on_hand": q, "total_value_cents": v}
+            for i, (q, v) in sorted(snap.items.items())
+            if (q, v) != (0, 0)
+        ]
+        return {"totals": totals, **meta}
     if item_id is not None:
-        total = (
-            db.query(func.coalesce(func.sum(ItemBatch.qty_remaining * ItemBatch.unit_cost_cents), 0))
-            .filter(ItemBatch.item_id == int(item_id))
-            .scalar()
-        )
+        total = db.query(ItemStockSummary.total_value_cents).filter(ItemStockSummary.item_id == int(item_id)).scalar()
         return {"item_id": int(item_id), "total_value_cents": int(total or 0)}
-    rows = (
-        db.query(
-            ItemBatch.item_id.label("item_id"),
-            func.coalesce(func.sum(ItemBatch.qty_remaining * ItemBatch.unit_cost_cents), 0).label("total"),
+    rows = db.query(ItemStockSummary.item_id, ItemStockSummary.total_value_cents).all()
+    return {"totals": [{"item_id": r.item_id, "total_value_cents": int(r.total_value_cents or 0)} for r in rows]}
+
+
+class CheckpointIn(BaseModel):
+    as_of: Optional[str] = None
+
+
+@router.post("/checkpoints")
+def create_checkpoint(body: CheckpointIn = CheckpointIn(), db: Session = Depends(get_session)):
+    """Write a valuation checkpoint (default: now) for later as_of queries."""
+    try:
+        cutoff = parse_as_of(body.as_of) if body.as_of else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_as_of")
+    cp = write_checkpoint(db, cutoff)
+    db.commit()
+    return {"ok": True, "id": cp.id, "as_of": cp.as_of.isoformat(), "items": cp.item_count}
+
+
+@router.get("/summary/verify")
+def summary_verify(db: Session = Depends(get_read_session)):
+    require_dev()
+    problems = verify_summary(db)
+    return {"ok": not problems, "problems": problems}
+
+
+@router.post("/summary/rebuild")
+def summary_rebuild(db: Session = Depends(get_session)):
+    require_dev()
+    count = rebuild_summary(db)
+    db.commit()
+    return {"ok": True, "items": count}
+
+
+class ArchiveBatchesIn(BaseModel):
+    min_age_days: Optional[int] = Field(default=None, ge=0)
+
+
+@router.post("/batches/archive")
+def archive_batches(body: ArchiveBatchesIn = ArchiveBatchesIn(), db: Session = Depends(get_session)):
+    """Move depleted FIFO layers older than the configured age to item_batches_closed."""
+    days = archive_min_age_days() if body.min_age_days is None else int(body.min_age_days)
+    archived = archive_depleted_batches(db, days)
+    return {"ok": True, "archived": archived, "min_age_days": days}
+
+
+@router.get("/movements/export")
+@public_router.get("/movements/export")
+def movements_export(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    item_id: Optional[int] = None,
+    source_kind: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_session),
+):
+    """Stream movements oldest first (or newest first with ``order=desc``).
+
+    ``cursor`` is an exclusive movement id in the chosen direction; with
+    ``limit`` the next page's cursor comes back in ``X-Next-Cursor``.
+    """
+    try:
+        query = MovementQuery(
+            item_id=item_id,
+            source_kind=source_kind,
+            since=parse_since(since) if since else None,
+            until=parse_as_of(until) if until else None,
+            order=order,
+            cursor=cursor,
+            limit=limit,
         )
-        .group_by(ItemBatch.item_id)
-        .all()
-    )
-    return {"totals": [{"item_id": r.item_id, "total_value_cents": int(r.total or 0)} for r in rows]}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_date_range")
+
+    headers = {"Content-Disposition": f'attachment; filename="movements.{format}"'}
+    nxt = next_cursor(db, query)
+    if nxt is not None:
+        headers["X-Next-Cursor"] = str(nxt)
+    pages = iter_movements(lambda: SessionLocal(bind=get_read_engine()), query)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(encode_pages(pages, format), media_type=media_type, headers=headers)
 
 
 @router.get("/movements")
 @public_router.get("/movements")
-def movements(item_id: Optional[int] = None, limit: int = 100, db: Session = Depends(get_session)):
+def movements(item_id: Optional[int] = None, limit: int = 100, db: Session = Depends(get_read_session)):
     q = db.query(ItemMovement)
     if item_id is not None:
         q = q.filter(ItemMovement.item_id == int(item_id))
     rows = q.order_by(ItemMovement.id.desc()).limit(int(limit)).all()
+    batches = resolve_batches(db, (m.batch_id for m in rows))
 
     def to_dict(m: ItemMovement) -> dict:
+        batch = batches.get(m.batch_id) if m.batch_id is not None else None
         return {
             "id": int(m.id),
             "item_id": int(m.item_id),
             "batch_id": int(m.batch_id) if m.batch_id is not None else None,
+            # The layer has moved to item_batches_closed (see core.appdb.batch_archive).
+            "batch_archived": isinstance(batch, ItemBatchClosed),
             "qty_change": int(m.qty_change),
             "unit_cost_cents": int(m.unit_cost_cents or 0),
             "source_kind": m.source_kind,
@@ -437,6 +689,7 @@ def stock_in(payload: StockInReq, db: Session = Depends(get_session)):
         except Exception:
             raise HTTPException(status_code=400, detail="invalid_unit_cost")
 
+    ensure_summaries(db, [item.id])
     batch = ItemBatch(
         item_id=item.id,
         qty_initial=qty_int,
@@ -480,24 +733,11 @@ def stock_in(payload: StockInReq, db: Session = Depends(get_session)):
 
     if hasattr(item, "qty_stored"):
         item.qty_stored = int((getattr(item, "qty_stored", 0) or 0) + qty_int)
+    summary = record_layer_added(db, item.id, batch.id, qty_int, unit_cost_cents, movement.id)
 
-    on_hand = 0
-    oldest = None
+    on_hand = int(summary.on_hand or 0)
+    oldest = db.get(ItemBatch, summary.oldest_open_batch_id) if summary.oldest_open_batch_id else None
     try:
-        on_hand = (
-            db.query(func.coalesce(func.sum(ItemBatch.qty_remaining), 0))
-            .filter(ItemBatch.item_id == item.id, ItemBatch.qty_remaining > 0)
-            .scalar()
-            or 0
-        )
-
-        oldest = (
-            db.query(ItemBatch)
-            .filter(ItemBatch.item_id == item.id, ItemBatch.qty_remaining > 0)
-            .order_by(asc(ItemBatch.created_at), asc(ItemBatch.id))
-            .first()
-        )
-
         db.commit()
     except Exception:
         db.rollback()
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
-from core.appdb.engine import get_session
+from core.appdb.engine import get_read_session
 from core.appdb.models import Item, ItemMovement
 
 router = APIRouter(prefix="/app", tags=["logs"])
@@ -27,7 +27,7 @@ def list_logs(
     limit: int = Query(200, ge=10, le=1000),
     cursor_id: int | None = Query(None, description="Return rows with id < cursor_id"),
     item_id: int | None = None,
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
 ):
     """Return stock-change events from the ledger (item_movements), newest first."""
 
@@ -3,19 +3,33 @@ import json
 import logging
 import os
 import time
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 from pathlib import Path
 from typing import Any, Iterable
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
 from core.api.schemas.manufacturing import ManufacturingRunRequest, parse_run_request
-from core.appdb.engine import get_session
+from core.appdb.engine import get_read_session, get_session, write_session
 from core.appdb.ledger import InsufficientStock
-from core.appdb.models import Recipe
+from core.appdb.models import ManufacturingJob, Recipe
 from core.config.writes import require_writes
-from core.manufacturing.service import execute_run_txn, format_shortages, validate_run
+from core.manufacturing.capacity import capacity_report, mix_capacity
+from core.manufacturing.explode import BomCycleError, BuildPlan, plan_build
+from core.manufacturing import history, jobs
+from core.manufacturing.service import (
+    execute_batch_txn,
+    execute_plan_txn,
+    execute_run_txn,
+    format_shortages,
+    preview_batch,
+    preview_run,
+    record_failed_run,
+    validate_run,
+)
 from core.policy.guard import require_owner_commit
 from tgc.security import require_token_ctx
 from tgc.state import AppState, get_state
@@ -33,60 +47,6 @@ def _journals_dir() -> Path:
     return d
 
 
-def _mf_journal_path() -> Path:
-    return _journals_dir() / "manufacturing.jsonl"
-
-
-def _parse_iso_utc(ts: str) -> datetime:
-    if ts.endswith("Z"):
-        ts = ts[:-1] + "+00:00"
-    dt = datetime.fromisoformat(ts)
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt
-
-
-def _load_recent_runs(days: int) -> list[dict]:
-    p = _mf_journal_path()
-    if not p.exists():
-        return []
-
-    cutoff = datetime.now(timezone.utc) - timedelta(days=int(days))
-    runs: list[dict] = []
-    with open(p, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-            except Exception:
-                continue
-
-            ts_val = obj.get("timestamp")
-            dt = None
-            if ts_val is not None:
-                try:
-                    dt = _parse_iso_utc(str(ts_val))
-                except Exception:
-                    dt = None
-            if dt is None and obj.get("ts") is not None:
-                try:
-                    dt = datetime.fromtimestamp(float(obj.get("ts")), tz=timezone.utc)
-                except Exception:
-                    dt = None
-            if dt is None:
-                continue
-
-            if dt >= cutoff:
-                obj.setdefault("timestamp", dt.isoformat())
-                obj["_ts"] = dt.isoformat()
-                runs.append(obj)
-
-    runs.sort(key=lambda x: x.get("_ts", ""), reverse=True)
-    return runs
-
-
 def _map_shortages(shortages: Iterable[dict]) -> list[dict]:
     return [
         {
@@ -110,17 +70,7 @@ def _resolve_recipe_name(db: Session, recipe_id: int | None) -> str | None:
 def _record_failed_run(
     db: Session, body: ManufacturingRunRequest, output_item_id: int | None, shortages: list[dict]
 ):
-    from core.appdb.models_recipes import ManufacturingRun
-
-    run = ManufacturingRun(
-        recipe_id=getattr(body, "recipe_id", None),
-        output_item_id=output_item_id or getattr(body, "output_item_id", None),
-        output_qty=getattr(body, "output_qty", 0.0),
-        status="failed_insufficient_stock",
-        notes=getattr(body, "notes", None),
-        meta=json.dumps({"shortages": shortages}),
-    )
-    db.add(run)
+    run = record_failed_run(db, body, output_item_id, shortages)
     db.commit()
     db.refresh(run)
     return run
@@ -135,8 +85,78 @@ def _shortage_detail(shortages: list[dict], run_id: int | None) -> dict:
     }
 
 
+def _check_runnable_recipe(db: Session, body: ManufacturingRunRequest) -> int | None:
+    """Reject archived/incomplete recipes; returns the run's output item id."""
+    if getattr(body, "recipe_id", None) is None:
+        return getattr(body, "output_item_id", None)
+    recipe = db.get(Recipe, body.recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    if recipe.archived:
+        raise HTTPException(status_code=400, detail="Recipe is archived")
+    if not recipe.output_item_id:
+        raise HTTPException(status_code=400, detail="Recipe has no output item")
+    if recipe.output_qty <= 0:
+        raise HTTPException(status_code=400, detail="Recipe has invalid output quantity")
+    return recipe.output_item_id
+
+
+def _plan_or_400(db: Session, body: ManufacturingRunRequest) -> BuildPlan:
+    try:
+        return plan_build(db, body.recipe_id, body.output_qty)
+    except BomCycleError as exc:
+        raise HTTPException(status_code=400, detail={"error": "bom_cycle", "cycle": exc.cycle})
+
+
+def _run_exploded(db: Session, body: ManufacturingRunRequest) -> dict:
+    plan = _plan_or_400(db, body)
+    if plan.shortages:
+        shortages = format_shortages(plan.shortages)
+        run = _record_failed_run(db, body, plan.root.output_item_id, shortages)
+        raise HTTPException(status_code=400, detail=_shortage_detail(shortages, run.id))
+    results = execute_plan_txn(db, plan, body)
+    recipe_names = {}
+    for node, result in zip(plan.root.post_order(), results):
+        if node.recipe_id not in recipe_names:
+            recipe_names[node.recipe_id] = _resolve_recipe_name(db, node.recipe_id)
+        _append_manufacturing_journal(
+            {
+                "type": "manufacturing.run",
+                "recipe_id": node.recipe_id,
+                "recipe_name": recipe_names[node.recipe_id],
+                "output_item_id": node.output_item_id,
+                "output_qty": int(node.output_qty),
+            }
+        )
+    return {
+        "ok": True,
+        "status": "completed",
+        "run_id": results[-1]["run"].id,
+        "output_unit_cost_cents": results[-1]["output_unit_cost_cents"],
+        "sub_run_ids": [r["run"].id for r in results[:-1]],
+    }
+
+
+@router.post("/preview")
+def preview_manufacturing(
+    raw_body: Any = Body(...),
+    db: Session = Depends(get_read_session),
+    _token: str = Depends(require_token_ctx),
+):
+    """Which layers a run would consume and what it would cost; read-only."""
+    body: ManufacturingRunRequest = parse_run_request(raw_body)
+    _check_runnable_recipe(db, body)
+    if getattr(body, "explode", False):
+        preview = _plan_or_400(db, body).as_dict()
+        preview["shortages"] = _map_shortages(preview["shortages"])
+        return preview
+    preview = preview_run(db, body)
+    preview["shortages"] = _map_shortages(preview["shortages"])
+    return preview
+
+
 @router.post("/run")
-async def run_manufacturing(
+def run_manufacturing(
     req: Request,
     raw_body: Any = Body(...),
     db: Session = Depends(get_session),
@@ -147,22 +167,11 @@ async def run_manufacturing(
     require_owner_commit(req)
 
     body: ManufacturingRunRequest = parse_run_request(raw_body)
-    output_item_id: int | None = getattr(body, "output_item_id", None)
-
-    recipe: Recipe | None = None
-    if getattr(body, "recipe_id", None) is not None:
-        recipe = db.get(Recipe, body.recipe_id)
-        if not recipe:
-            raise HTTPException(status_code=404, detail="Recipe not found")
-        if recipe.archived:
-            raise HTTPException(status_code=400, detail="Recipe is archived")
-        if not recipe.output_item_id:
-            raise HTTPException(status_code=400, detail="Recipe has no output item")
-        if recipe.output_qty <= 0:
-            raise HTTPException(status_code=400, detail="Recipe has invalid output quantity")
-        output_item_id = recipe.output_item_id
+    output_item_id: int | None = _check_runnable_recipe(db, body)
 
     try:
+        if getattr(body, "explode", False):
+            return _run_exploded(db, body)
         output_item_id, required, k, shortages = validate_run(db, body)
         if shortages:
             run = _record_failed_run(db, body, output_item_id, shortages)
@@ -209,22 +218,251 @@ async def run_manufacturing(
         raise HTTPException(status_code=500, detail={"status": "failed_error"})
 
 
+class RunBatchIn(BaseModel):
+    runs: list[dict[str, Any]] = Field(min_length=1, max_length=100)
+    atomic: bool = False
+
+
+def _run_journal_entry(db: Session, body: ManufacturingRunRequest, output_item_id: int | None) -> dict:
+    recipe_id = getattr(body, "recipe_id", None)
+    return {
+        "type": "manufacturing.run",
+        "recipe_id": int(recipe_id) if recipe_id is not None else None,
+        "recipe_name": _resolve_recipe_name(db, recipe_id),
+        "output_item_id": int(output_item_id) if output_item_id is not None else None,
+        "output_qty": int(body.output_qty),
+    }
+
+
+@router.post("/runs/batch")
+def run_manufacturing_batch(
+    req: Request,
+    payload: RunBatchIn,
+    db: Session = Depends(get_session),
+    _writes: None = Depends(require_writes),
+    _token: str = Depends(require_token_ctx),
+    _state: AppState = Depends(get_state),
+):
+    """Submit several runs; validated in order against one shared stock view.
+
+    With ``atomic`` every run executes in one transaction and any failure
+    rejects the whole batch (400) without writing anything, not even
+    failed-run history. Otherwise each valid run commits on its own and
+    failures are reported and recorded per run.
+    """
+    require_owner_commit(req)
+
+    results: list[dict] = [{"index": i, "status": "pending"} for i in range(len(payload.runs))]
+    parsed: list[tuple[int, ManufacturingRunRequest]] = []
+    for i, raw in enumerate(payload.runs):
+        try:
+            body = parse_run_request(raw)
+            if getattr(body, "explode", False):
+                raise HTTPException(status_code=400, detail="explode is not supported in batch runs")
+            _check_runnable_recipe(db, body)
+            parsed.append((i, body))
+        except HTTPException as exc:
+            results[i].update(status="invalid", detail=exc.detail)
+
+    runnable = []
+    for (i, body), (preview, (output_item_id, required, k)) in zip(
+        parsed, preview_batch(db, [body for _, body in parsed])
+    ):
+        results[i]["output_item_id"] = output_item_id
+        if preview["ok"]:
+            results[i]["planned_unit_cost_cents"] = preview["per_output_cents"]
+            runnable.append((i, body, output_item_id, required, k))
+        else:
+            shortages = preview["shortages"]
+            results[i].update(status="failed_insufficient_stock", shortages=_map_shortages(shortages))
+            if not payload.atomic:
+                # A rejected atomic batch leaves no trace, failed-run rows included.
+                results[i]["run_id"] = _record_failed_run(db, body, output_item_id, shortages).id
+
+    journal: list[dict] = []
+    if payload.atomic:
+        if len(runnable) != len(results):
+            for r in results:
+                if r["status"] == "pending":
+                    r["status"] = "not_run"
+            raise HTTPException(status_code=400, detail={"error": "batch_rejected", "results": results})
+        try:
+            executed = execute_batch_txn(db, [(body, out, required, k) for _, body, out, required, k in runnable])
+        except InsufficientStock as exc:
+            raise HTTPException(
+                status_code=400,
+                detail={"error": "insufficient_stock", "shortages": _map_shortages(format_shortages(exc.shortages))},
+            )
+        for (i, body, out, _, _), result in zip(runnable, executed):
+            results[i].update(
+                status="completed", run_id=result["run"].id, output_unit_cost_cents=result["output_unit_cost_cents"]
+            )
+            journal.append(_run_journal_entry(db, body, out))
+    else:
+        for i, body, out, required, k in runnable:
+            try:
+                result = execute_run_txn(db, body, out, required, k)
+            except InsufficientStock as exc:
+                shortages = format_shortages(exc.shortages)
+                run = _record_failed_run(db, body, out, shortages)
+                results[i].update(
+                    status="failed_insufficient_stock", run_id=run.id, shortages=_map_shortages(shortages)
+                )
+                continue
+            except Exception:
+                logger.exception("batch manufacturing run %s failed", i)
+                results[i].update(status="failed_error")
+                continue
+            results[i].update(
+                status="completed", run_id=result["run"].id, output_unit_cost_cents=result["output_unit_cost_cents"]
+            )
+            journal.append(_run_journal_entry(db, body, out))
+
+    _append_manufacturing_journal_many(journal)
+    completed = sum(1 for r in results if r["status"] == "completed")
+    return {"ok": completed == len(results), "atomic": payload.atomic, "completed": completed, "results": results}
+
+
 def _append_manufacturing_journal(entry: dict) -> None:
+    _append_manufacturing_journal_many([entry])
+
+
+def _append_manufacturing_journal_many(entries: list[dict]) -> None:
+    if not entries:
+        return
     try:
-        entry = dict(entry)
-        entry.setdefault("timestamp", datetime.utcnow().isoformat() + "Z")
+        stamp = datetime.utcnow().isoformat() + "Z"
+        lines = []
+        for entry in entries:
+            entry = dict(entry)
+            entry.setdefault("timestamp", stamp)
+            lines.append(json.dumps(entry, separators=(",", ":")) + "\n")
         p = _journals_dir() / "manufacturing.jsonl"
         with open(p, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.write("".join(lines))
     except Exception:  # pragma: no cover - defensive
         logger.exception("Failed to append manufacturing journal entry")
 
 
+class MixLineIn(BaseModel):
+    recipe_id: int
+    qty: int = Field(gt=0)
+
+
+class CapacityMixIn(BaseModel):
+    mix: list[MixLineIn] = Field(min_length=1, max_length=500)
+
+
+@router.get("/capacity")
+def manufacturing_capacity(
+    db: Session = Depends(get_read_session),
+    _token: str = Depends(require_token_ctx),
+):
+    """Units each non-archived recipe can make from current stock, and what limits it."""
+    return {"recipes": capacity_report(db)}
+
+
+@router.post("/capacity")
+def manufacturing_capacity_mix(
+    body: CapacityMixIn,
+    db: Session = Depends(get_read_session),
+    _token: str = Depends(require_token_ctx),
+):
+    """How many complete kits of a product mix shared stock covers; read-only."""
+    mix: dict[int, int] = {}
+    for line in body.mix:
+        mix[int(line.recipe_id)] = mix.get(int(line.recipe_id), 0) + int(line.qty)
+    try:
+        return mix_capacity(db, mix)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail={"error": "recipe_not_found", "recipe_ids": exc.args[0]})
+
+
+def _job_session() -> Session:
+    return write_session()
+
+
+def _job_worker() -> jobs.JobWorker:
+    return jobs.get_worker(_job_session, _append_manufacturing_journal_many)
+
+
+def resume_jobs() -> None:
+    """Start the job worker at startup if a previous process left work queued.
+
+    Best-effort: a job queue that cannot be read is logged, not allowed to
+    stop the app from booting.
+    """
+    try:
+        with _job_session() as db:
+            pending = jobs.has_queued(db) or jobs.requeue_interrupted(db) > 0
+            db.commit()
+    except OperationalError:
+        logger.exception("Could not resume queued manufacturing jobs")
+        return
+    if pending:
+        _job_worker().notify()
+
+
+@router.post("/jobs", status_code=202)
+def enqueue_manufacturing_job(
+    req: Request,
+    raw_body: Any = Body(...),
+    db: Session = Depends(get_session),
+    _writes: None = Depends(require_writes),
+    _token: str = Depends(require_token_ctx),
+    _state: AppState = Depends(get_state),
+):
+    """Queue a run for the background worker; poll ``GET /jobs/{id}`` for the outcome."""
+    require_owner_commit(req)
+    body: ManufacturingRunRequest = parse_run_request(raw_body)
+    _check_runnable_recipe(db, body)
+    job = jobs.enqueue(db, raw_body)
+    db.commit()
+    _job_worker().notify()
+    return jobs.job_dict(db, job)
+
+
+@router.get("/jobs/{job_id}")
+def get_manufacturing_job(
+    job_id: int,
+    db: Session = Depends(get_read_session),
+    _token: str = Depends(require_token_ctx),
+):
+    job = db.get(ManufacturingJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_dict(db, job)
+
+
+def _history(
+    db: Session, days: int, recipe_id: int | None, output_item_id: int | None, cursor: int | None, limit: int
+):
+    runs, nxt = history.list_runs(
+        db, days=days, recipe_id=recipe_id, output_item_id=output_item_id, cursor=cursor, limit=limit
+    )
+    return {"runs": runs, "next_cursor": nxt}
+
+
 @router.get("/runs")
-async def list_runs(days: int = Query(30, ge=1, le=365)):
-    return {"runs": _load_recent_runs(days)}
+def list_runs(
+    days: int = Query(30, ge=1, le=365),
+    recipe_id: int | None = None,
+    output_item_id: int | None = None,
+    cursor: int | None = None,
+    limit: int = Query(history.PAGE_LIMIT, ge=1, le=1000),
+    db: Session = Depends(get_read_session),
+):
+    """Completed runs, newest first; pass ``next_cursor`` back as ``cursor`` for the next page."""
+    return _history(db, days, recipe_id, output_item_id, cursor, limit)
 
 
 @router.get("/history")
-async def list_runs_alias(days: int = Query(30, ge=1, le=365)):
-    return {"runs": _load_recent_runs(days)}
+def list_runs_alias(
+    days: int = Query(30, ge=1, le=365),
+    recipe_id: int | None = None,
+    output_item_id: int | None = None,
+    cursor: int | None = None,
+    limit: int = Query(history.PAGE_LIMIT, ge=1, le=1000),
+    db: Session = Depends(get_read_session),
+):
+    return _history(db, days, recipe_id, output_item_id, cursor, limit)
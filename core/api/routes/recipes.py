@@ -7,12 +7,14 @@ from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from core.appdb.engine import get_session
+from core.appdb.engine import get_read_session, get_session
 from core.appdb.models import Item
 from core.appdb.models_recipes import ManufacturingRun, Recipe, RecipeItem
 from core.config.writes import require_writes
+from core.manufacturing import bom, costs
 from core.policy.guard import require_owner_commit
 from tgc.security import require_token_ctx
 from tgc.state import AppState, get_state
@@ -69,30 +71,33 @@ class RecipeUpdate(BaseModel):
 
 
 def _serialize_recipe_detail(db: Session, recipe: Recipe) -> dict:
+    compiled = bom.get_compiled(db, recipe)
+    # Only on-hand is live; everything else comes from the compiled recipe.
+    wanted = {line.item_id for line in compiled.lines}
+    if compiled.output_item_id:
+        wanted.add(compiled.output_item_id)
+    qty_stored = dict(db.execute(select(Item.id, Item.qty_stored).where(Item.id.in_(wanted))).all()) if wanted else {}
+
     items = []
-    for ri in (
-        db.query(RecipeItem).filter(RecipeItem.recipe_id == recipe.id).order_by(RecipeItem.sort_order).all()
-    ):
-        it = db.get(Item, ri.item_id)
+    for line in compiled.lines:
         items.append(
             {
-                "id": ri.id,
-                "item_id": ri.item_id,
-                "qty_required": ri.qty_required,
-                "optional": bool(ri.is_optional),
-                "sort": ri.sort_order,
+                "id": line.id,
+                "item_id": line.item_id,
+                "qty_required": line.qty_required,
+                "optional": line.is_optional,
+                "sort": line.sort_order,
                 "item": None
-                if not it
+                if line.item_id not in qty_stored
                 else {
-                    "id": it.id,
-                    "name": it.name,
-                    "uom": it.uom,
-                    "qty_stored": it.qty_stored,
+                    "id": line.item_id,
+                    "name": line.item_name,
+                    "uom": line.item_uom,
+                    "qty_stored": qty_stored[line.item_id],
                 },
             }
         )
 
-    output_item = db.get(Item, recipe.output_item_id) if recipe.output_item_id else None
     return {
         "id": recipe.id,
         "name": recipe.name,
@@ -103,23 +108,24 @@ def _serialize_recipe_detail(db: Session, recipe: Recipe) -> dict:
         "notes": recipe.notes,
         "items": items,
         "output_item": None
-        if not output_item
+        if compiled.output_item_id not in qty_stored
         else {
-            "id": output_item.id,
-            "name": output_item.name,
-            "uom": output_item.uom,
-            "qty_stored": output_item.qty_stored,
+            "id": compiled.output_item_id,
+            "name": compiled.output_name,
+            "uom": compiled.output_uom,
+            "qty_stored": qty_stored[compiled.output_item_id],
         },
     }
 
 
 @router.get("")
-async def list_recipes(
-    db: Session = Depends(get_session),
+def list_recipes(
+    db: Session = Depends(get_read_session),
     _token: str = Depends(require_token_ctx),
     _state: AppState = Depends(get_state),
 ):
     rs = db.query(Recipe).all()
+    projected = costs.get_costs(db, rs)
     return [
         {
             "id": r.id,
@@ -129,15 +135,16 @@ async def list_recipes(
             "output_qty": r.output_qty,
             "archived": bool(r.archived),
             "notes": r.notes,
+            **projected[r.id].as_dict(),
         }
         for r in rs
     ]
 
 
 @router.get("/{rid}")
-async def get_recipe(
+def get_recipe(
     rid: int,
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
     _token: str = Depends(require_token_ctx),
     _state: AppState = Depends(get_state),
 ):
@@ -148,7 +155,7 @@ async def get_recipe(
 
 
 @router.post("")
-async def create_recipe(
+def create_recipe(
     payload: RecipeCreate,
     req: Request,
     db: Session = Depends(get_session),
@@ -180,6 +187,7 @@ async def create_recipe(
             )
         )
     db.commit()
+    bom.invalidate(recipe.id)
     db.refresh(recipe)
     _append_recipe_journal({
         "type": "recipe.create",
@@ -190,7 +198,7 @@ async def create_recipe(
 
 
 @router.put("/{rid}")
-async def update_recipe(
+def update_recipe(
     rid: int,
     payload: RecipeUpdate,
     req: Request,
@@ -214,6 +222,8 @@ async def update_recipe(
         recipe.archived = bool(payload.archived)
     if payload.notes is not None:
         recipe.notes = payload.notes
+    # Line edits alone would not touch the recipe row; bump it for the BOM cache key.
+    recipe.updated_at = datetime.utcnow()
     db.query(RecipeItem).filter(RecipeItem.recipe_id == rid).delete()
     for idx, it in enumerate(payload.items or []):
         if it.qty_required <= 0:
@@ -228,6 +238,7 @@ async def update_recipe(
             )
         )
     db.commit()
+    bom.invalidate(rid)
     db.refresh(recipe)
     _append_recipe_journal({
         "type": "recipe.update",
@@ -238,7 +249,7 @@ async def update_recipe(
 
 
 @router.delete("/{recipe_id}")
-async def delete_recipe(
+def delete_recipe(
     recipe_id: int,
     req: Request,
     db: Session = Depends(get_session),
@@ -256,6 +267,7 @@ async def delete_recipe(
     db.query(RecipeItem).filter(RecipeItem.recipe_id == recipe_id).delete()
     db.delete(r)
     db.commit()
+    bom.invalidate(recipe_id)
     _append_recipe_journal(
         {
             "type": "recipe.delete",
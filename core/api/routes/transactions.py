@@ -1,32 +1,43 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
 
-from fastapi import APIRouter, Query
+from core.appdb.engine import get_refresh_session
+from core.appdb.write_gate import begin_immediate, wait_limit
+from core.ledger.reporting import parse_window, recent, refresh_rollups, summary
 
 router = APIRouter()
 
 
+def _refresh(db: Session) -> None:
+    try:
+        # Take the gate before refresh_rollups reads its mark, without queueing.
+        conn = db.connection()
+        with wait_limit(conn, 0):
+            begin_immediate(conn)
+            refresh_rollups(db)
+        db.commit()
+    except OperationalError:
+        # Writer is busy; answer from the rollups as they stand.
+        db.rollback()
+
+
 @router.get("/transactions/summary")
-def transactions_summary(window: str = Query("30d")):
-    """
-    STUB: Replace when transactions module lands.
-    Returns the shape expected by the UI while clearly marked as a stub.
-    """
+def transactions_summary(window: str = Query("30d"), db: Session = Depends(get_refresh_session)):
+    """Sales, COGS, margin and waste for the last ``window`` days (e.g. ``30d``)."""
 
-    return {
-        "stub": True,
-        "window": window,
-        "as_of": datetime.utcnow().isoformat(),
-        "totals": {"count": 0, "in": 0, "out": 0},
-    }
+    try:
+        days = parse_window(window)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_window")
+    _refresh(db)
+    return summary(db, days)
 
 
 @router.get("/transactions")
-def transactions_list(limit: int = 10):
-    """STUB: Empty transaction listing placeholder."""
-
-    return {
-        "stub": True,
-        "limit": limit,
-        "items": [],
-    }
+def transactions_list(limit: int = Query(10, ge=1, le=500), db: Session = Depends(get_refresh_session)):
+    """Newest daily revenue and expense lines from the rollups."""
+
+    _refresh(db)
+    return {"limit": limit, "items": recent(db, limit)}
@@ -22,6 +22,8 @@ class RecipeRunRequest(BaseModel):
     recipe_id: int = Field(..., gt=0)
     output_qty: float = Field(..., gt=0)
     notes: str | None = None
+    # Build missing sub-assemblies from their own recipes first (see core.manufacturing.explode).
+    explode: bool = False
 
 
 class AdhocRunRequest(BaseModel):
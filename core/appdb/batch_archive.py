@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Archive tier for fully consumed FIFO layers.
+
+Depleted layers never take part in FIFO again but stay in ``item_batches``
+forever, inflating every scan over an item's layers. :func:`archive_depleted_batches`
+moves layers with ``qty_remaining = 0`` created before a cutoff into
+``item_batches_closed`` under their original id, so ``item_movements.batch_id``
+stays resolvable through :func:`resolve_batches`; routes that look layers up
+by a movement's ``batch_id`` go through it.
+
+``item_batches`` ids are ``AUTOINCREMENT`` (migration 8), so an archived or
+deleted layer's id is never handed to a new one.
+
+Run ``python -m core.appdb.batch_archive [--days N]`` or
+``POST /app/ledger/batches/archive`` to archive on demand.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from core.appdb.models import ItemBatch, ItemBatchClosed
+
+DEFAULT_MIN_AGE_DAYS = 180
+DEFAULT_CHUNK_SIZE = 2000
+_COLUMNS = (
+    "id",
+    "item_id",
+    "qty_initial",
+    "qty_remaining",
+    "unit_cost_cents",
+    "source_kind",
+    "source_id",
+    "is_oversold",
+    "created_at",
+)
+
+
+def archive_min_age_days() -> int:
+    """Configured minimum layer age (``BUS_BATCH_ARCHIVE_DAYS``)."""
+
+    raw = os.getenv("BUS_BATCH_ARCHIVE_DAYS")
+    if raw is None or raw.strip() == "":
+        return DEFAULT_MIN_AGE_DAYS
+    try:
+        return max(int(raw.strip()), 0)
+    except ValueError:
+        return DEFAULT_MIN_AGE_DAYS
+
+
+def archive_depleted_batches(
+    session: Session,
+    min_age_days: Optional[int] = None,
+    *,
+    now: Optional[datetime] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Move depleted layers older than ``min_age_days`` to ``item_batches_closed``.
+
+    Commits after every chunk so the write lock is only held briefly; returns
+    the number of layers archived.
+    """
+
+    days = archive_min_age_days() if min_age_days is None else int(min_age_days)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    source_cols = [getattr(ItemBatch, c) for c in _COLUMNS]
+
+    archived = 0
+    while True:
+        ids = (
+            session.execute(
+                select(ItemBatch.id)
+                .where(ItemBatch.qty_remaining == 0, ItemBatch.created_at < cutoff)
+                .order_by(ItemBatch.id)
+                .limit(int(chunk_size))
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            break
+        session.execute(
+            insert(ItemBatchClosed).from_select(list(_COLUMNS), select(*source_cols).where(ItemBatch.id.in_(ids)))
+        )
+        session.execute(
+            delete(ItemBatch).where(ItemBatch.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        session.commit()
+        archived += len(ids)
+        if len(ids) < chunk_size:
+            break
+    return archived
+
+
+def resolve_batches(
+    session: Session, batch_ids: Iterable[int]
+) -> Dict[int, Union[ItemBatch, ItemBatchClosed]]:
+    """Look up layers by id in the live table first, then in the archive."""
+
+    ids = {int(i) for i in batch_ids if i is not None}
+    if not ids:
+        return {}
+    found: Dict[int, Union[ItemBatch, ItemBatchClosed]] = {
+        b.id: b for b in session.execute(select(ItemBatch).where(ItemBatch.id.in_(ids))).scalars()
+    }
+    missing = ids - set(found)
+    if missing:
+        found.update(
+            (b.id, b)
+            for b in session.execute(select(ItemBatchClosed).where(ItemBatchClosed.id.in_(missing))).scalars()
+        )
+    return found
+
+
+def archived_batches_page(
+    session: Session, item_id: int, *, limit: int, offset: int = 0
+) -> Tuple[List[ItemBatchClosed], int]:
+    """One page of an item's archived layers (oldest first) and the total count."""
+
+    total = int(
+        session.execute(
+            select(func.count()).select_from(ItemBatchClosed).where(ItemBatchClosed.item_id == int(item_id))
+        ).scalar_one()
+    )
+    rows = (
+        session.execute(
+            select(ItemBatchClosed)
+            .where(ItemBatchClosed.item_id == int(item_id))
+            .order_by(ItemBatchClosed.created_at, ItemBatchClosed.id)
+            .offset(int(offset))
+            .limit(int(limit))
+        )
+        .scalars()
+        .all()
+    )
+    return list(rows), total
+
+
+def _main(argv: List[str]) -> int:
+    from core.appdb.engine import SessionLocal, get_engine
+
+    ap = argparse.ArgumentParser(prog="python -m core.appdb.batch_archive")
+    ap.add_argument("--days", type=int, default=None, help="minimum layer age (default: BUS_BATCH_ARCHIVE_DAYS or 180)")
+    ap.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = ap.parse_args(argv)
+
+    engine = get_engine()
+    ItemBatchClosed.__table__.create(bind=engine, checkfirst=True)
+    with SessionLocal(bind=engine) as db:
+        count = archive_depleted_batches(db, args.days, chunk_size=args.chunk)
+    print(f"[batch-archive] archived {count} depleted layer(s)")
+    return 0
+
+
+__all__ = [
+    "DEFAULT_MIN_AGE_DAYS",
+    "archive_depleted_batches",
+    "archive_min_age_days",
+    "archived_batches_page",
+    "resolve_batches",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
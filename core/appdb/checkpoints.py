@@ -0,0 +1,204 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Point-in-time inventory valuation from periodic ledger checkpoints.
+
+Every movement carries the unit cost of the layer it touched, so an item's
+on-hand and remaining FIFO value at a moment ``T`` are
+``sum(qty_change)`` and ``sum(qty_change * unit_cost_cents)`` over its
+movements dated at or before ``T``. A checkpoint stores those sums per item
+for one ``as_of`` instant; :func:`valuation_as_of` starts from the nearest
+checkpoint at or before ``T`` and only replays the movements after it.
+
+Movements can be backdated (``created_at`` is set by the writer), so each
+checkpoint also records the highest movement id it had seen. Movements with
+a later id but dated at or before the checkpoint are replayed too.
+
+Month-end checkpoints are filled in by :func:`ensure_month_end_checkpoints`
+at startup; ``POST /app/ledger/checkpoints`` and
+``python -m core.appdb.checkpoints [--as-of ISO]`` write one on demand.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from core.appdb.models import ItemMovement, LedgerCheckpoint, LedgerCheckpointItem
+
+END_OF_DAY = time(23, 59, 59, 999999)
+
+
+@dataclass
+class Valuation:
+    as_of: datetime
+    checkpoint_id: Optional[int] = None
+    replayed_movements: int = 0
+    # item_id -> (on_hand, value_cents)
+    items: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+
+
+def parse_as_of(raw: str) -> datetime:
+    """``YYYY-MM-DD`` means the end of that day; full ISO datetimes are used as-is (naive UTC)."""
+
+    text = (raw or "").strip()
+    if len(text) == 10:
+        return datetime.combine(date.fromisoformat(text), END_OF_DAY)
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def nearest_checkpoint(session: Session, as_of: datetime) -> Optional[LedgerCheckpoint]:
+    return session.execute(
+        select(LedgerCheckpoint)
+        .where(LedgerCheckpoint.as_of <= as_of)
+        .order_by(LedgerCheckpoint.as_of.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+def valuation_as_of(
+    session: Session, as_of: datetime, item_id: Optional[int] = None, *, through_id: Optional[int] = None
+) -> Valuation:
+    """On-hand and remaining value per item at ``as_of`` (inclusive).
+
+    ``through_id`` ignores movements with a higher id, e.g. ones committed
+    after a caller read its high-water mark.
+    """
+
+    base = nearest_checkpoint(session, as_of)
+    result = Valuation(as_of=as_of, checkpoint_id=base.id if base is not None else None)
+
+    if base is not None:
+        stmt = select(LedgerCheckpointItem.item_id, LedgerCheckpointItem.on_hand, LedgerCheckpointItem.value_cents).where(
+            LedgerCheckpointItem.checkpoint_id == base.id
+        )
+        if item_id is not None:
+            stmt = stmt.where(LedgerCheckpointItem.item_id == int(item_id))
+        result.items = {i: (int(q), int(v)) for i, q, v in session.execute(stmt)}
+        window = or_(
+            and_(ItemMovement.created_at > base.as_of, ItemMovement.created_at <= as_of),
+            and_(ItemMovement.id > base.last_movement_id, ItemMovement.created_at <= base.as_of),
+        )
+    else:
+        window = ItemMovement.created_at <= as_of
+
+    delta = select(
+        ItemMovement.item_id,
+        func.sum(ItemMovement.qty_change),
+        func.sum(ItemMovement.qty_change * func.coalesce(ItemMovement.unit_cost_cents, 0)),
+        func.count(),
+    ).where(window)
+    if item_id is not None:
+        delta = delta.where(ItemMovement.item_id == int(item_id))
+    if through_id is not None:
+        delta = delta.where(ItemMovement.id <= int(through_id))
+    for mid, qty, value, count in session.execute(delta.group_by(ItemMovement.item_id)):
+        on_hand, total = result.items.get(mid, (0, 0))
+        result.items[mid] = (on_hand + int(qty or 0), total + int(value or 0))
+        result.replayed_movements += int(count)
+    return result
+
+
+def write_checkpoint(session: Session, as_of: Optional[datetime] = None) -> LedgerCheckpoint:
+    """Snapshot every item as of ``as_of`` (default: now). Caller commits."""
+
+    as_of = as_of or datetime.utcnow()
+    existing = session.execute(select(LedgerCheckpoint).where(LedgerCheckpoint.as_of == as_of)).scalar_one_or_none()
+    if existing is not None:
+        return existing
+
+    # Read the high-water mark first and value only up to it: the two reads
+    # need not share a snapshot, and anything newer is replayed later as a
+    # late arrival, so counting it here too would count it twice.
+    last_id = int(session.execute(select(func.coalesce(func.max(ItemMovement.id), 0))).scalar_one())
+    snapshot = valuation_as_of(session, as_of, through_id=last_id)
+    rows = {i: qv for i, qv in snapshot.items.items() if qv != (0, 0)}
+    checkpoint = LedgerCheckpoint(as_of=as_of, last_movement_id=last_id, item_count=len(rows))
+    session.add(checkpoint)
+    session.flush()
+    if rows:
+        session.execute(
+            LedgerCheckpointItem.__table__.insert(),
+            [
+                {"checkpoint_id": checkpoint.id, "item_id": i, "on_hand": q, "value_cents": v}
+                for i, (q, v) in rows.items()
+            ],
+        )
+    return checkpoint
+
+
+def _month_ends(start: datetime, stop: datetime) -> List[datetime]:
+    """Month-end instants after ``start`` and strictly before ``stop``."""
+
+    out: List[datetime] = []
+    year, month = start.year, start.month
+    while True:
+        nxt = date(year + (month == 12), month % 12 + 1, 1)
+        end = datetime.combine(nxt - timedelta(days=1), END_OF_DAY)
+        if end >= stop:
+            return out
+        if end > start:
+            out.append(end)
+        year, month = nxt.year, nxt.month
+
+
+def ensure_month_end_checkpoints(session: Session, now: Optional[datetime] = None) -> int:
+    """Write any missing month-end checkpoints for completed months. Caller commits."""
+
+    now = now or datetime.utcnow()
+    latest = session.execute(select(func.max(LedgerCheckpoint.as_of))).scalar()
+    if latest is None:
+        first = session.execute(select(func.min(ItemMovement.created_at))).scalar()
+        if first is None:
+            return 0
+        # Start just before the first movement so its own month gets a checkpoint.
+        latest = first - timedelta(microseconds=1)
+    written = 0
+    for end in _month_ends(latest, now):
+        write_checkpoint(session, end)
+        written += 1
+    return written
+
+
+def _main(argv: List[str]) -> int:
+    from core.appdb.engine import SessionLocal, get_engine
+    from core.appdb.models import Base
+
+    ap = argparse.ArgumentParser(prog="python -m core.appdb.checkpoints")
+    ap.add_argument("--as-of", default=None, help="ISO date/datetime (default: now)")
+    ap.add_argument("--month-ends", action="store_true", help="fill in missing month-end checkpoints instead")
+    args = ap.parse_args(argv)
+
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine, tables=[LedgerCheckpoint.__table__, LedgerCheckpointItem.__table__])
+    with SessionLocal(bind=engine) as db:
+        if args.month_ends:
+            count = ensure_month_end_checkpoints(db)
+            db.commit()
+            print(f"[checkpoints] wrote {count} month-end checkpoint(s)")
+            return 0
+        cp = write_checkpoint(db, parse_as_of(args.as_of) if args.as_of else None)
+        db.commit()
+        print(f"[checkpoints] checkpoint {cp.id} as of {cp.as_of.isoformat()} ({cp.item_count} items)")
+    return 0
+
+
+__all__ = [
+    "Valuation",
+    "ensure_month_end_checkpoints",
+    "nearest_checkpoint",
+    "parse_as_of",
+    "valuation_as_of",
+    "write_checkpoint",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
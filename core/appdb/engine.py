@@ -3,18 +3,25 @@
 
 from __future__ import annotations
 
+import logging
 import os
 import re
+import sqlite3
+import weakref
 from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Generator, Optional
+from typing import Generator, List, Optional
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
 from core.appdata.paths import resolve_db_path, legacy_repo_db  # SoT helpers
+from core.appdb.write_gate import WriteGate, attach as attach_write_gate, begin_immediate
+
+logger = logging.getLogger(__name__)
 
 # --- Path & URL -------------------------------------------------------------
 
@@ -57,10 +64,170 @@ def _sqlite_url(p: Path) -> str:
 
 DB_URL = _sqlite_url(DB_PATH)
 
+# --- Engine profile ---------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Connection pooling and the PRAGMAs applied to every new connection.
+
+    ``None`` leaves a PRAGMA at SQLite's default. ``BUS_DB_PROFILE`` picks one
+    of :data:`PROFILES` (default ``durable``); ``BUS_DB_POOL_SIZE`` overrides
+    the pool size.
+    """
+
+    name: str
+    pooled: bool = True
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    journal_mode: Optional[str] = "WAL"
+    synchronous: Optional[str] = "FULL"
+    cache_size_kib: Optional[int] = 16 * 1024
+    mmap_size: Optional[int] = 128 * 1024 * 1024
+    temp_store: Optional[str] = "MEMORY"
+    # Longest a writer waits in the write queue before ``database is locked``.
+    write_timeout: float = 30.0
+
+    def pragmas(self) -> List[str]:
+        out = []
+        if self.journal_mode:
+            out.append(f"PRAGMA journal_mode={self.journal_mode}")
+        if self.synchronous:
+            out.append(f"PRAGMA synchronous={self.synchronous}")
+        if self.cache_size_kib is not None:
+            # Negative means KiB rather than pages.
+            out.append(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        if self.mmap_size is not None:
+            out.append(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        if self.temp_store:
+            out.append(f"PRAGMA temp_store={self.temp_store}")
+        return out
+
+
+# Median ms per request from scripts/bench_engine_profile.py (2000 items,
+# 2000 requests, three runs on one core), read / purchase commit:
+#   legacy 1.41 / 7.84, durable 0.62 / 5.90, tuned 0.56 / 5.26.
+# Pooling and WAL account for most of the gain; synchronous=NORMAL saves
+# another ~0.6 ms per commit, too little to give up durability by default.
+PROFILES = {
+    "durable": EngineProfile("durable"),
+    # NORMAL is durable against application crashes in WAL mode; only an OS
+    # crash or power loss can drop the last commits.
+    "tuned": EngineProfile("tuned", synchronous="NORMAL"),
+    # The pre-profile behaviour: a fresh connection per session, SQLite defaults.
+    "legacy": EngineProfile(
+        "legacy",
+        pooled=False,
+        journal_mode=None,
+        synchronous=None,
+        cache_size_kib=None,
+        mmap_size=None,
+        temp_store=None,
+    ),
+}
+
+
+def engine_profile() -> EngineProfile:
+    name = (os.environ.get("BUS_DB_PROFILE") or "durable").strip().lower()
+    profile = PROFILES.get(name)
+    if profile is None:
+        print(f"[db] unknown BUS_DB_PROFILE={name!r}; using 'durable'")
+        profile = PROFILES["durable"]
+    size = os.environ.get("BUS_DB_POOL_SIZE")
+    if size and size.strip().isdigit():
+        profile = replace(profile, pool_size=max(int(size), 1))
+    return profile
+
+
+def _apply_pragmas(statements: List[str]):
+    def on_connect(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        try:
+            for stmt in statements:
+                try:
+                    cur.execute(stmt)
+                except sqlite3.OperationalError as exc:
+                    # e.g. WAL on a read-only or network filesystem, or while
+                    # another process holds a lock; the connection still
+                    # works in its current mode.
+                    logger.warning("[db] %s failed: %s", stmt, exc)
+        finally:
+            cur.close()
+
+    return on_connect
+
+
+# Engines released by dispose_engine(); see _close_if_retired.
+_RETIRED: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def _close_if_retired(engine: Engine):
+    def on_checkin(_dbapi_conn, record) -> None:
+        if engine in _RETIRED and record is not None:
+            # Closes the sqlite3 handle instead of parking it in the dead pool.
+            record.invalidate()
+
+    return on_checkin
+
+
+def create_app_engine(
+    url: Optional[str] = None,
+    profile: Optional[EngineProfile] = None,
+    *,
+    gate: Optional[WriteGate] = None,
+    creator=None,
+) -> Engine:
+    """An engine for the app database (or ``url``) configured by ``profile``.
+
+    With ``gate``, connections queue on it before their first write.
+    """
+
+    profile = profile or engine_profile()
+    kwargs = {"future": True, "connect_args": {"check_same_thread": False}}
+    if creator is not None:
+        kwargs["creator"] = creator
+    if profile.pooled:
+        kwargs.update(
+            poolclass=QueuePool,
+            pool_size=profile.pool_size,
+            max_overflow=profile.max_overflow,
+            pool_timeout=profile.pool_timeout,
+        )
+    else:
+        kwargs["poolclass"] = NullPool
+    engine = create_engine(url or DB_URL, **kwargs)
+    if profile.pooled:
+        event.listen(engine, "checkin", _close_if_retired(engine))
+    statements = profile.pragmas()
+    if statements:
+        event.listen(engine, "connect", _apply_pragmas(statements))
+    if gate is not None:
+        gate.timeout = profile.write_timeout
+        attach_write_gate(engine, gate)
+    return engine
+
+
+def create_read_engine(path: Optional[Path] = None, profile: Optional[EngineProfile] = None) -> Engine:
+    """A read-only engine: every connection is opened with ``mode=ro``."""
+
+    uri = f"{Path(path or DB_PATH).resolve().as_uri()}?mode=ro"
+    # Readers cannot change the journal mode; they follow the file's.
+    profile = replace(profile or engine_profile(), journal_mode=None, synchronous=None)
+    return create_app_engine(
+        "sqlite+pysqlite://",
+        profile,
+        creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+    )
+
+
 # --- Engine & Session -------------------------------------------------------
 
 ENGINE: Optional[Engine] = None
+READ_ENGINE: Optional[Engine] = None
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, future=True)
+# Serialises writers to the app database, in arrival order.
+WRITE_GATE = WriteGate()
 
 
 def get_engine() -> Engine:
@@ -68,27 +235,71 @@ def get_engine() -> Engine:
 
     global ENGINE
     if ENGINE is None:
-        ENGINE = create_engine(
-            DB_URL,
-            future=True,
-            connect_args={"check_same_thread": False},
-            poolclass=NullPool,
-        )
+        ENGINE = create_app_engine(gate=WRITE_GATE)
     return ENGINE
 
 
+def get_read_engine() -> Engine:
+    """Read-only engine for GET routes; the writer until the database file exists."""
+
+    global READ_ENGINE
+    if READ_ENGINE is None:
+        if not DB_PATH.exists():
+            return get_engine()
+        READ_ENGINE = create_read_engine()
+    return READ_ENGINE
+
+
 def dispose_engine() -> None:
-    """Dispose and clear the global engine so handles drop immediately."""
+    """Dispose and clear the global engines so handles drop immediately.
 
-    global ENGINE
-    if ENGINE is not None:
-        try:
-            ENGINE.dispose()
-        finally:
-            ENGINE = None
+    Idle pooled connections are closed here; ones still checked out are
+    closed as their sessions return them. The restore path follows up with a
+    WAL checkpoint and a sweep of stray sqlite3 handles.
+    """
+
+    global ENGINE, READ_ENGINE
+    engines = [e for e in (READ_ENGINE, ENGINE) if e is not None]
+    READ_ENGINE = ENGINE = None
+    for engine in engines:
+        _RETIRED.add(engine)
+        engine.dispose()
+
+
+def _begin_immediate(_session, _transaction, connection) -> None:
+    begin_immediate(connection)
+
+
+def write_session(bind: Optional[Engine] = None) -> Session:
+    """Session whose transactions take the write lock before their first statement.
+
+    Reads that later writes depend on (open FIFO layers, high-water marks)
+    cannot go stale: on the app engine the session queues on the write gate
+    when a transaction begins, not at its first write.
+    """
+
+    db = SessionLocal(bind=bind or get_engine())
+    event.listen(db, "after_begin", _begin_immediate)
+    return db
 
 
 def get_session() -> Generator:
+    """Writer session (see :func:`write_session`)."""
+
+    db = write_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_refresh_session() -> Generator:
+    """Session for GET routes that refresh stored state when the writer is free.
+
+    Nothing is locked up front; the route takes the write lock itself inside
+    :func:`~core.appdb.write_gate.wait_limit` and otherwise serves what is stored.
+    """
+
     db = SessionLocal(bind=get_engine())
     try:
         yield db
@@ -96,6 +307,26 @@ def get_session() -> Generator:
         db.close()
 
 
+def get_read_session() -> Generator:
+    """Session on the read-only engine, for routes that never write."""
+
+    db = SessionLocal(bind=get_read_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def db_stats() -> dict:
+    """Write-queue wait times and pool usage (``GET /dev/db/stats``)."""
+
+    pools = {}
+    for name, engine in (("write", ENGINE), ("read", READ_ENGINE)):
+        if engine is not None:
+            pools[name] = engine.pool.status()
+    return {"write_gate": WRITE_GATE.stats(), "pools": pools}
+
+
 # --- Debug helper (used by /dev/db/where) -----------------------------------
 
 
@@ -0,0 +1,159 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Read-only FIFO what-if simulation.
+
+:class:`StockView` loads the open layers of a set of items with one plain
+``SELECT`` (no ``FOR UPDATE``, nothing written) and then answers any number of
+hypothetical consumptions in memory, using the same oldest-first allocation as
+:func:`core.appdb.ledger.fifo_consume_many`. ``POST /app/ledger/simulate`` and
+``POST /app/manufacturing/preview`` use it to show which layers a sale or a
+build would draw from and what it would cost, without going near the writer.
+
+Results are a snapshot: a real consumption committed after the view was
+loaded is not reflected until the view is loaded again.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.appdb import queries
+
+# (batch_id, qty_remaining, unit_cost_cents); batch_id is None for planned layers
+Layer = Tuple[Optional[int], int, Optional[int]]
+
+
+@dataclass
+class Slice:
+    item_id: int
+    batch_id: Optional[int]
+    qty: int
+    unit_cost_cents: Optional[int]
+
+    def as_dict(self) -> dict:
+        return {
+            "item_id": self.item_id,
+            "batch_id": self.batch_id,
+            "qty": self.qty,
+            "unit_cost_cents": int(self.unit_cost_cents or 0),
+        }
+
+
+@dataclass
+class Simulation:
+    slices: List[Slice] = field(default_factory=list)
+    # item_id -> (on_hand_before, qty, value_cents)
+    items: Dict[int, Tuple[int, int, int]] = field(default_factory=dict)
+    shortages: List[dict] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.shortages
+
+    @property
+    def cogs_cents(self) -> int:
+        return sum(value for _, _, value in self.items.values())
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "cogs_cents": self.cogs_cents,
+            "items": [
+                {
+                    "item_id": item_id,
+                    "qty": qty,
+                    "cogs_cents": value,
+                    "on_hand_before": before,
+                    "on_hand_after": before - qty,
+                }
+                for item_id, (before, qty, value) in self.items.items()
+            ],
+            "lines": [s.as_dict() for s in self.slices],
+            "shortages": self.shortages,
+        }
+
+
+class StockView:
+    """In-memory copy of the open FIFO layers of some items.
+
+    Items that were not loaded are treated as having no stock.
+    """
+
+    def __init__(self, layers: Dict[int, List[Layer]]):
+        self._layers: Dict[int, List[Layer]] = {int(i): list(ls) for i, ls in layers.items()}
+
+    @classmethod
+    def load(cls, session: Session, item_ids: Iterable[int]) -> "StockView":
+        ids = sorted({int(i) for i in item_ids})
+        layers: Dict[int, List[Layer]] = {i: [] for i in ids}
+        if ids:
+            for item_id, batch_id, qty, cost in session.execute(queries.OPEN_LAYER_TUPLES, {"item_ids": ids}):
+                layers[item_id].append((int(batch_id), int(qty), cost))
+        return cls(layers)
+
+    def copy(self) -> "StockView":
+        return StockView(self._layers)
+
+    def available(self, item_id: int) -> int:
+        return sum(qty for _, qty, _ in self._layers.get(int(item_id), ()))
+
+    def add_layer(self, item_id: int, batch_id: Optional[int], qty: int, unit_cost_cents: Optional[int]) -> None:
+        """Append a hypothetical newest layer, e.g. the output of a planned build."""
+
+        if int(qty) > 0:
+            self._layers.setdefault(int(item_id), []).append((batch_id, int(qty), unit_cost_cents))
+
+    def layers(self, item_id: int) -> List[Layer]:
+        return list(self._layers.get(int(item_id), ()))
+
+    def simulate(self, lines: Sequence[Tuple[int, int]], *, apply: bool = False) -> Simulation:
+        """Allocate ``(item_id, qty)`` lines oldest layer first.
+
+        Lines for the same item are merged. Like ``fifo_consume_many`` it is
+        all-or-nothing: if any item is short the result carries one shortage
+        per short item and no slices. With ``apply=True`` a successful
+        allocation is deducted from the view, so later calls see what is left.
+        """
+
+        needed: Dict[int, int] = {}
+        for item_id, qty in lines:
+            if int(qty) > 0:
+                needed[int(item_id)] = needed.get(int(item_id), 0) + int(qty)
+
+        result = Simulation()
+        for item_id, qty in needed.items():
+            avail = self.available(item_id)
+            if avail < qty:
+                result.shortages.append(
+                    {"item_id": item_id, "required": qty, "on_hand": avail, "missing": qty - avail}
+                )
+        if result.shortages:
+            return result
+
+        for item_id, qty in needed.items():
+            layers = self._layers.get(item_id, [])
+            before = self.available(item_id)
+            remaining = qty
+            value_cents = 0
+            used = 0
+            for batch_id, layer_qty, cost in layers:
+                if remaining <= 0:
+                    break
+                take = min(layer_qty, remaining)
+                remaining -= take
+                value_cents += take * int(cost or 0)
+                result.slices.append(Slice(item_id, batch_id, take, cost))
+                used += 1
+            result.items[item_id] = (before, qty, value_cents)
+            if apply and used:
+                last_id, last_qty, last_cost = layers[used - 1]
+                left = last_qty - result.slices[-1].qty
+                del layers[: used - 1 if left else used]
+                if left:
+                    layers[0] = (last_id, left, last_cost)
+        return result
+
+
+__all__ = ["Layer", "Simulation", "Slice", "StockView"]
@@ -1,18 +1,27 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from sqlalchemy import asc, func, select
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from core.appdb import queries
 from core.appdb.models import Item, ItemBatch, ItemMovement
+from core.appdb.stock_summary import ensure_summaries, record_consumption, record_layer_added
 
 
 def on_hand_qty(session: Session, item_id: int) -> int:
-    return int(
-        session.execute(
-            select(func.coalesce(func.sum(ItemBatch.qty_remaining), 0)).where(ItemBatch.item_id == item_id)
-        ).scalar_one()
-    )
+    return int(session.execute(queries.ON_HAND_ONE, {"item_id": int(item_id)}).scalar_one())
+
+
+def on_hand_many(session: Session, item_ids: Iterable[int]) -> Dict[int, int]:
+    """On-hand for several items with one grouped query; unknown/empty items map to 0."""
+
+    ids = sorted({int(i) for i in item_ids})
+    result = {i: 0 for i in ids}
+    if ids:
+        rows = session.execute(queries.ON_HAND_MANY, {"item_ids": ids})
+        result.update((int(i), int(q or 0)) for i, q in rows)
+    return result
 
 
 class InsufficientStock(Exception):
@@ -26,64 +35,85 @@ def fifo_consume(
 ) -> List[ItemMovement]:
     if qty_needed <= 0:
         return []
+    return fifo_consume_many(session, [(item_id, qty_needed)], source_kind, source_id)
 
-    avail = on_hand_qty(session, item_id)
-    if avail < qty_needed:
-        raise InsufficientStock(
-            [
-                {
-                    "item_id": item_id,
-                    "required": qty_needed,
-                    "on_hand": avail,
-                    "missing": qty_needed - avail,
-                }
-            ]
-        )
-
-    batches = (
-        session.execute(
-            select(ItemBatch)
-            .where(ItemBatch.item_id == item_id, ItemBatch.qty_remaining > 0)
-            .order_by(asc(ItemBatch.created_at), asc(ItemBatch.id))
-        )
-        .scalars()
-        .all()
-    )
 
-    moves: List[ItemMovement] = []
-    remaining = qty_needed
-    for batch in batches:
-        if remaining <= 0:
-            break
-        take = int(min(batch.qty_remaining, remaining))
-        batch.qty_remaining -= take
-        remaining -= take
-        mv = ItemMovement(
-            item_id=item_id,
-            batch_id=batch.id,
-            qty_change=-take,
-            unit_cost_cents=batch.unit_cost_cents,
-            source_kind=source_kind,
-            source_id=source_id,
-            is_oversold=False,
-        )
-        session.add(mv)
-        moves.append(mv)
-
-    if remaining > 0:
-        raise InsufficientStock(
-            [
+def fifo_consume_many(
+    session: Session,
+    lines: Sequence[Tuple[int, int]],
+    source_kind: str,
+    source_id: Optional[int],
+) -> List[ItemMovement]:
+    """Consume several items FIFO in one pass.
+
+    Every open layer for the requested items is read with a single query and
+    allocated in memory. Lines for the same item are merged. If any item is
+    short nothing is written and :class:`InsufficientStock` carries one
+    shortage per short item; otherwise the movements are bulk-inserted and
+    returned in request order. The caller commits.
+    """
+
+    needed: Dict[int, int] = {}
+    for item_id, qty in lines:
+        if int(qty) > 0:
+            needed[int(item_id)] = needed.get(int(item_id), 0) + int(qty)
+    if not needed:
+        return []
+
+    ensure_summaries(session, needed)
+    layers: Dict[int, List[ItemBatch]] = {item_id: [] for item_id in needed}
+    for batch in session.execute(queries.OPEN_LAYERS, {"item_ids": list(needed)}).scalars():
+        layers[batch.item_id].append(batch)
+
+    shortages = []
+    for item_id, qty in needed.items():
+        avail = sum(int(b.qty_remaining) for b in layers[item_id])
+        if avail < qty:
+            shortages.append({"item_id": item_id, "required": qty, "on_hand": avail, "missing": qty - avail})
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    rows: List[dict] = []
+    consumed_value: Dict[int, int] = {}
+    for item_id, qty in needed.items():
+        remaining = qty
+        value_cents = 0
+        for batch in layers[item_id]:
+            if remaining <= 0:
+                break
+            take = int(min(batch.qty_remaining, remaining))
+            batch.qty_remaining -= take
+            remaining -= take
+            value_cents += take * int(batch.unit_cost_cents or 0)
+            rows.append(
                 {
                     "item_id": item_id,
-                    "required": qty_needed,
-                    "on_hand": avail,
-                    "missing": remaining,
+                    "batch_id": batch.id,
+                    "qty_change": -take,
+                    "unit_cost_cents": batch.unit_cost_cents,
+                    "source_kind": source_kind,
+                    "source_id": source_id,
+                    "is_oversold": False,
                 }
-            ]
-        )
-    item = session.get(Item, item_id)
-    if item:
-        item.qty_stored = int((item.qty_stored or 0) - qty_needed)
+            )
+        consumed_value[item_id] = value_cents
+
+    # Plain executemany bracketed by movement ids, as in manufacturing runs:
+    # ORM inserts would need RETURNING, which SQLite runs one row at a time.
+    session.flush()
+    conn = session.connection()
+    move_mark = conn.execute(queries.LAST_MOVEMENT_ID).scalar_one()
+    conn.execute(insert(ItemMovement.__table__), rows)
+    moves = list(session.execute(queries.MOVEMENTS_AFTER, {"after_id": move_mark}).scalars())
+
+    last_move: Dict[int, int] = {}
+    for mv in moves:
+        last_move[mv.item_id] = max(last_move.get(mv.item_id, 0), int(mv.id))
+    items = session.execute(queries.ITEMS_BY_IDS, {"item_ids": list(needed)}).scalars()
+    for item in items:
+        item.qty_stored = int((item.qty_stored or 0) - needed[item.id])
+    for item_id, qty in needed.items():
+        record_consumption(session, item_id, layers[item_id], qty, consumed_value[item_id], last_move[item_id])
     return moves
 
 
@@ -94,9 +124,10 @@ def add_batch(
     unit_cost_cents: int,
     source_kind: str,
     source_id: Optional[int],
-): 
+):
     if qty <= 0:
         return None
+    ensure_summaries(session, [item_id])
     batch = ItemBatch(
         item_id=item_id,
         qty_initial=qty,
@@ -121,4 +152,6 @@ def add_batch(
     item = session.get(Item, item_id)
     if item:
         item.qty_stored = (item.qty_stored or 0) + qty
+    session.flush()
+    record_layer_added(session, item_id, batch.id, qty, unit_cost_cents, mv.id)
     return batch.id
@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Set-based item listing for ``GET /app/items``.
+
+A single statement returns every item together with its on-hand quantity, the
+unit cost of its oldest open FIFO layer and its vendor name, read from
+``item_stock_summary`` (see :mod:`core.appdb.stock_summary`). Filtering,
+sorting and pagination happen in SQL so the route never loops back to the
+database per item.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.appdb import queries
+from core.appdb.models import Item, ItemBatch, Vendor
+
+SORT_DIRECTIONS = ("asc", "desc")
+
+
+@dataclass
+class ItemListing:
+    """One page of items: ``(item, vendor_name, on_hand, fifo_unit_cost_cents)`` rows."""
+
+    rows: List[Tuple[Item, Optional[str], int, Optional[int]]] = field(default_factory=list)
+    total: Optional[int] = None
+
+
+def _unpack(row) -> Tuple[Item, Optional[str], int, Optional[int]]:
+    it, vendor_name, qty, cents = row
+    return it, vendor_name, int(qty or 0), int(cents) if cents is not None else None
+
+
+def get_item_row(session: Session, item_id: int) -> Optional[Tuple[Item, Optional[str], int, Optional[int]]]:
+    """Single-item variant of :func:`list_items_page`."""
+
+    row = session.execute(queries.ITEM_ROW, {"item_id": int(item_id)}).first()
+    return _unpack(row) if row is not None else None
+
+
+def list_items_page(
+    session: Session,
+    *,
+    item_type: Optional[str] = None,
+    location: Optional[str] = None,
+    vendor_id: Optional[int] = None,
+    low_stock: Optional[int] = None,
+    sort: str = "id",
+    order: str = "asc",
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> ItemListing:
+    """Return items with on-hand, oldest open-layer cost and vendor name.
+
+    ``low_stock`` keeps only items whose on-hand (base units) is at or below the
+    given value. ``total`` is only counted when ``limit`` is set, since an
+    unpaginated listing already carries every row.
+    """
+
+    stmt, on_hand = queries.item_listing_select()
+    sort_columns: dict[str, Any] = {
+        "id": Item.id,
+        "name": func.lower(Item.name),
+        "sku": Item.sku,
+        "type": Item.item_type,
+        "location": Item.location,
+        "vendor": func.lower(Vendor.name),
+        "created_at": Item.created_at,
+        "on_hand": on_hand,
+        "fifo_unit_cost": ItemBatch.unit_cost_cents,
+    }
+    if sort not in sort_columns:
+        raise ValueError(f"unsupported sort key: {sort}")
+    if order not in SORT_DIRECTIONS:
+        raise ValueError(f"unsupported sort order: {order}")
+
+    if item_type is not None:
+        stmt = stmt.where(Item.item_type == item_type)
+    if location is not None:
+        stmt = stmt.where(Item.location == location)
+    if vendor_id is not None:
+        stmt = stmt.where(Item.vendor_id == int(vendor_id))
+    if low_stock is not None:
+        stmt = stmt.where(on_hand <= int(low_stock))
+
+    total: Optional[int] = None
+    if limit is not None:
+        total = int(session.execute(select(func.count()).select_from(stmt.subquery())).scalar_one())
+
+    key = sort_columns[sort]
+    ordering = key.desc() if order == "desc" else key.asc()
+    tiebreak = Item.id.desc() if order == "desc" else Item.id.asc()
+    stmt = stmt.order_by(ordering, tiebreak)
+    if offset:
+        stmt = stmt.offset(int(offset))
+    if limit is not None:
+        stmt = stmt.limit(int(limit))
+
+    rows = [_unpack(row) for row in session.execute(stmt).all()]
+    return ItemListing(rows=rows, total=total)
+
+
+__all__ = ["ItemListing", "SORT_DIRECTIONS", "get_item_row", "list_items_page"]
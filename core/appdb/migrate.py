@@ -1,10 +1,89 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
+"""Versioned schema migrations for the app database.
+
+The schema version lives in ``PRAGMA user_version``. :func:`run_migrations`
+reads it and, when :data:`MIGRATIONS` has newer steps, applies all of them
+in one ``BEGIN IMMEDIATE`` transaction together with the new version, so a
+failed step leaves the database as it was. With nothing pending, startup
+costs that PRAGMA read and one ``sqlite_master`` lookup.
+
+The version alone does not prove every declared table is there (a table can
+be dropped by hand, or a model added without a step), so any table missing
+from ``sqlite_master`` is created by an idempotent ``create_all`` whatever
+the version says.
+
+Databases from before the runner report version 0 and replay every step;
+each step is written to be a no-op on a schema that already has its change.
+New tables, columns, indexes and backfills go in as a new step appended to
+:data:`MIGRATIONS`, never as an edit to an old one.
+"""
+
 from __future__ import annotations
 
-from sqlalchemy.engine import Engine
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
 
 from core.appdb.paths import app_db_path
-from core.appdb.sqlite_patch import ensure_vendors_schema
+from core.appdb.sqlite_patch import patch_vendors_schema
+
+
+# Partial index over open FIFO layers, ordered the way every FIFO path reads
+# them. qty_remaining/unit_cost_cents ride along so on-hand and FIFO cost
+# lookups are answered from the index alone.
+FIFO_OPEN_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_item_batches_open_fifo "
+    "ON item_batches(item_id, created_at, id, qty_remaining, unit_cost_cents) "
+    "WHERE qty_remaining > 0"
+)
+
+# Time-range scans over movements (point-in-time valuation replays).
+MOVEMENT_TIME_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_item_movements_created_at ON item_movements(created_at)"
+)
+
+# Manufacturing run history (core.manufacturing.history), optionally per recipe
+# or output item.
+RUN_HISTORY_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_manufacturing_runs_executed ON manufacturing_runs(executed_at)",
+    "CREATE INDEX IF NOT EXISTS ix_manufacturing_runs_recipe_executed "
+    "ON manufacturing_runs(recipe_id, executed_at)",
+    "CREATE INDEX IF NOT EXISTS ix_manufacturing_runs_output_executed "
+    "ON manufacturing_runs(output_item_id, executed_at)",
+)
+
+# Columns added to tables created before the models declared them; the
+# ``ALTER TABLE ... ADD COLUMN`` tail for each.
+LEGACY_COLUMNS = (
+    ("items", "uom", "uom TEXT NOT NULL DEFAULT 'ea'"),
+    ("items", "qty_stored", "qty_stored INTEGER NOT NULL DEFAULT 0"),
+    ("items", "dimension", "dimension TEXT NOT NULL DEFAULT 'count'"),
+    ("items", "is_product", "is_product BOOLEAN NOT NULL DEFAULT 0"),
+    ("item_batches", "is_oversold", "is_oversold BOOLEAN NOT NULL DEFAULT 0"),
+    ("item_movements", "is_oversold", "is_oversold BOOLEAN NOT NULL DEFAULT 0"),
+    ("recipes", "code", "code TEXT"),
+    ("recipes", "output_item_id", "output_item_id INTEGER NOT NULL DEFAULT 0"),
+    ("recipes", "output_qty", "output_qty INTEGER NOT NULL DEFAULT 1"),
+    ("recipes", "archived", "archived BOOLEAN NOT NULL DEFAULT 0"),
+    # SQLite cannot add a column defaulting to CURRENT_TIMESTAMP; filled below.
+    ("recipes", "created_at", "created_at DATETIME"),
+    ("recipes", "updated_at", "updated_at DATETIME"),
+    ("recipe_items", "qty_required", "qty_required INTEGER NOT NULL DEFAULT 0"),
+    ("recipe_items", "is_optional", "is_optional BOOLEAN NOT NULL DEFAULT 0"),
+    ("recipe_items", "sort_order", "sort_order INTEGER NOT NULL DEFAULT 0"),
+    ("recipe_items", "created_at", "created_at DATETIME"),
+    ("recipe_items", "updated_at", "updated_at DATETIME"),
+)
+
+LEGACY_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS idx_item_batches_item_created ON item_batches(item_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_item_batches_item_qtyrem ON item_batches(item_id, qty_remaining)",
+    "CREATE INDEX IF NOT EXISTS idx_item_movements_item_created ON item_movements(item_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_recipes_code ON recipes(code)",
+)
 
 
 def ensure_appdb_migrated() -> None:
@@ -12,10 +91,286 @@ def ensure_appdb_migrated() -> None:
     app_db_path()
 
 
-def ensure_vendors_flags(engine: Engine) -> None:
-    """Ensure required vendor columns exist (idempotent)."""
+def _columns(conn: Connection, table: str) -> set:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info('{table}')")}
+
+
+def _metadata() -> list:
+    from core.appdb import models, models_recipes
+
+    # The recipe models stay on the Base they were declared against, which is
+    # not models.Base once core.appdb.models has been reloaded.
+    out = [models.Base.metadata]
+    if models_recipes.Base.metadata is not models.Base.metadata:
+        out.append(models_recipes.Base.metadata)
+    return out
+
+
+def _create_tables(conn: Connection) -> None:
+    for metadata in _metadata():
+        metadata.create_all(bind=conn)
+
+
+def _missing_tables(conn: Connection) -> List[str]:
+    have = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'")}
+    return sorted({name for metadata in _metadata() for name in metadata.tables if name not in have})
+
+
+def _contact_columns(conn: Connection) -> None:
+    patch_vendors_schema(conn)
+    cols = _columns(conn, "vendors")
+    for col, ddl in (
+        ("role", "role TEXT DEFAULT 'vendor'"),
+        ("kind", "kind TEXT DEFAULT 'org'"),
+        ("organization_id", "organization_id INTEGER"),
+        ("meta", "meta TEXT"),
+    ):
+        if col not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE vendors ADD COLUMN {ddl}")
+    conn.exec_driver_sql("UPDATE vendors SET role='vendor' WHERE role IS NULL")
+    conn.exec_driver_sql("UPDATE vendors SET kind='org' WHERE kind IS NULL")
+    conn.exec_driver_sql("UPDATE vendors SET meta='{}' WHERE meta IS NULL OR trim(meta)=''")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS vendors_role_idx ON vendors(role)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS vendors_kind_idx ON vendors(kind)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS vendors_org_idx  ON vendors(organization_id)")
+    # vendors holds contacts too, so names are not unique: drop any unique
+    # index on vendors(name) and keep a plain one for lookups. Indexes behind
+    # a table constraint (origin "u"/"pk") cannot be dropped and are left.
+    for row in conn.exec_driver_sql("PRAGMA index_list('vendors')").fetchall():
+        # seq, name, unique, origin, partial
+        if not row[2] or row[3] != "c":
+            continue
+        names = [c[2] for c in conn.exec_driver_sql(f"PRAGMA index_info('{row[1]}')")]
+        if names == ["name"]:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{row[1]}"')
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_vendors_name ON vendors(name)")
+
+
+def _item_type_location(conn: Connection) -> None:
+    cols = _columns(conn, "items")
+    if "item_type" not in cols:
+        conn.exec_driver_sql("ALTER TABLE items ADD COLUMN item_type TEXT DEFAULT 'product'")
+    if "location" not in cols:
+        conn.exec_driver_sql("ALTER TABLE items ADD COLUMN location TEXT")
+    conn.exec_driver_sql("UPDATE items SET item_type='product' WHERE item_type IS NULL OR trim(item_type)=''")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS items_item_type_idx ON items(item_type)")
+
+
+def _fifo_open_index(conn: Connection) -> None:
+    have_index = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type='index' AND name='ix_item_batches_open_fifo'"
+    ).first()
+    conn.exec_driver_sql(FIFO_OPEN_INDEX_DDL)
+    if not have_index:
+        # Without stats the planner keeps picking an older (item_id, created_at)
+        # index (see LEGACY_INDEX_DDL), which still walks depleted rows.
+        conn.exec_driver_sql("ANALYZE item_batches")
+
+
+def _movement_time_index(conn: Connection) -> None:
+    conn.exec_driver_sql(MOVEMENT_TIME_INDEX_DDL)
+
+
+def _run_history_index(conn: Connection) -> None:
+    for ddl in RUN_HISTORY_INDEX_DDL:
+        conn.exec_driver_sql(ddl)
+
+
+def _stock_summary_backfill(conn: Connection) -> None:
+    from core.appdb.stock_summary import ensure_summary_populated
+
+    with Session(bind=conn) as session:
+        ensure_summary_populated(session)
+        session.flush()
+
+
+def _batch_ids_autoincrement(conn: Connection) -> None:
+    from sqlalchemy.schema import CreateTable
+
+    from core.appdb.models import ItemBatch
+
+    ddl = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='item_batches'"
+    ).scalar()
+    if ddl and "AUTOINCREMENT" not in ddl.upper():
+        # Rebuild: SQLite cannot add AUTOINCREMENT to an existing table.
+        indexes = [
+            row[0]
+            for row in conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name='item_batches' AND sql IS NOT NULL"
+            )
+        ]
+        create = str(CreateTable(ItemBatch.__table__).compile(dialect=conn.dialect))
+        conn.exec_driver_sql(create.replace("CREATE TABLE item_batches ", "CREATE TABLE item_batches_rebuild ", 1))
+        have = _columns(conn, "item_batches")
+        # A database replaying from version 0 may still lack these; step 9
+        # adds them to the other tables.
+        values = {
+            "is_oversold": "COALESCE(is_oversold, 0)" if "is_oversold" in have else "0",
+            "created_at": "COALESCE(created_at, CURRENT_TIMESTAMP)" if "created_at" in have else "CURRENT_TIMESTAMP",
+        }
+        cols = [c for c in ItemBatch.__table__.columns.keys() if c in have or c in values]
+        conn.exec_driver_sql(
+            f"INSERT INTO item_batches_rebuild ({', '.join(cols)}) "
+            f"SELECT {', '.join(values.get(c, c) for c in cols)} FROM item_batches"
+        )
+        conn.exec_driver_sql("DROP TABLE item_batches")
+        conn.exec_driver_sql("ALTER TABLE item_batches_rebuild RENAME TO item_batches")
+        for sql in indexes:
+            conn.exec_driver_sql(sql)
+        for index in ItemBatch.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+    # Start the sequence above every id ever issued: live, archived, or only
+    # still named by a movement because its layer was deleted.
+    floor = conn.exec_driver_sql(
+        "SELECT max(coalesce((SELECT seq FROM sqlite_sequence WHERE name='item_batches'), 0), "
+        "coalesce((SELECT max(id) FROM item_batches), 0), "
+        "coalesce((SELECT max(id) FROM item_batches_closed), 0), "
+        "coalesce((SELECT max(batch_id) FROM item_movements), 0))"
+    ).scalar()
+    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name='item_batches'")
+    conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('item_batches', ?)", (int(floor or 0),))
+
+
+def _legacy_columns(conn: Connection) -> None:
+    """What the old startup patcher (``core/appdb/ensure.py``) added."""
+
+    added = set()
+    for table, col, ddl in LEGACY_COLUMNS:
+        cols = _columns(conn, table)
+        if col in cols or ((table, col) == ("recipes", "archived") and "is_archived" in cols):
+            continue
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+        added.add((table, col))
+    if ("items", "qty_stored") in added and {"qty", "unit"} <= _columns(conn, "items"):
+        # Pre-integer layout: carry the float quantity over, in hundredths
+        # for anything but whole units.
+        conn.exec_driver_sql(
+            "UPDATE items SET "
+            "uom = CASE WHEN unit IN ('ea','g','mm','mm2','mm3') THEN unit ELSE 'ea' END, "
+            "qty_stored = CAST(ROUND(CASE WHEN unit IN ('g','mm','mm2','mm3') THEN qty * 100 ELSE qty END) AS INTEGER) "
+            "WHERE qty IS NOT NULL"
+        )
+    for table in ("recipes", "recipe_items"):
+        for col in ("created_at", "updated_at"):
+            if (table, col) in added:
+                conn.exec_driver_sql(f"UPDATE {table} SET {col} = CURRENT_TIMESTAMP WHERE {col} IS NULL")
+    have = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='index'")}
+    for ddl in LEGACY_INDEX_DDL:
+        conn.exec_driver_sql(ddl)
+    if not {"idx_item_batches_item_created", "idx_item_batches_item_qtyrem"} <= have:
+        # Keep the planner on ix_item_batches_open_fifo for FIFO reads.
+        conn.exec_driver_sql("ANALYZE item_batches")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: Sequence[Migration] = (
+    Migration(1, "create_tables", _create_tables),
+    Migration(2, "contact_columns", _contact_columns),
+    Migration(3, "item_type_location", _item_type_location),
+    Migration(4, "fifo_open_index", _fifo_open_index),
+    Migration(5, "movement_time_index", _movement_time_index),
+    Migration(6, "run_history_index", _run_history_index),
+    Migration(7, "stock_summary_backfill", _stock_summary_backfill),
+    Migration(8, "batch_ids_autoincrement", _batch_ids_autoincrement),
+    Migration(9, "legacy_columns", _legacy_columns),
+)
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+@dataclass
+class MigrationReport:
+    from_version: int
+    to_version: int
+    # {"version", "name", "ms"} per applied step, in order
+    steps: List[dict] = field(default_factory=list)
+    # tables that were missing although user_version said they were there
+    created_tables: List[str] = field(default_factory=list)
+    total_ms: float = 0.0
+
+    def summary(self) -> str:
+        created = f"; created missing tables {', '.join(self.created_tables)}" if self.created_tables else ""
+        if not self.steps:
+            return f"schema v{self.to_version} up to date ({self.total_ms:.1f} ms{created})"
+        steps = ", ".join(f"{s['version']} {s['name']} {s['ms']:.1f} ms" for s in self.steps)
+        return f"schema v{self.from_version} -> v{self.to_version} in {self.total_ms:.1f} ms ({steps}{created})"
+
+    def as_dict(self) -> dict:
+        return {
+            "from_version": self.from_version,
+            "to_version": self.to_version,
+            "steps": list(self.steps),
+            "created_tables": list(self.created_tables),
+            "total_ms": self.total_ms,
+        }
+
+
+LAST_REPORT: Optional[MigrationReport] = None
+
+
+def _user_version(conn: Connection) -> int:
+    return int(conn.exec_driver_sql("PRAGMA user_version").scalar() or 0)
+
+
+def run_migrations(engine: Engine, migrations: Sequence[Migration] = MIGRATIONS) -> MigrationReport:
+    """Apply pending steps in one transaction and record the new ``user_version``.
+
+    Declared tables missing from the file are created first, even when the
+    version is current.
+    """
 
-    ensure_vendors_schema(engine)
+    global LAST_REPORT
+    start = time.perf_counter()
+    target = migrations[-1].version
+    with engine.connect() as conn:
+        current = _user_version(conn)
+        report = MigrationReport(current, current)
+        if current < target or _missing_tables(conn):
+            # Take the write lock up front; DDL does not open a transaction by itself.
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock.
+                current = report.from_version = _user_version(conn)
+                if current >= 1:
+                    # Step 1 creates every table on a fresh file; past it,
+                    # repair whatever has gone missing since.
+                    report.created_tables = _missing_tables(conn)
+                    if report.created_tables:
+                        _create_tables(conn)
+                for step in migrations:
+                    if step.version <= current:
+                        continue
+                    t0 = time.perf_counter()
+                    step.apply(conn)
+                    ms = round((time.perf_counter() - t0) * 1000, 3)
+                    report.steps.append({"version": step.version, "name": step.name, "ms": ms})
+                conn.exec_driver_sql(f"PRAGMA user_version = {max(int(target), current)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            report.to_version = max(target, current)
+    report.total_ms = round((time.perf_counter() - start) * 1000, 3)
+    LAST_REPORT = report
+    return report
 
 
-__all__ = ["ensure_appdb_migrated", "ensure_vendors_flags"]
+__all__ = [
+    "FIFO_OPEN_INDEX_DDL",
+    "LEGACY_COLUMNS",
+    "LEGACY_INDEX_DDL",
+    "MIGRATIONS",
+    "MOVEMENT_TIME_INDEX_DDL",
+    "Migration",
+    "MigrationReport",
+    "RUN_HISTORY_INDEX_DDL",
+    "SCHEMA_VERSION",
+    "ensure_appdb_migrated",
+    "run_migrations",
+]
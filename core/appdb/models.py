@@ -9,14 +9,17 @@ from sqlalchemy import (
     Boolean,
     CheckConstraint,
     Column,
+    Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -68,6 +71,22 @@ class Item(Base):
 
 class ItemBatch(Base):
     __tablename__ = "item_batches"
+    __table_args__ = (
+        # Open FIFO layers in consumption order; depleted rows stay out of it.
+        # Keep in sync with core.appdb.migrate.FIFO_OPEN_INDEX_DDL.
+        Index(
+            "ix_item_batches_open_fifo",
+            "item_id",
+            "created_at",
+            "id",
+            "qty_remaining",
+            "unit_cost_cents",
+            sqlite_where=text("qty_remaining > 0"),
+        ),
+        # Ids are never handed out twice, so a layer moved to
+        # item_batches_closed keeps sole ownership of its id.
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True)
     item_id = Column(Integer, ForeignKey("items.id"), nullable=False, index=True)
@@ -80,6 +99,27 @@ class ItemBatch(Base):
     created_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
+class ItemBatchClosed(Base):
+    """Depleted FIFO layer moved out of ``item_batches``; keeps its original id.
+
+    See :mod:`core.appdb.batch_archive`.
+    """
+
+    __tablename__ = "item_batches_closed"
+    __table_args__ = (Index("ix_item_batches_closed_item", "item_id", "created_at", "id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    qty_initial = Column(Integer, nullable=False)
+    qty_remaining = Column(Integer, nullable=False, default=0)
+    unit_cost_cents = Column(Integer, nullable=False)
+    source_kind = Column(String, nullable=False)
+    source_id = Column(String, nullable=True)
+    is_oversold = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
 class ItemMovement(Base):
     __tablename__ = "item_movements"
     __table_args__ = (
@@ -97,18 +137,119 @@ class ItemMovement(Base):
     source_kind = Column(String, nullable=False)
     source_id = Column(String, nullable=True)
     is_oversold = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+
+
+class ItemStockSummary(Base):
+    """Per-item on-hand/valuation kept current by the ledger write paths."""
+
+    __tablename__ = "item_stock_summary"
+
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    on_hand = Column(Integer, nullable=False, default=0)
+    total_value_cents = Column(Integer, nullable=False, default=0)
+    open_layer_count = Column(Integer, nullable=False, default=0)
+    oldest_open_batch_id = Column(Integer, ForeignKey("item_batches.id"), nullable=True)
+    last_movement_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class LedgerCheckpoint(Base):
+    """Per-item on-hand/value snapshot as of ``as_of`` (see :mod:`core.appdb.checkpoints`)."""
+
+    __tablename__ = "ledger_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    as_of = Column(DateTime, nullable=False, unique=True)
+    # Highest movement id seen when the checkpoint was written; later ids that
+    # are dated at or before ``as_of`` are replayed on top of it.
+    last_movement_id = Column(Integer, nullable=False, default=0)
+    item_count = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
+class LedgerCheckpointItem(Base):
+    __tablename__ = "ledger_checkpoint_items"
+
+    checkpoint_id = Column(Integer, ForeignKey("ledger_checkpoints.id", ondelete="CASCADE"), primary_key=True)
+    item_id = Column(Integer, primary_key=True)
+    on_hand = Column(Integer, nullable=False, default=0)
+    value_cents = Column(Integer, nullable=False, default=0)
+
+
+
+class LedgerReconcileState(Base):
+    """High-water mark of the ledger reconciler (single row, see :mod:`core.ledger.health`)."""
+
+    __tablename__ = "ledger_reconcile_state"
+
+    id = Column(Integer, primary_key=True)
+    last_movement_id = Column(Integer, nullable=False, default=0)
+    last_run_at = Column(DateTime, nullable=True)
+    last_full_audit_at = Column(DateTime, nullable=True)
+    items_checked = Column(Integer, nullable=False, default=0)
+
+
+class LedgerReconcileProblem(Base):
+    """An item whose ``qty_stored`` disagrees with the sum of its open layers."""
+
+    __tablename__ = "ledger_reconcile_problems"
+
+    item_id = Column(Integer, primary_key=True)
+    items_qty = Column(Integer, nullable=False, default=0)
+    batch_sum = Column(Integer, nullable=False, default=0)
+    detected_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class LedgerDailyRollup(Base):
+    """Per-day, per-``source_kind`` movement totals (see :mod:`core.ledger.reporting`)."""
+
+    __tablename__ = "ledger_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    source_kind = Column(String, primary_key=True)
+    qty_in = Column(Integer, nullable=False, default=0)
+    qty_out = Column(Integer, nullable=False, default=0)
+    value_in_cents = Column(Integer, nullable=False, default=0)
+    # FIFO cost of what went out
+    cogs_cents = Column(Integer, nullable=False, default=0)
+    # Item price at the time the movement was rolled up (sales only)
+    sales_cents = Column(Integer, nullable=False, default=0)
+    movement_count = Column(Integer, nullable=False, default=0)
+
+
+class LedgerRollupState(Base):
+    """High-water mark of the daily rollups (single row)."""
+
+    __tablename__ = "ledger_rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    last_movement_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+
 __all__ = [
     "Base",
     "Item",
     "ItemBatch",
+    "ItemBatchClosed",
     "ItemMovement",
+    "ItemStockSummary",
+    "LedgerCheckpoint",
+    "LedgerCheckpointItem",
+    "LedgerDailyRollup",
+    "LedgerReconcileProblem",
+    "LedgerReconcileState",
+    "LedgerRollupState",
     "Vendor",
 ]
 
 # Import recipe/manufacturing models to attach to the shared Base
-from core.appdb.models_recipes import ManufacturingRun, Recipe, RecipeItem  # noqa: E402  # isort:skip
+from core.appdb.models_recipes import (  # noqa: E402  # isort:skip
+    ManufacturingJob,
+    ManufacturingRun,
+    Recipe,
+    RecipeItem,
+)
 
-__all__ += ["Recipe", "RecipeItem", "ManufacturingRun"]
+__all__ += ["Recipe", "RecipeItem", "ManufacturingRun", "ManufacturingJob"]
@@ -1,5 +1,5 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship, synonym
 from sqlalchemy.sql import func as sa_func, text
 
@@ -42,6 +42,13 @@ class RecipeItem(Base):
 
 class ManufacturingRun(Base):
     __tablename__ = "manufacturing_runs"
+    __table_args__ = (
+        # Run history, newest first (rowid rides along as the tie-breaker).
+        # Keep in sync with core.appdb.migrate.RUN_HISTORY_INDEX_DDL.
+        Index("ix_manufacturing_runs_executed", "executed_at"),
+        Index("ix_manufacturing_runs_recipe_executed", "recipe_id", "executed_at"),
+        Index("ix_manufacturing_runs_output_executed", "output_item_id", "executed_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True)
@@ -52,3 +59,20 @@ class ManufacturingRun(Base):
     executed_at = Column(DateTime, nullable=True)
     notes = Column(Text, nullable=True)
     meta = Column(Text, nullable=True)
+
+
+class ManufacturingJob(Base):
+    """Queued manufacturing run; see :mod:`core.manufacturing.jobs`."""
+
+    __tablename__ = "manufacturing_jobs"
+    __table_args__ = (Index("ix_manufacturing_jobs_status", "status", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False, default="queued")  # queued | running | completed | failed
+    payload = Column(Text, nullable=False)
+    run_id = Column(Integer, ForeignKey("manufacturing_runs.id"), nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=sa_func.now(), nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,156 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Keyset-paginated movement export.
+
+Rows are read ``PAGE_SIZE`` at a time with ``WHERE id > cursor`` (ascending)
+or ``WHERE id < cursor`` (descending) and encoded as NDJSON or CSV as they
+arrive, so memory stays flat for any export size. Every page is read in its
+own short transaction; a slow client never keeps a read lock open between
+pages, at the cost of not being a single point-in-time snapshot.
+
+``GET /app/ledger/movements/export`` streams from :func:`iter_movements`.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.appdb.checkpoints import parse_as_of
+from core.appdb.models import ItemMovement
+
+FORMATS = ("ndjson", "csv")
+PAGE_SIZE = 1000
+COLUMNS = (
+    "id",
+    "item_id",
+    "batch_id",
+    "qty_change",
+    "unit_cost_cents",
+    "source_kind",
+    "source_id",
+    "is_oversold",
+    "created_at",
+)
+
+
+@dataclass
+class MovementQuery:
+    item_id: Optional[int] = None
+    source_kind: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    order: str = "asc"
+    cursor: Optional[int] = None
+    limit: Optional[int] = None
+
+    def statement(self, cursor: Optional[int], size: int):
+        cols = [getattr(ItemMovement, c) for c in COLUMNS]
+        stmt = select(*cols)
+        if self.item_id is not None:
+            stmt = stmt.where(ItemMovement.item_id == int(self.item_id))
+        if self.source_kind is not None:
+            stmt = stmt.where(ItemMovement.source_kind == self.source_kind)
+        if self.since is not None:
+            stmt = stmt.where(ItemMovement.created_at >= self.since)
+        if self.until is not None:
+            stmt = stmt.where(ItemMovement.created_at <= self.until)
+        if self.order == "desc":
+            if cursor is not None:
+                stmt = stmt.where(ItemMovement.id < int(cursor))
+            stmt = stmt.order_by(ItemMovement.id.desc())
+        else:
+            if cursor is not None:
+                stmt = stmt.where(ItemMovement.id > int(cursor))
+            stmt = stmt.order_by(ItemMovement.id.asc())
+        return stmt.limit(int(size))
+
+
+def parse_since(raw: str) -> datetime:
+    """``YYYY-MM-DD`` means the start of that day; datetimes as in :func:`parse_as_of`."""
+
+    text = (raw or "").strip()
+    if len(text) == 10:
+        return datetime.fromisoformat(text)
+    return parse_as_of(text)
+
+
+def next_cursor(session: Session, query: MovementQuery) -> Optional[int]:
+    """Cursor for the page after a ``limit``-bounded export, or ``None`` if it is the last."""
+
+    if query.limit is None:
+        return None
+    stmt = query.statement(query.cursor, 2).offset(int(query.limit) - 1)
+    ids = [row.id for row in session.execute(stmt)]
+    return int(ids[0]) if len(ids) == 2 else None
+
+
+def _row_dict(row) -> dict:
+    return {
+        "id": int(row.id),
+        "item_id": int(row.item_id),
+        "batch_id": int(row.batch_id) if row.batch_id is not None else None,
+        "qty_change": int(row.qty_change),
+        "unit_cost_cents": int(row.unit_cost_cents or 0),
+        "source_kind": row.source_kind,
+        "source_id": row.source_id,
+        "is_oversold": bool(row.is_oversold),
+        "created_at": row.created_at.isoformat() if row.created_at is not None else None,
+    }
+
+
+def iter_movements(
+    session_factory: Callable[[], Session], query: MovementQuery, *, page_size: int = PAGE_SIZE
+) -> Iterator[List[dict]]:
+    """Yield pages of movement dicts until the filter (or ``limit``) is exhausted."""
+
+    cursor = query.cursor
+    left = query.limit
+    while left is None or left > 0:
+        size = page_size if left is None else min(page_size, left)
+        with session_factory() as db:
+            page = [_row_dict(r) for r in db.execute(query.statement(cursor, size))]
+        if not page:
+            return
+        yield page
+        if len(page) < size:
+            return
+        cursor = page[-1]["id"]
+        if left is not None:
+            left -= len(page)
+
+
+def encode_pages(pages: Iterator[List[dict]], fmt: str) -> Iterator[str]:
+    if fmt == "ndjson":
+        for page in pages:
+            yield "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in page)
+        return
+    if fmt != "csv":
+        raise ValueError(f"unsupported format: {fmt}")
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    yield buf.getvalue()
+    for page in pages:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(page)
+        yield buf.getvalue()
+
+
+__all__ = [
+    "COLUMNS",
+    "FORMATS",
+    "MovementQuery",
+    "PAGE_SIZE",
+    "encode_pages",
+    "iter_movements",
+    "next_cursor",
+    "parse_since",
+]
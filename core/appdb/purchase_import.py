@@ -0,0 +1,317 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Streaming bulk purchase import.
+
+Rows come from a CSV (header row) or NDJSON text stream and are parsed one at
+a time, so memory stays flat regardless of file size. Each row needs
+``item_id`` and ``qty`` and may carry ``uom`` (defaults to the item's base
+unit), ``unit_cost_cents`` (per base unit, like ``/app/ledger/purchase``) and
+``source_id``. Quantities are converted with
+:func:`core.metrics.metric.to_base_qty`.
+
+Valid rows are written like :func:`core.appdb.ledger.add_batch` would write
+them, one batch plus one movement each, but a chunk at a time. Each chunk
+uses an executemany insert and its own transaction. Bad rows are reported with
+their line number and skipped; they never abort the rest of the file.
+
+CLI: ``python -m core.appdb.purchase_import invoice.csv [--format ndjson]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from core.appdb.models import Item, ItemBatch, ItemMovement
+from core.appdb.stock_summary import ensure_summaries, record_layers_added
+from core.appdb.write_gate import begin_immediate
+from core.metrics.metric import UNIT_MULTIPLIER, _norm_unit, default_unit_for, to_base_qty
+
+FORMATS = ("csv", "ndjson")
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+class RowError(ValueError):
+    """A single import row that cannot be applied."""
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    failed: int = 0
+    chunks: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        # Only the first few errors are kept so a bad 100k-row file stays cheap.
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.failed == 0,
+            "imported": self.imported,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield ``(line_number, row)``; undecodable NDJSON lines yield a :class:`RowError`."""
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    if fmt != "ndjson":
+        raise ValueError(f"unsupported format: {fmt}")
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, RowError(f"invalid_json: {exc.msg}")
+            continue
+        yield line_no, row
+
+
+def _field(row: dict, name: str) -> Optional[str]:
+    val = row.get(name)
+    if val is None:
+        return None
+    val = str(val).strip()
+    return val or None
+
+
+def _parse_row(row: object, dimensions: Dict[int, str]) -> Tuple[int, int, int, Optional[str]]:
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("invalid_row")
+    raw_item = _field(row, "item_id")
+    try:
+        item_id = int(raw_item) if raw_item is not None else None
+    except ValueError:
+        item_id = None
+    if item_id is None:
+        raise RowError("invalid_item_id")
+    dimension = dimensions.get(item_id)
+    if dimension is None:
+        raise RowError("item_not_found")
+
+    uom = _norm_unit(_field(row, "uom") or default_unit_for(dimension))
+    if uom not in UNIT_MULTIPLIER.get(dimension, {}):
+        raise RowError(f"unsupported_uom: {uom} for {dimension}")
+    try:
+        qty_dec = Decimal((_field(row, "qty") or "").replace(",", ""))
+    except InvalidOperation:
+        raise RowError("invalid_quantity") from None
+    qty_int = to_base_qty(dimension, uom, qty_dec) if qty_dec.is_finite() else 0
+    if qty_int <= 0:
+        raise RowError("invalid_quantity")
+
+    raw_cost = _field(row, "unit_cost_cents")
+    try:
+        unit_cost_cents = int(raw_cost) if raw_cost is not None else 0
+    except ValueError:
+        raise RowError("invalid_unit_cost") from None
+    if unit_cost_cents < 0:
+        raise RowError("invalid_unit_cost")
+    return item_id, qty_int, unit_cost_cents, _field(row, "source_id")
+
+
+def _item_dimensions(session: Session, raw_rows: Iterable[object], known: Dict[int, str]) -> None:
+    wanted = set()
+    for row in raw_rows:
+        if isinstance(row, dict):
+            try:
+                wanted.add(int(str(row.get("item_id")).strip()))
+            except (TypeError, ValueError):
+                continue
+    wanted -= set(known)
+    if wanted:
+        stmt = select(Item.id, Item.dimension).where(Item.id.in_(wanted))
+        known.update((i, (d or "count").lower()) for i, d in session.execute(stmt))
+
+
+_BATCHES = ItemBatch.__table__
+_MOVEMENTS = ItemMovement.__table__
+_ADD_QTY = (
+    update(Item.__table__)
+    .where(Item.__table__.c.id == bindparam("b_item_id"))
+    .values(qty_stored=Item.__table__.c.qty_stored + bindparam("b_qty"))
+)
+
+
+def _write_chunk(
+    session: Session, rows: List[Tuple[int, int, int, Optional[str]]], source_kind: str
+) -> Tuple[int, int]:
+    """Insert one batch + one movement per row; returns the new batch id range.
+
+    Batches go in with a plain executemany (RETURNING would force SQLite into
+    one statement per row) and the matching movements are copied from every
+    batch above the pre-insert high-water mark. Nothing else can insert in
+    between: the chunk takes the write lock before it reads the mark.
+    """
+
+    conn = session.connection()
+    begin_immediate(conn)
+    ensure_summaries(session, {r[0] for r in rows})
+    batch_mark = conn.execute(select(func.coalesce(func.max(_BATCHES.c.id), 0))).scalar_one()
+    conn.execute(
+        insert(_BATCHES),
+        [
+            {
+                "item_id": item_id,
+                "qty_initial": qty,
+                "qty_remaining": qty,
+                "unit_cost_cents": cents,
+                "source_kind": source_kind,
+                "source_id": source_id,
+                "is_oversold": False,
+            }
+            for item_id, qty, cents, source_id in rows
+        ],
+    )
+    move_mark = conn.execute(select(func.coalesce(func.max(_MOVEMENTS.c.id), 0))).scalar_one()
+    new_batches = _BATCHES.c.id > batch_mark
+    conn.execute(
+        insert(_MOVEMENTS).from_select(
+            ["item_id", "batch_id", "qty_change", "unit_cost_cents", "source_kind", "source_id", "is_oversold"],
+            select(
+                _BATCHES.c.item_id,
+                _BATCHES.c.id,
+                _BATCHES.c.qty_initial,
+                _BATCHES.c.unit_cost_cents,
+                _BATCHES.c.source_kind,
+                _BATCHES.c.source_id,
+                _BATCHES.c.is_oversold,
+            )
+            .where(new_batches)
+            .order_by(_BATCHES.c.id),
+        )
+    )
+
+    last_moves = dict(
+        conn.execute(
+            select(_MOVEMENTS.c.item_id, func.max(_MOVEMENTS.c.id))
+            .where(_MOVEMENTS.c.id > move_mark)
+            .group_by(_MOVEMENTS.c.item_id)
+        ).all()
+    )
+    per_item = conn.execute(
+        select(
+            _BATCHES.c.item_id,
+            func.min(_BATCHES.c.id),
+            func.count(),
+            func.sum(_BATCHES.c.qty_initial),
+            func.sum(_BATCHES.c.qty_initial * _BATCHES.c.unit_cost_cents),
+        )
+        .where(new_batches)
+        .group_by(_BATCHES.c.item_id)
+    ).all()
+    conn.execute(_ADD_QTY, [{"b_item_id": item_id, "b_qty": int(qty)} for item_id, _, _, qty, _ in per_item])
+    for item_id, first_batch, layers, qty, value in per_item:
+        record_layers_added(session, item_id, first_batch, layers, int(qty), int(value), last_moves.get(item_id))
+    return batch_mark + 1, conn.execute(select(func.max(_BATCHES.c.id))).scalar_one()
+
+
+def import_purchases(
+    session: Session,
+    rows: Iterable[Tuple[int, object]],
+    *,
+    source_kind: str = "purchase",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[int, int, int], None]] = None,
+) -> ImportResult:
+    """Apply ``(line_number, row)`` pairs from :func:`iter_rows` in chunked transactions.
+
+    ``on_chunk(count, first_batch_id, last_batch_id)`` runs after each commit,
+    e.g. for journaling.
+    """
+
+    result = ImportResult()
+    dimensions: Dict[int, str] = {}
+    pending: List[Tuple[int, object]] = []
+
+    def _flush_pending() -> None:
+        _item_dimensions(session, (r for _, r in pending), dimensions)
+        valid: List[Tuple[int, int, int, Optional[str]]] = []
+        for line_no, row in pending:
+            try:
+                valid.append(_parse_row(row, dimensions))
+            except RowError as exc:
+                result.add_error(line_no, str(exc))
+        pending.clear()
+        if not valid:
+            return
+        try:
+            first_batch, last_batch = _write_chunk(session, valid, source_kind)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        result.imported += len(valid)
+        result.chunks += 1
+        if on_chunk is not None:
+            on_chunk(len(valid), first_batch, last_batch)
+
+    for line_no, row in rows:
+        pending.append((line_no, row))
+        if len(pending) >= chunk_size:
+            _flush_pending()
+    if pending:
+        _flush_pending()
+    return result
+
+
+def _main(argv: List[str]) -> int:
+    from core.appdb.engine import SessionLocal, get_engine
+
+    ap = argparse.ArgumentParser(prog="python -m core.appdb.purchase_import")
+    ap.add_argument("path", help="CSV or NDJSON file ('-' for stdin)")
+    ap.add_argument("--format", choices=FORMATS, default=None, help="defaults to the file extension")
+    ap.add_argument("--source-kind", default="purchase")
+    ap.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = ap.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    stream = (
+        io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+        if args.path == "-"
+        else open(args.path, encoding="utf-8-sig", newline="")
+    )
+    with stream, SessionLocal(bind=get_engine()) as db:
+        result = import_purchases(db, iter_rows(stream, fmt), source_kind=args.source_kind, chunk_size=args.chunk)
+    for err in result.errors:
+        print(f"[purchase-import] line {err['line']}: {err['error']}")
+    print(f"[purchase-import] imported {result.imported} row(s), {result.failed} failed")
+    return 0 if result.failed == 0 else 1
+
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "FORMATS",
+    "ImportResult",
+    "RowError",
+    "import_purchases",
+    "iter_rows",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""Prebuilt statements for the hot inventory queries.
+
+Building a ``select()`` and letting SQLAlchemy derive its cache key costs
+more than running it against a warm SQLite page cache. The statements here
+are built once at import with bound parameters (``expanding`` for id lists),
+so each call only binds values; their cache keys are memoized on the
+statement objects and the compiled SQL comes straight from the engine's
+compiled cache.
+
+Execute them with a parameter dict, e.g.
+``session.execute(OPEN_LAYERS, {"item_ids": [1, 2]})``.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import asc, bindparam, func, select
+
+from core.appdb.models import Item, ItemBatch, ItemMovement, ItemStockSummary, Vendor
+
+_item_id = bindparam("item_id")
+_item_ids = bindparam("item_ids", expanding=True)
+_fifo_order = (asc(ItemBatch.item_id), asc(ItemBatch.created_at), asc(ItemBatch.id))
+
+# Open quantity of one item (``item_id``).
+ON_HAND_ONE = select(func.coalesce(func.sum(ItemBatch.qty_remaining), 0)).where(ItemBatch.item_id == _item_id)
+
+# ``(item_id, on_hand)`` for items with open layers among ``item_ids``.
+ON_HAND_MANY = (
+    select(ItemBatch.item_id, func.sum(ItemBatch.qty_remaining))
+    .where(ItemBatch.item_id.in_(_item_ids), ItemBatch.qty_remaining > 0)
+    .group_by(ItemBatch.item_id)
+)
+
+# Open FIFO layers of ``item_ids`` as ORM rows, oldest first per item.
+OPEN_LAYERS = (
+    select(ItemBatch).where(ItemBatch.item_id.in_(_item_ids), ItemBatch.qty_remaining > 0).order_by(*_fifo_order)
+)
+OPEN_LAYERS_FOR_UPDATE = OPEN_LAYERS.with_for_update()
+
+# The same layers as plain ``(item_id, batch_id, qty_remaining, unit_cost_cents)`` tuples.
+OPEN_LAYER_TUPLES = (
+    select(ItemBatch.item_id, ItemBatch.id, ItemBatch.qty_remaining, ItemBatch.unit_cost_cents)
+    .where(ItemBatch.item_id.in_(_item_ids), ItemBatch.qty_remaining > 0)
+    .order_by(*_fifo_order)
+)
+
+# Every layer of one item (open or not), in FIFO order.
+ITEM_BATCHES = select(ItemBatch).where(ItemBatch.item_id == _item_id).order_by(*_fifo_order[1:])
+
+# Newest movement id, and the newest per item above ``after_id``; brackets a bulk insert.
+LAST_MOVEMENT_ID = select(func.coalesce(func.max(ItemMovement.id), 0))
+LAST_MOVEMENT_PER_ITEM = (
+    select(ItemMovement.item_id, func.max(ItemMovement.id))
+    .where(ItemMovement.id > bindparam("after_id"))
+    .group_by(ItemMovement.item_id)
+)
+# The movements above ``after_id`` as ORM rows, in insert order.
+MOVEMENTS_AFTER = select(ItemMovement).where(ItemMovement.id > bindparam("after_id")).order_by(ItemMovement.id)
+
+ITEMS_BY_IDS = select(Item).where(Item.id.in_(_item_ids))
+SUMMARIES_BY_IDS = select(ItemStockSummary).where(ItemStockSummary.item_id.in_(_item_ids))
+
+
+def item_listing_select():
+    """``(item, vendor_name, on_hand, fifo_unit_cost_cents)`` for every item, plus the on-hand column."""
+
+    on_hand = func.coalesce(ItemStockSummary.on_hand, 0)
+    stmt = (
+        select(Item, Vendor.name, on_hand, ItemBatch.unit_cost_cents)
+        .outerjoin(ItemStockSummary, ItemStockSummary.item_id == Item.id)
+        .outerjoin(ItemBatch, ItemBatch.id == ItemStockSummary.oldest_open_batch_id)
+        .outerjoin(Vendor, Vendor.id == Item.vendor_id)
+    )
+    return stmt, on_hand
+
+
+# One listing row (``item_id``).
+ITEM_ROW = item_listing_select()[0].where(Item.id == _item_id)
+
+
+__all__ = [
+    "ITEM_BATCHES",
+    "ITEM_ROW",
+    "ITEMS_BY_IDS",
+    "LAST_MOVEMENT_ID",
+    "LAST_MOVEMENT_PER_ITEM",
+    "MOVEMENTS_AFTER",
+    "ON_HAND_MANY",
+    "ON_HAND_ONE",
+    "OPEN_LAYERS",
+    "OPEN_LAYERS_FOR_UPDATE",
+    "OPEN_LAYER_TUPLES",
+    "SUMMARIES_BY_IDS",
+    "item_listing_select",
+]
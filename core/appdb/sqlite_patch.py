@@ -24,66 +24,72 @@ def ensure_vendors_schema(engine: Engine) -> None:
     """
 
     with engine.begin() as conn:
-        exists = conn.exec_driver_sql(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='vendors'"
-        ).first()
-        if not exists:
-            return
-
-        cols = _vendor_columns(conn)
-
-        def _add(col: str, ddl: str) -> None:
-            nonlocal cols
-            if col not in cols:
-                conn.exec_driver_sql(f"ALTER TABLE vendors ADD COLUMN {ddl}")
-                cols.add(col)
-
-        _add("is_vendor", "is_vendor INTEGER NOT NULL DEFAULT 0")
-        _add("is_org", "is_org INTEGER NOT NULL DEFAULT 0")
-        _add("role", "role TEXT DEFAULT 'contact'")
-        _add("contact", "contact TEXT")
-        _add("organization_id", "organization_id INTEGER")
-        _add("meta", "meta TEXT")
-
-        # Backfill sensible defaults
-        conn.exec_driver_sql(
-            "UPDATE vendors SET role='contact' WHERE role IS NULL OR trim(role)=''"
-        )
-        # Align flag columns with any legacy role/kind values
+        patch_vendors_schema(conn)
+
+
+def patch_vendors_schema(conn) -> None:
+    """:func:`ensure_vendors_schema` on an open connection; the caller owns the transaction."""
+
+    exists = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='vendors'"
+    ).first()
+    if not exists:
+        return
+
+    cols = _vendor_columns(conn)
+
+    def _add(col: str, ddl: str) -> None:
+        nonlocal cols
+        if col not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE vendors ADD COLUMN {ddl}")
+            cols.add(col)
+
+    _add("is_vendor", "is_vendor INTEGER NOT NULL DEFAULT 0")
+    _add("is_org", "is_org INTEGER NOT NULL DEFAULT 0")
+    _add("role", "role TEXT DEFAULT 'contact'")
+    _add("contact", "contact TEXT")
+    _add("organization_id", "organization_id INTEGER")
+    _add("meta", "meta TEXT")
+
+    # Backfill sensible defaults
+    conn.exec_driver_sql(
+        "UPDATE vendors SET role='contact' WHERE role IS NULL OR trim(role)=''"
+    )
+    # Align flag columns with any legacy role/kind values
+    conn.exec_driver_sql(
+        """
+        UPDATE vendors
+        SET is_vendor = CASE lower(coalesce(role, ''))
+            WHEN 'vendor' THEN 1
+            WHEN 'both' THEN 1
+            ELSE coalesce(is_vendor, 0)
+        END
+        """
+    )
+    if "kind" in cols:
         conn.exec_driver_sql(
             """
             UPDATE vendors
-            SET is_vendor = CASE lower(coalesce(role, ''))
-                WHEN 'vendor' THEN 1
-                WHEN 'both' THEN 1
-                ELSE coalesce(is_vendor, 0)
+            SET is_org = CASE lower(coalesce(kind, ''))
+                WHEN 'org' THEN 1
+                ELSE coalesce(is_org, 0)
             END
             """
         )
-        if "kind" in cols:
-            conn.exec_driver_sql(
-                """
-                UPDATE vendors
-                SET is_org = CASE lower(coalesce(kind, ''))
-                    WHEN 'org' THEN 1
-                    ELSE coalesce(is_org, 0)
-                END
-                """
-            )
-        else:
-            conn.exec_driver_sql("UPDATE vendors SET is_org = coalesce(is_org, 0)")
+    else:
+        conn.exec_driver_sql("UPDATE vendors SET is_org = coalesce(is_org, 0)")
 
-        conn.exec_driver_sql(
-            "UPDATE vendors SET meta='{}' WHERE meta IS NULL OR trim(meta)=''"
-        )
+    conn.exec_driver_sql(
+        "UPDATE vendors SET meta='{}' WHERE meta IS NULL OR trim(meta)=''"
+    )
 
-        # Helpful indexes for boolean filters
-        conn.exec_driver_sql(
-            "CREATE INDEX IF NOT EXISTS vendors_is_vendor_idx ON vendors(is_vendor)"
-        )
-        conn.exec_driver_sql(
-            "CREATE INDEX IF NOT EXISTS vendors_is_org_idx ON vendors(is_org)"
-        )
+    # Helpful indexes for boolean filters
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS vendors_is_vendor_idx ON vendors(is_vendor)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS vendors_is_org_idx ON vendors(is_org)"
+    )
 
 
-__all__ = ["ensure_vendors_schema"]
+__all__ = ["ensure_vendors_schema", "patch_vendors_schema"]
@@ -0,0 +1,285 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Incrementally maintained per-item stock summary.
+
+``item_stock_summary`` mirrors what would otherwise be re-aggregated from
+``item_batches`` on every read: on-hand quantity, remaining-layer value, the
+number of open layers, the oldest open layer and the last movement touching
+the item. The ledger write paths update it inside their own transaction via
+:func:`record_layer_added` and :func:`record_consumption`; call
+:func:`ensure_summaries` *before* mutating batches so a missing row is seeded
+from the pre-change state.
+
+Both record functions also note the item in ``session.info`` under
+:data:`LAYERS_CHANGED_KEY`, so caches derived from FIFO layers (see
+:mod:`core.manufacturing.costs`) can drop exactly the affected entries once
+the transaction commits.
+
+Run ``python -m core.appdb.stock_summary verify`` (or ``rebuild``) to check the
+table against the batches.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, delete, func, inspect, select
+from sqlalchemy.orm import Session
+
+from core.appdb import queries
+from core.appdb.models import ItemBatch, ItemMovement, ItemStockSummary
+
+_PINNED_KEY = "stock_summary_rows"
+# Items whose open layers changed in the current transaction.
+LAYERS_CHANGED_KEY = "stock_layers_changed"
+SUMMARY_FIELDS = ("on_hand", "total_value_cents", "open_layer_count", "oldest_open_batch_id", "last_movement_id")
+
+
+def _empty() -> dict:
+    return {
+        "on_hand": 0,
+        "total_value_cents": 0,
+        "open_layer_count": 0,
+        "oldest_open_batch_id": None,
+        "last_movement_id": None,
+    }
+
+
+def compute_from_batches(session: Session, item_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+    """Aggregate the summary fields straight from ``item_batches``/``item_movements``."""
+
+    ids = None if item_ids is None else sorted({int(i) for i in item_ids})
+    if ids == []:
+        return {}
+
+    ranked = select(
+        ItemBatch.item_id.label("item_id"),
+        ItemBatch.id.label("batch_id"),
+        ItemBatch.qty_remaining.label("qty_remaining"),
+        ItemBatch.unit_cost_cents.label("unit_cost_cents"),
+        func.row_number()
+        .over(partition_by=ItemBatch.item_id, order_by=(ItemBatch.created_at.asc(), ItemBatch.id.asc()))
+        .label("layer_rank"),
+    ).where(ItemBatch.qty_remaining > 0)
+    if ids is not None:
+        ranked = ranked.where(ItemBatch.item_id.in_(ids))
+    ranked = ranked.subquery("open_layers")
+    layers = select(
+        ranked.c.item_id,
+        func.sum(ranked.c.qty_remaining),
+        func.sum(ranked.c.qty_remaining * ranked.c.unit_cost_cents),
+        func.count(),
+        func.max(case((ranked.c.layer_rank == 1, ranked.c.batch_id))),
+    ).group_by(ranked.c.item_id)
+
+    moves = select(ItemMovement.item_id, func.max(ItemMovement.id)).group_by(ItemMovement.item_id)
+    if ids is not None:
+        moves = moves.where(ItemMovement.item_id.in_(ids))
+
+    out: Dict[int, dict] = {}
+
+    def _blank(item_id: int) -> dict:
+        return out.setdefault(int(item_id), _empty())
+
+    for item_id, on_hand, value, count, oldest in session.execute(layers):
+        row = _blank(item_id)
+        row["on_hand"] = int(on_hand or 0)
+        row["total_value_cents"] = int(value or 0)
+        row["open_layer_count"] = int(count or 0)
+        row["oldest_open_batch_id"] = int(oldest) if oldest is not None else None
+    for item_id, last_id in session.execute(moves):
+        _blank(item_id)["last_movement_id"] = int(last_id) if last_id is not None else None
+    return out
+
+
+def ensure_summaries(session: Session, item_ids: Iterable[int]) -> Dict[int, ItemStockSummary]:
+    """Return summary rows for ``item_ids``, seeding missing ones from the batches."""
+
+    ids = sorted({int(i) for i in item_ids})
+    if not ids:
+        return {}
+    # Rows already loaded in this session need no round-trip.
+    rows: Dict[int, ItemStockSummary] = {}
+    for i in ids:
+        cached = session.identity_map.get(session.identity_key(ItemStockSummary, i))
+        # Expired rows (e.g. after a commit) are refreshed by the batched select below.
+        if cached is not None and not inspect(cached).expired:
+            rows[i] = cached
+    unloaded = [i for i in ids if i not in rows]
+    if unloaded:
+        found = session.execute(queries.SUMMARIES_BY_IDS, {"item_ids": unloaded}).scalars()
+        rows.update((s.item_id, s) for s in found)
+    missing = [i for i in ids if i not in rows]
+    if missing:
+        seeded = compute_from_batches(session, missing)
+        for item_id in missing:
+            row = ItemStockSummary(item_id=item_id, **(seeded.get(item_id) or _empty()))
+            session.add(row)
+            rows[item_id] = row
+        # Flush so a later lookup in the same transaction finds the seeded rows.
+        session.flush(list(rows[i] for i in missing))
+    # The identity map only holds weak references; pin the rows for the life of
+    # the session so the record_* calls that follow don't re-query them.
+    session.info.setdefault(_PINNED_KEY, {}).update(rows)
+    return rows
+
+
+def _bump_last_movement(summary: ItemStockSummary, movement_id: Optional[int]) -> None:
+    if movement_id is not None and int(movement_id) > int(summary.last_movement_id or 0):
+        summary.last_movement_id = int(movement_id)
+
+
+def record_layer_added(
+    session: Session,
+    item_id: int,
+    batch_id: int,
+    qty: int,
+    unit_cost_cents: int,
+    movement_id: Optional[int] = None,
+) -> ItemStockSummary:
+    """Apply a newly opened layer (the newest one for the item) to its summary."""
+
+    return record_layers_added(
+        session, item_id, batch_id, 1, int(qty), int(qty) * int(unit_cost_cents or 0), movement_id
+    )
+
+
+def record_layers_added(
+    session: Session,
+    item_id: int,
+    first_batch_id: int,
+    layer_count: int,
+    qty: int,
+    value_cents: int,
+    movement_id: Optional[int] = None,
+) -> ItemStockSummary:
+    """Bulk form of :func:`record_layer_added` for ``layer_count`` new layers.
+
+    ``qty``/``value_cents`` are totals over the new layers and
+    ``first_batch_id`` is the oldest of them.
+    """
+
+    summary = ensure_summaries(session, [item_id])[int(item_id)]
+    session.info.setdefault(LAYERS_CHANGED_KEY, set()).add(int(item_id))
+    summary.on_hand = int(summary.on_hand or 0) + int(qty)
+    summary.total_value_cents = int(summary.total_value_cents or 0) + int(value_cents)
+    summary.open_layer_count = int(summary.open_layer_count or 0) + int(layer_count)
+    if summary.oldest_open_batch_id is None:
+        summary.oldest_open_batch_id = int(first_batch_id)
+    _bump_last_movement(summary, movement_id)
+    return summary
+
+
+def record_consumption(
+    session: Session,
+    item_id: int,
+    open_batches: Sequence[ItemBatch],
+    qty: int,
+    value_cents: int,
+    movement_id: Optional[int] = None,
+) -> ItemStockSummary:
+    """Apply a FIFO consumption to the item's summary.
+
+    ``open_batches`` are every layer that was open before the consumption, in
+    FIFO order and already decremented; the first one still holding stock is
+    the new oldest open layer.
+    """
+
+    summary = ensure_summaries(session, [item_id])[int(item_id)]
+    session.info.setdefault(LAYERS_CHANGED_KEY, set()).add(int(item_id))
+    closed = sum(1 for b in open_batches if int(b.qty_remaining or 0) <= 0)
+    summary.on_hand = int(summary.on_hand or 0) - int(qty)
+    summary.total_value_cents = int(summary.total_value_cents or 0) - int(value_cents)
+    summary.open_layer_count = max(int(summary.open_layer_count or 0) - closed, 0)
+    summary.oldest_open_batch_id = next(
+        (int(b.id) for b in open_batches if int(b.qty_remaining or 0) > 0), None
+    )
+    _bump_last_movement(summary, movement_id)
+    return summary
+
+
+def drop_summary(session: Session, item_id: int) -> None:
+    session.execute(delete(ItemStockSummary).where(ItemStockSummary.item_id == int(item_id)))
+
+
+def verify_summary(session: Session) -> List[dict]:
+    """Compare every stored summary row with a fresh aggregate; return mismatches."""
+
+    expected = compute_from_batches(session)
+    stored = {s.item_id: s for s in session.execute(select(ItemStockSummary)).scalars()}
+    problems: List[dict] = []
+    for item_id in sorted(set(expected) | set(stored)):
+        want = expected.get(item_id)
+        have = stored.get(item_id)
+        if have is None:
+            if want and (want["on_hand"] or want["open_layer_count"]):
+                problems.append({"item_id": item_id, "reason": "missing_summary", "expected": want})
+            continue
+        actual = {f: getattr(have, f) for f in SUMMARY_FIELDS}
+        want = want or _empty()
+        diff = {f: {"expected": want[f], "stored": actual[f]} for f in SUMMARY_FIELDS if want[f] != actual[f]}
+        if diff:
+            problems.append({"item_id": item_id, "reason": "mismatch", "fields": diff})
+    return problems
+
+
+def rebuild_summary(session: Session) -> int:
+    """Replace the whole table with a fresh aggregate. Caller commits."""
+
+    session.flush()
+    fresh = compute_from_batches(session)
+    session.execute(delete(ItemStockSummary))
+    session.add_all(ItemStockSummary(item_id=item_id, **values) for item_id, values in fresh.items())
+    session.flush()
+    return len(fresh)
+
+
+def ensure_summary_populated(session: Session) -> bool:
+    """Backfill the table once for databases that predate it. Caller commits."""
+
+    has_rows = session.execute(select(ItemStockSummary.item_id).limit(1)).first() is not None
+    if has_rows:
+        return False
+    has_batches = session.execute(select(ItemBatch.id).limit(1)).first() is not None
+    if not has_batches:
+        return False
+    rebuild_summary(session)
+    return True
+
+
+def _main(argv: List[str]) -> int:
+    from core.appdb.engine import SessionLocal, get_engine
+
+    cmd = argv[0] if argv else "verify"
+    if cmd not in {"verify", "rebuild"}:
+        print("usage: python -m core.appdb.stock_summary [verify|rebuild]")
+        return 2
+    with SessionLocal(bind=get_engine()) as db:
+        if cmd == "rebuild":
+            count = rebuild_summary(db)
+            db.commit()
+            print(f"[stock-summary] rebuilt {count} item rows")
+            return 0
+        problems = verify_summary(db)
+        for p in problems:
+            print(f"[stock-summary] item {p['item_id']}: {p['reason']} {p.get('fields') or p.get('expected')}")
+        print(f"[stock-summary] {len(problems)} problem(s)")
+        return 1 if problems else 0
+
+
+__all__ = [
+    "LAYERS_CHANGED_KEY",
+    "compute_from_batches",
+    "drop_summary",
+    "ensure_summaries",
+    "ensure_summary_populated",
+    "rebuild_summary",
+    "record_consumption",
+    "record_layer_added",
+    "record_layers_added",
+    "verify_summary",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,194 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""One writer at a time, in arrival order.
+
+SQLite allows a single write transaction per database. Left alone, writers
+that collide spin in SQLite's busy handler, are served in no particular
+order and give up with ``database is locked``. :class:`WriteGate` puts them
+in a FIFO queue instead: :func:`attach` makes every connection of an engine
+take the gate before its first write statement and hand it back when the
+transaction ends, and raw ``sqlite3`` writers use :meth:`WriteGate.hold`.
+Readers never touch the gate. Writers that read first start their
+transaction with :func:`begin_immediate`, so they hold the gate from the
+first read on.
+
+The gate records how long writers waited for it; :meth:`WriteGate.stats`
+feeds ``GET /dev/db/stats``. Opportunistic writers (GET routes that refresh
+stored state) use :func:`wait_limit` to give up at once instead of queueing.
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Hashable, Iterator, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+
+_WRITE_RE = re.compile(
+    r"^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER|REINDEX|VACUUM|BEGIN\s+(IMMEDIATE|EXCLUSIVE))\b",
+    re.IGNORECASE,
+)
+# Keys in the pool record's ``info``: the connection currently holds the gate;
+# the longest its next write may wait for it (see wait_limit).
+_HOLDS = "write_gate_held"
+_WAIT = "write_gate_wait"
+_LOCKED = "database is locked (write queue timeout)"
+
+
+def is_write(statement: str) -> bool:
+    return bool(_WRITE_RE.match(statement or ""))
+
+
+class WriteGate:
+    """FIFO lock owned by a connection (or any hashable key), not a thread."""
+
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._queue: Deque[object] = deque()
+        self._owner: Optional[Hashable] = None
+        self._acquired = 0
+        self._contended = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_last = 0.0
+
+    def acquire(self, owner: Hashable, timeout: Optional[float] = None) -> bool:
+        """Wait for the gate in arrival order; ``False`` after ``timeout`` seconds."""
+
+        limit = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        with self._cond:
+            if self._owner is None and not self._queue:
+                self._take(owner, 0.0)
+                return True
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = start + limit
+            try:
+                while self._owner is not None or self._queue[0] is not ticket:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                # The next in line may be free to go now.
+                self._cond.notify_all()
+            self._take(owner, time.perf_counter() - start)
+            return True
+
+    def _take(self, owner: Hashable, waited: float) -> None:
+        self._owner = owner
+        self._acquired += 1
+        if waited > 0:
+            self._contended += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._wait_last = waited
+
+    def release(self, owner: Hashable) -> None:
+        with self._cond:
+            if self._owner == owner:
+                self._owner = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def hold(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold the gate around a raw ``sqlite3`` write."""
+
+        owner = object()
+        if not self.acquire(owner, timeout):
+            raise sqlite3.OperationalError(_LOCKED)
+        try:
+            yield
+        finally:
+            self.release(owner)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "acquired": self._acquired,
+                "contended": self._contended,
+                "timeouts": self._timeouts,
+                "waiting": len(self._queue),
+                "held": self._owner is not None,
+                "wait_ms_total": round(self._wait_total * 1000.0, 3),
+                "wait_ms_avg": round(self._wait_total * 1000.0 / self._acquired, 3) if self._acquired else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000.0, 3),
+                "wait_ms_last": round(self._wait_last * 1000.0, 3),
+            }
+
+
+def attach(engine: Engine, gate: WriteGate) -> None:
+    """Make ``engine``'s connections queue on ``gate`` before writing."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _take(conn, _cursor, statement, parameters, _context, _executemany):
+        info = conn.info
+        if info.get(_HOLDS) or not is_write(statement):
+            return
+        if not gate.acquire(id(info), info.get(_WAIT)):
+            # Same shape as SQLite's own busy timeout, so existing handlers apply.
+            raise exc.OperationalError(statement, parameters, sqlite3.OperationalError(_LOCKED))
+        info[_HOLDS] = True
+
+    def _give(info) -> None:
+        if info.pop(_HOLDS, False):
+            gate.release(id(info))
+
+    event.listen(engine, "commit", lambda conn: _give(conn.info))
+    event.listen(engine, "rollback", lambda conn: _give(conn.info))
+
+    # Sessions closed without commit roll back in the pool, not through the Connection.
+    @event.listens_for(engine.pool, "reset")
+    def _on_reset(_dbapi_connection, connection_record, _reset_state):
+        _give(connection_record.info)
+
+    @event.listens_for(engine.pool, "invalidate")
+    def _on_invalidate(_dbapi_connection, connection_record, _exception):
+        _give(connection_record.info)
+
+    @event.listens_for(engine.pool, "checkin")
+    def _on_checkin(_dbapi_connection, connection_record):
+        if connection_record is not None:
+            _give(connection_record.info)
+
+
+def begin_immediate(conn) -> None:
+    """Start ``conn``'s transaction with ``BEGIN IMMEDIATE`` unless one is open.
+
+    The write lock (and, on a gated engine, the gate) is then held from the
+    first read on, so reads that later writes depend on cannot go stale.
+    """
+
+    if not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@contextmanager
+def wait_limit(conn, seconds: float) -> Iterator[None]:
+    """Cap how long writes on ``conn`` wait for the gate (``0``: not at all).
+
+    A write that runs out of time raises the usual ``database is locked``
+    OperationalError.
+    """
+
+    info = conn.info
+    info[_WAIT] = seconds
+    try:
+        yield
+    finally:
+        info.pop(_WAIT, None)
+
+
+__all__ = ["WriteGate", "attach", "begin_immediate", "is_write", "wait_limit"]
@@ -1,41 +1,230 @@
 # Copyright (C) 2025 BUS Core Authors
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
-# core/ledger/health.py
-import sqlite3
-from core.appdb.paths import resolve_db_path
-DB_PATH = resolve_db_path()
-
-def _select_on_hand_column(cur) -> str | None:
-    cur.execute("PRAGMA table_info(items)")
-    cols = {r[1] for r in cur.fetchall()}
-    if "qty" in cols:
-        return "qty"
-    if "qty_stored" in cols:
-        return "qty_stored"
-    return None
-
-
-def health_summary():
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
+"""Ledger reconciliation: ``items.qty_stored`` against the sum of open layers.
+
+Results are persisted in ``ledger_reconcile_problems`` together with a
+high-water mark (the highest movement id already reconciled), so
+``GET /app/ledger/health`` only re-checks the items that have moved since the
+previous call and otherwise just reads the stored report.
+
+A direct edit of ``qty_stored`` writes no movement and is only noticed by a
+full audit. ``GET /app/ledger/health?full=true`` starts one in a background
+thread, as does the first call on a database (which only seeds the mark).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from core.appdb.models import Item, ItemBatch, ItemMovement, LedgerReconcileProblem, LedgerReconcileState
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 500
+_STATE_ID = 1
+
+_audit_lock = threading.Lock()
+_audit = {"running": False, "started_at": None, "finished_at": None, "items_checked": None, "error": None}
+
+
+def find_mismatches(session: Session, item_ids: Optional[Sequence[int]] = None) -> List[Tuple[int, int, int]]:
+    """``(item_id, qty_stored, batch_sum)`` for every item that disagrees."""
+
+    batch_sum = func.coalesce(func.sum(ItemBatch.qty_remaining), 0)
+    stmt = (
+        select(Item.id, Item.qty_stored, batch_sum)
+        .outerjoin(ItemBatch, ItemBatch.item_id == Item.id)
+        .group_by(Item.id, Item.qty_stored)
+        .having(func.coalesce(Item.qty_stored, 0) != batch_sum)
+    )
+    if item_ids is not None:
+        stmt = stmt.where(Item.id.in_(list(item_ids)))
+    return [(int(i), int(q or 0), int(s or 0)) for i, q, s in session.execute(stmt)]
+
+
+def _state(session: Session) -> Optional[LedgerReconcileState]:
+    return session.get(LedgerReconcileState, _STATE_ID)
+
+
+def _max_movement_id(session: Session) -> int:
+    return int(session.execute(select(func.coalesce(func.max(ItemMovement.id), 0))).scalar_one())
+
+
+def _store(session: Session, rows: Iterable[Tuple[int, int, int]], now: datetime) -> None:
+    payload = [{"item_id": i, "items_qty": q, "batch_sum": s, "detected_at": now} for i, q, s in rows]
+    if payload:
+        session.execute(insert(LedgerReconcileProblem), payload)
+
+
+def run_full_audit(session: Session, *, now: Optional[datetime] = None) -> int:
+    """Re-check every item and replace the stored report. Caller commits."""
+
+    now = now or datetime.utcnow()
+    # Anything written after this mark is picked up by the next incremental pass.
+    mark = _max_movement_id(session)
+    mismatches = find_mismatches(session)
+    checked = int(session.execute(select(func.count()).select_from(Item)).scalar_one())
+
+    session.execute(delete(LedgerReconcileProblem))
+    _store(session, mismatches, now)
+    state = _state(session)
+    if state is None:
+        state = LedgerReconcileState(id=_STATE_ID)
+        session.add(state)
+    state.last_movement_id = mark
+    state.last_run_at = now
+    state.last_full_audit_at = now
+    state.items_checked = checked
+    session.flush()
+    return checked
+
+
+def reconcile_incremental(session: Session, *, now: Optional[datetime] = None) -> int:
+    """Re-check items with movements above the high-water mark. Caller commits.
+
+    Returns the number of items checked; 0 when nothing has moved. The first
+    call on a database only records the current mark: the items that existed
+    before it are left to a full audit (:func:`start_full_audit`).
+    """
+
+    state = _state(session)
+    if state is None:
+        session.add(
+            LedgerReconcileState(
+                id=_STATE_ID,
+                last_movement_id=_max_movement_id(session),
+                last_run_at=now or datetime.utcnow(),
+                items_checked=0,
+            )
+        )
+        session.flush()
+        return 0
+    mark = _max_movement_id(session)
+    if mark <= int(state.last_movement_id or 0):
+        return 0
+
+    now = now or datetime.utcnow()
+    touched = (
+        session.execute(
+            select(ItemMovement.item_id)
+            .where(ItemMovement.id > int(state.last_movement_id or 0), ItemMovement.id <= mark)
+            .distinct()
+        )
+        .scalars()
+        .all()
+    )
+    for start in range(0, len(touched), _CHUNK):
+        chunk = touched[start : start + _CHUNK]
+        mismatches = find_mismatches(session, chunk)
+        session.execute(delete(LedgerReconcileProblem).where(LedgerReconcileProblem.item_id.in_(chunk)))
+        _store(session, mismatches, now)
+    state.last_movement_id = mark
+    state.last_run_at = now
+    state.items_checked = len(touched)
+    session.flush()
+    return len(touched)
+
+
+def audit_status() -> dict:
+    with _audit_lock:
+        return dict(_audit)
+
+
+def _audit_worker(session_factory: Callable[[], Session]) -> None:
+    checked = None
+    error = None
     try:
-        qty_col = _select_on_hand_column(cur)
-        if qty_col is None:
-            return {"desync": True, "problems": [{"reason": "No qty column in items"}]}
-
-        cur.execute(
-            f"""
-            SELECT i.id, i.name, {qty_col} AS onhand,
-                   IFNULL((SELECT SUM(qty_remaining) FROM item_batches b WHERE b.item_id=i.id), 0.0) AS valued_qty
-            FROM items i
-            """
+        with session_factory() as db:
+            checked = run_full_audit(db)
+            db.commit()
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.exception("ledger full audit failed")
+        error = str(exc)
+    with _audit_lock:
+        _audit.update(
+            running=False,
+            finished_at=datetime.utcnow().isoformat() + "Z",
+            items_checked=checked,
+            error=error,
         )
-        problems = []
-        for iid, name, onhand, valued in cur.fetchall():
-            if round(float(onhand or 0), 4) != round(float(valued or 0), 4):
-                problems.append({"item_id": iid, "name": name, "items_qty": onhand, "batch_sum": valued})
-        return {"desync": len(problems) > 0, "problems": problems, "using": qty_col}
-    finally:
-        con.close()
 
+
+def start_full_audit(session_factory: Callable[[], Session]) -> Optional[threading.Thread]:
+    """Run :func:`run_full_audit` in a worker thread; ``None`` if one is already running."""
+
+    with _audit_lock:
+        if _audit["running"]:
+            return None
+        _audit.update(
+            running=True,
+            started_at=datetime.utcnow().isoformat() + "Z",
+            finished_at=None,
+            items_checked=None,
+            error=None,
+        )
+    worker = threading.Thread(target=_audit_worker, args=(session_factory,), name="ledger-audit", daemon=True)
+    worker.start()
+    return worker
+
+
+def health_report(session: Session) -> dict:
+    """The persisted reconciliation result; does not re-check anything."""
+
+    state = _state(session)
+    problems = [
+        {"item_id": int(item_id), "name": name, "items_qty": int(qty), "batch_sum": int(total)}
+        for item_id, name, qty, total in session.execute(
+            select(
+                LedgerReconcileProblem.item_id,
+                Item.name,
+                LedgerReconcileProblem.items_qty,
+                LedgerReconcileProblem.batch_sum,
+            )
+            .outerjoin(Item, Item.id == LedgerReconcileProblem.item_id)
+            .order_by(LedgerReconcileProblem.item_id)
+        )
+    ]
+    return {
+        "desync": bool(problems),
+        "problems": problems,
+        "using": "qty_stored",
+        "checked_through_movement_id": int(state.last_movement_id) if state else None,
+        "last_run_at": state.last_run_at.isoformat() if state and state.last_run_at else None,
+        "last_full_audit_at": (
+            state.last_full_audit_at.isoformat() if state and state.last_full_audit_at else None
+        ),
+        "items_checked": int(state.items_checked) if state else 0,
+        "audit": audit_status(),
+    }
+
+
+def health_summary(session: Optional[Session] = None) -> dict:
+    """One-off full check without touching the stored report."""
+
+    if session is None:
+        from core.appdb.engine import SessionLocal, get_engine
+
+        with SessionLocal(bind=get_engine()) as db:
+            return health_summary(db)
+    mismatches = find_mismatches(session)
+    names = dict(session.execute(select(Item.id, Item.name).where(Item.id.in_([m[0] for m in mismatches]))).all())
+    problems = [{"item_id": i, "name": names.get(i), "items_qty": q, "batch_sum": s} for i, q, s in mismatches]
+    return {"desync": len(problems) > 0, "problems": problems, "using": "qty_stored"}
+
+
+__all__ = [
+    "audit_status",
+    "find_mismatches",
+    "health_report",
+    "health_summary",
+    "reconcile_incremental",
+    "run_full_audit",
+    "start_full_audit",
+]
@@ -0,0 +1,282 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+"""Margin, COGS and waste reporting from daily movement rollups.
+
+``ledger_daily_rollups`` holds one row per (UTC day, ``source_kind``): units
+in and out, the cost value of what came in, the FIFO cost of what went out
+(COGS) and, for sales, the sales value at the item's price. The rollups are
+brought up to date by :func:`refresh_rollups`, which only reads movements
+above the stored high-water mark, so reports cost the same however long the
+ledger gets: a 365-day window is at most a few thousand rollup rows.
+
+Movement values use ``qty_change * unit_cost_cents`` like the valuation and
+stock summary. Sales are priced at ``Item.price`` per display unit when the
+movement is rolled up; a later price change does not rewrite past days.
+
+SQLite serialises writers and movement ids are assigned in commit order, so a
+high-water mark never skips a movement that commits later.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from core.appdb.models import Item, ItemMovement, LedgerDailyRollup, LedgerRollupState
+from core.metrics.metric import uom_multiplier
+
+REVENUE_KINDS = ("sold",)
+WASTE_KINDS = ("loss", "theft")
+# Inflows that are not purchases: built goods and stock corrections.
+INTERNAL_IN_KINDS = ("manufacturing", "adjustment")
+
+MAX_WINDOW_DAYS = 3660
+_CHUNK = 50_000
+_STATE_ID = 1
+_WINDOW_RE = re.compile(r"^\s*(\d{1,4})\s*d?\s*$", re.IGNORECASE)
+
+_Key = Tuple[date, str]
+
+
+def parse_window(raw: str) -> int:
+    """``"30d"`` (or ``"30"``) -> 30; raises ``ValueError`` outside 1..MAX_WINDOW_DAYS."""
+
+    m = _WINDOW_RE.match(raw or "")
+    days = int(m.group(1)) if m else 0
+    if not 1 <= days <= MAX_WINDOW_DAYS:
+        raise ValueError(raw)
+    return days
+
+
+def _state(session: Session) -> Optional[LedgerRollupState]:
+    return session.get(LedgerRollupState, _STATE_ID)
+
+
+def _sales_cents(qty: int, price: Optional[float], dimension: Optional[str], uom: Optional[str]) -> int:
+    if not price:
+        return 0
+    return int(round(qty / float(uom_multiplier(dimension or "count", uom or "ea")) * float(price) * 100))
+
+
+def _aggregate(session: Session, after: int, upto: int) -> Dict[_Key, List[int]]:
+    qty = ItemMovement.qty_change
+    value = qty * func.coalesce(ItemMovement.unit_cost_cents, 0)
+    stmt = (
+        select(
+            func.date(ItemMovement.created_at),
+            ItemMovement.source_kind,
+            ItemMovement.item_id,
+            func.sum(case((qty > 0, qty), else_=0)),
+            func.sum(case((qty < 0, -qty), else_=0)),
+            func.sum(case((qty > 0, value), else_=0)),
+            func.sum(case((qty < 0, -value), else_=0)),
+            func.count(),
+        )
+        .where(ItemMovement.id > after, ItemMovement.id <= upto)
+        .group_by(func.date(ItemMovement.created_at), ItemMovement.source_kind, ItemMovement.item_id)
+    )
+    rows = session.execute(stmt).all()
+    sold_ids = {int(r[2]) for r in rows if r[1] in REVENUE_KINDS}
+    prices = {}
+    if sold_ids:
+        prices = {
+            int(i): (p, d, u)
+            for i, p, d, u in session.execute(
+                select(Item.id, Item.price, Item.dimension, Item.uom).where(Item.id.in_(sold_ids))
+            )
+        }
+
+    out: Dict[_Key, List[int]] = {}
+    for day, kind, item_id, q_in, q_out, v_in, v_out, count in rows:
+        key = (date.fromisoformat(str(day)), kind or "unknown")
+        acc = out.setdefault(key, [0, 0, 0, 0, 0, 0])
+        acc[0] += int(q_in or 0)
+        acc[1] += int(q_out or 0)
+        acc[2] += int(v_in or 0)
+        acc[3] += int(v_out or 0)
+        if kind in REVENUE_KINDS and int(item_id) in prices:
+            acc[4] += _sales_cents(int(q_out or 0), *prices[int(item_id)])
+        acc[5] += int(count)
+    return out
+
+
+def _apply(session: Session, totals: Dict[_Key, List[int]]) -> None:
+    if not totals:
+        return
+    days = sorted({day for day, _ in totals})
+    existing = {
+        (r.day, r.source_kind): r
+        for r in session.execute(select(LedgerDailyRollup).where(LedgerDailyRollup.day.in_(days))).scalars()
+    }
+    for key, (q_in, q_out, v_in, cogs, sales, count) in totals.items():
+        row = existing.get(key)
+        if row is None:
+            row = LedgerDailyRollup(
+                day=key[0],
+                source_kind=key[1],
+                qty_in=0,
+                qty_out=0,
+                value_in_cents=0,
+                cogs_cents=0,
+                sales_cents=0,
+                movement_count=0,
+            )
+            session.add(row)
+        row.qty_in += q_in
+        row.qty_out += q_out
+        row.value_in_cents += v_in
+        row.cogs_cents += cogs
+        row.sales_cents += sales
+        row.movement_count += count
+
+
+def refresh_rollups(session: Session, *, now: Optional[datetime] = None) -> int:
+    """Fold movements above the high-water mark into the rollups. Caller commits.
+
+    Returns the number of movements processed.
+    """
+
+    state = _state(session)
+    if state is None:
+        state = LedgerRollupState(id=_STATE_ID, last_movement_id=0)
+        session.add(state)
+    after = int(state.last_movement_id or 0)
+    top = int(session.execute(select(func.coalesce(func.max(ItemMovement.id), 0))).scalar_one())
+    processed = 0
+    while after < top:
+        upto = min(after + _CHUNK, top)
+        totals = _aggregate(session, after, upto)
+        _apply(session, totals)
+        processed += sum(acc[5] for acc in totals.values())
+        after = upto
+    state.last_movement_id = after
+    state.updated_at = now or datetime.utcnow()
+    session.flush()
+    return processed
+
+
+def rebuild_rollups(session: Session) -> int:
+    """Drop and recompute every rollup from the movements. Caller commits."""
+
+    session.query(LedgerDailyRollup).delete()
+    state = _state(session)
+    if state is not None:
+        state.last_movement_id = 0
+    session.flush()
+    return refresh_rollups(session)
+
+
+def _window_rows(session: Session, start: date, end: date):
+    return session.execute(
+        select(
+            LedgerDailyRollup.source_kind,
+            func.sum(LedgerDailyRollup.qty_in),
+            func.sum(LedgerDailyRollup.qty_out),
+            func.sum(LedgerDailyRollup.value_in_cents),
+            func.sum(LedgerDailyRollup.cogs_cents),
+            func.sum(LedgerDailyRollup.sales_cents),
+            func.sum(LedgerDailyRollup.movement_count),
+        )
+        .where(LedgerDailyRollup.day >= start, LedgerDailyRollup.day <= end)
+        .group_by(LedgerDailyRollup.source_kind)
+        .order_by(LedgerDailyRollup.source_kind)
+    ).all()
+
+
+def _is_purchase(kind: str) -> bool:
+    return kind not in INTERNAL_IN_KINDS and kind not in REVENUE_KINDS and kind not in WASTE_KINDS
+
+
+def summary(session: Session, days: int, *, today: Optional[date] = None) -> dict:
+    """Totals for the ``days`` most recent days (today included) from the rollups."""
+
+    end = today or datetime.utcnow().date()
+    start = end - timedelta(days=int(days) - 1)
+    by_kind = [
+        {
+            "source_kind": kind,
+            "qty_in": int(q_in or 0),
+            "qty_out": int(q_out or 0),
+            "value_in_cents": int(v_in or 0),
+            "cogs_cents": int(cogs or 0),
+            "sales_cents": int(sales or 0),
+            "count": int(count or 0),
+        }
+        for kind, q_in, q_out, v_in, cogs, sales, count in _window_rows(session, start, end)
+    ]
+
+    sales = sum(k["sales_cents"] for k in by_kind if k["source_kind"] in REVENUE_KINDS)
+    cogs = sum(k["cogs_cents"] for k in by_kind if k["source_kind"] in REVENUE_KINDS)
+    waste = {kind: 0 for kind in WASTE_KINDS}
+    for k in by_kind:
+        if k["source_kind"] in WASTE_KINDS:
+            waste[k["source_kind"]] = k["cogs_cents"]
+    purchases = [
+        {"name": k["source_kind"], "amount_cents": k["value_in_cents"]}
+        for k in by_kind
+        if _is_purchase(k["source_kind"]) and k["value_in_cents"]
+    ]
+    expense = purchases + [{"name": kind, "amount_cents": cents} for kind, cents in waste.items() if cents]
+    state = _state(session)
+    return {
+        "window": f"{int(days)}d",
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "as_of": datetime.utcnow().isoformat(),
+        "through_movement_id": int(state.last_movement_id) if state else 0,
+        "totals": {
+            "count": sum(k["count"] for k in by_kind),
+            "in": sum(k["qty_in"] for k in by_kind),
+            "out": sum(k["qty_out"] for k in by_kind),
+        },
+        "sales_cents": sales,
+        "cogs_cents": cogs,
+        "margin_cents": sales - cogs,
+        "margin_pct": round((sales - cogs) * 100.0 / sales, 2) if sales else None,
+        "waste_cents": sum(waste.values()),
+        "waste": waste,
+        "income": {"total_cents": sales, "categories": [{"name": "sales", "amount_cents": sales}] if sales else []},
+        "expense": {"total_cents": sum(c["amount_cents"] for c in expense), "categories": expense},
+        "by_kind": by_kind,
+    }
+
+
+def _entries(row: LedgerDailyRollup) -> Iterable[dict]:
+    day = row.day.isoformat()
+    kind = row.source_kind
+    if kind in REVENUE_KINDS and row.sales_cents:
+        yield {"date": day, "type": "revenue", "amount_cents": int(row.sales_cents), "notes": kind, "qty": row.qty_out}
+    elif kind in WASTE_KINDS and row.cogs_cents:
+        yield {"date": day, "type": "expense", "amount_cents": int(row.cogs_cents), "notes": kind, "qty": row.qty_out}
+    elif _is_purchase(kind) and row.value_in_cents:
+        yield {"date": day, "type": "expense", "amount_cents": int(row.value_in_cents), "notes": kind, "qty": row.qty_in}
+
+
+def recent(session: Session, limit: int) -> List[dict]:
+    """Newest daily revenue/expense lines, one per (day, source_kind)."""
+
+    out: List[dict] = []
+    stmt = select(LedgerDailyRollup).order_by(LedgerDailyRollup.day.desc(), LedgerDailyRollup.source_kind)
+    for row in session.execute(stmt.execution_options(yield_per=200)).scalars():
+        out.extend(_entries(row))
+        if len(out) >= limit:
+            break
+    return out[:limit]
+
+
+__all__ = [
+    "INTERNAL_IN_KINDS",
+    "MAX_WINDOW_DAYS",
+    "REVENUE_KINDS",
+    "WASTE_KINDS",
+    "parse_window",
+    "rebuild_rollups",
+    "recent",
+    "refresh_rollups",
+    "summary",
+]
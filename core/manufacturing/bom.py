@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Compiled recipe (bill of materials) cache.
+
+A :class:`CompiledRecipe` holds everything a run or a recipe detail needs
+that only changes when the recipe or its items are edited. That covers the
+component lines, each component's UOM multiplier, and the output item's
+metadata. It is built with one joined query and cached per process, keyed by
+recipe id and ``Recipe.updated_at``.
+
+The recipe routes call :func:`invalidate` on create/update/delete. The items
+routes call :func:`clear` when an item's unit changes, because multipliers
+and names are copied into compiled recipes. A write from another process is
+noticed through ``updated_at``. On-hand quantities are never cached.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.appdb.models import Item
+from core.appdb.models_recipes import Recipe, RecipeItem
+from core.metrics.metric import uom_multiplier
+
+
+@dataclass(frozen=True)
+class CompiledLine:
+    id: int
+    item_id: int
+    qty_required: int
+    is_optional: bool
+    sort_order: int
+    item_name: Optional[str]
+    item_uom: Optional[str]
+    multiplier: int
+
+
+@dataclass(frozen=True)
+class CompiledRecipe:
+    recipe_id: int
+    updated_at: Optional[datetime]
+    output_item_id: Optional[int]
+    output_qty: int
+    lines: Tuple[CompiledLine, ...]
+    output_name: Optional[str]
+    output_uom: Optional[str]
+    output_dimension: str
+    output_multiplier: int
+
+
+_lock = threading.Lock()
+_cache: Dict[int, CompiledRecipe] = {}
+
+
+def _unit(dimension: Optional[str], uom: Optional[str]) -> Tuple[str, str, int]:
+    dim = dimension or "count"
+    unit = uom or "ea"
+    return dim, unit, uom_multiplier(dim, unit)
+
+
+def compile_recipe(session: Session, recipe: Recipe) -> CompiledRecipe:
+    stmt = (
+        select(RecipeItem, Item.name, Item.dimension, Item.uom)
+        .outerjoin(Item, Item.id == RecipeItem.item_id)
+        .where(RecipeItem.recipe_id == recipe.id)
+        .order_by(RecipeItem.sort_order)
+    )
+    lines = []
+    for ri, name, dimension, uom in session.execute(stmt):
+        lines.append(
+            CompiledLine(
+                id=int(ri.id),
+                item_id=int(ri.item_id),
+                qty_required=ri.qty_required,
+                is_optional=bool(ri.is_optional),
+                sort_order=ri.sort_order,
+                item_name=name,
+                item_uom=uom,
+                multiplier=_unit(dimension, uom)[2],
+            )
+        )
+    out = session.get(Item, recipe.output_item_id) if recipe.output_item_id else None
+    out_dim, _, out_mult = _unit(getattr(out, "dimension", None), getattr(out, "uom", None))
+    return CompiledRecipe(
+        recipe_id=int(recipe.id),
+        updated_at=recipe.updated_at,
+        output_item_id=recipe.output_item_id,
+        output_qty=recipe.output_qty,
+        lines=tuple(lines),
+        output_name=getattr(out, "name", None),
+        output_uom=getattr(out, "uom", None),
+        output_dimension=out_dim,
+        output_multiplier=out_mult,
+    )
+
+
+def get_compiled(session: Session, recipe: Recipe) -> CompiledRecipe:
+    """Cached :func:`compile_recipe`; recompiles when ``recipe.updated_at`` moved."""
+
+    with _lock:
+        hit = _cache.get(int(recipe.id))
+    if hit is not None and hit.updated_at == recipe.updated_at and hit.output_item_id == recipe.output_item_id:
+        return hit
+    compiled = compile_recipe(session, recipe)
+    with _lock:
+        _cache[int(recipe.id)] = compiled
+    return compiled
+
+
+def invalidate(recipe_id: int) -> None:
+    with _lock:
+        _cache.pop(int(recipe_id), None)
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
+
+
+__all__ = ["CompiledLine", "CompiledRecipe", "clear", "compile_recipe", "get_compiled", "invalidate"]
@@ -0,0 +1,135 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Max-buildable capacity across recipes.
+
+The component matrix of every non-archived recipe is read with one query and
+on-hand for all components with one grouped query; everything else is exact
+integer arithmetic in memory. A recipe needing ``q`` of a component per
+``output_qty`` units can make ``on_hand * output_qty // q`` units from that
+component; its capacity is the minimum over required components, and the
+component reaching it is the limiting one. Optional components never limit.
+
+:func:`mix_capacity` answers the shared-stock question for a product mix:
+how many complete "kits" of the requested quantities current stock covers.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.appdb.ledger import on_hand_many
+from core.appdb.models_recipes import Recipe, RecipeItem
+
+
+@dataclass
+class RecipeRow:
+    recipe_id: int
+    name: str
+    output_item_id: int
+    output_qty: int
+    # item_id -> qty_required per output_qty units (required components only)
+    components: Dict[int, int] = field(default_factory=dict)
+
+
+def load_matrix(session: Session, recipe_ids: Optional[List[int]] = None) -> Dict[int, RecipeRow]:
+    stmt = (
+        select(
+            Recipe.id,
+            Recipe.name,
+            Recipe.output_item_id,
+            Recipe.output_qty,
+            RecipeItem.item_id,
+            RecipeItem.qty_required,
+        )
+        .outerjoin(RecipeItem, (RecipeItem.recipe_id == Recipe.id) & RecipeItem.is_optional.is_(False))
+        .where(Recipe.archived.is_(False))
+        .order_by(Recipe.id)
+    )
+    if recipe_ids is not None:
+        stmt = stmt.where(Recipe.id.in_(recipe_ids))
+    rows: Dict[int, RecipeRow] = {}
+    for rid, name, out_item, out_qty, item_id, qty in session.execute(stmt):
+        row = rows.get(rid)
+        if row is None:
+            row = rows[rid] = RecipeRow(int(rid), name, int(out_item), int(out_qty or 1))
+        if item_id is not None and int(qty or 0) > 0:
+            row.components[int(item_id)] = row.components.get(int(item_id), 0) + int(qty)
+    return rows
+
+
+def _recipe_capacity(row: RecipeRow, on_hand: Mapping[int, int]) -> dict:
+    components = []
+    best: Optional[Tuple[int, int]] = None
+    for item_id, qty in row.components.items():
+        stock = max(int(on_hand.get(item_id, 0)), 0)
+        units = stock * row.output_qty // qty
+        components.append({"item_id": item_id, "qty_required": qty, "on_hand": stock, "max_units": units})
+        if best is None or units < best[0]:
+            best = (units, item_id)
+    return {
+        "recipe_id": row.recipe_id,
+        "name": row.name,
+        "output_item_id": row.output_item_id,
+        # None: nothing required, so stock does not bound it.
+        "max_units": best[0] if best else None,
+        "limiting_item_id": best[1] if best else None,
+        "components": components,
+    }
+
+
+def capacity_report(session: Session) -> List[dict]:
+    matrix = load_matrix(session)
+    on_hand = on_hand_many(session, {i for row in matrix.values() for i in row.components})
+    return [_recipe_capacity(row, on_hand) for row in matrix.values()]
+
+
+def mix_capacity(session: Session, mix: Mapping[int, int]) -> dict:
+    """Complete kits of ``{recipe_id: units}`` that shared stock can cover.
+
+    Raises ``LookupError`` with the ids of unknown or archived recipes.
+    """
+
+    matrix = load_matrix(session, sorted(mix))
+    missing = sorted(set(mix) - set(matrix))
+    if missing:
+        raise LookupError(missing)
+
+    per_kit: Dict[int, Fraction] = {}
+    for rid, units in mix.items():
+        row = matrix[rid]
+        for item_id, qty in row.components.items():
+            per_kit[item_id] = per_kit.get(item_id, Fraction(0)) + Fraction(qty * int(units), row.output_qty)
+    on_hand = on_hand_many(session, per_kit)
+
+    kits: Optional[int] = None
+    limiting: Optional[int] = None
+    for item_id, need in per_kit.items():
+        if need <= 0:
+            continue
+        fit = math.floor(Fraction(max(on_hand[item_id], 0)) / need)
+        if kits is None or fit < kits:
+            kits, limiting = fit, item_id
+    items = [
+        {
+            "item_id": item_id,
+            "per_kit": float(need),
+            "on_hand": on_hand[item_id],
+            "used": float(need * (kits or 0)),
+            "remaining": float(on_hand[item_id] - need * (kits or 0)),
+        }
+        for item_id, need in per_kit.items()
+    ]
+    return {
+        "kits": kits,
+        "feasible": kits is None or kits >= 1,
+        "limiting_item_id": limiting,
+        "items": items,
+    }
+
+
+__all__ = ["RecipeRow", "capacity_report", "load_matrix", "mix_capacity"]
@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Projected "cost to build" per recipe.
+
+A recipe's projected unit cost is what one recipe batch (``output_qty``
+units) would cost if it were run now: every component line is priced against
+the item's current FIFO layers oldest first, with the same per-slice rounding,
+``uom_multiplier`` scaling and optional-line skipping as
+:func:`core.manufacturing.service.execute_run_txn`. Quantity the open layers
+cannot cover is priced at the newest layer's cost and the result is flagged
+``complete=False``; a required component with no open layers at all leaves
+the cost unknown (``None``).
+
+Results are cached per process next to the :mod:`core.manufacturing.bom`
+compiled recipe they were computed from, so a recipe edit (which recompiles)
+drops its cost too. Ledger writes record the items whose layers changed
+(``stock_summary.LAYERS_CHANGED_KEY``); after a commit on a
+:data:`core.appdb.engine.SessionLocal` session only the recipes using those
+items are dropped. Costs for a whole recipe list are computed with one layer
+query for every stale recipe together.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.appdb.engine import SessionLocal
+from core.appdb.fifo_simulator import StockView
+from core.appdb.models_recipes import Recipe
+from core.appdb.stock_summary import LAYERS_CHANGED_KEY
+from core.manufacturing import bom
+from core.money import round_half_up_cents
+
+
+@dataclass(frozen=True)
+class RecipeCost:
+    recipe_id: int
+    unit_cost_cents: Optional[int]
+    cost_inputs_cents: Optional[int]
+    complete: bool
+
+    def as_dict(self) -> dict:
+        return {
+            "unit_cost_cents": self.unit_cost_cents,
+            "cost_inputs_cents": self.cost_inputs_cents,
+            "cost_complete": self.complete,
+        }
+
+
+_lock = threading.Lock()
+_cache: Dict[int, Tuple[bom.CompiledRecipe, RecipeCost]] = {}
+# item_id -> ids of cached recipes that use it
+_users: Dict[int, Set[int]] = {}
+# Bumped by every invalidation; results computed across one are not cached.
+_generation = 0
+
+
+def compute_cost(compiled: bom.CompiledRecipe, view: StockView) -> RecipeCost:
+    inputs = 0
+    complete = True
+    for line in compiled.lines:
+        need = int(line.qty_required or 0)
+        if need <= 0:
+            continue
+        layers = view.layers(line.item_id)
+        if line.is_optional and sum(qty for _, qty, _ in layers) < need:
+            continue
+        if not layers:
+            return RecipeCost(compiled.recipe_id, None, None, False)
+        remaining = need
+        for _, qty, cost in layers:
+            take = min(qty, remaining)
+            remaining -= take
+            inputs += int(round(int(cost or 0) * (take / float(line.multiplier))))
+            if remaining <= 0:
+                break
+        if remaining > 0:
+            complete = False
+            inputs += int(round(int(layers[-1][2] or 0) * (remaining / float(line.multiplier))))
+    output_qty_uom = (compiled.output_qty or 0) / float(compiled.output_multiplier)
+    unit = round_half_up_cents(inputs / max(output_qty_uom, 1e-9))
+    return RecipeCost(compiled.recipe_id, unit, inputs, complete)
+
+
+def get_costs(session: Session, recipes: Iterable[Recipe]) -> Dict[int, RecipeCost]:
+    """Projected costs for ``recipes``; stale ones are recomputed together."""
+
+    out: Dict[int, RecipeCost] = {}
+    stale: List[bom.CompiledRecipe] = []
+    with _lock:
+        generation = _generation
+    for recipe in recipes:
+        compiled = bom.get_compiled(session, recipe)
+        with _lock:
+            hit = _cache.get(compiled.recipe_id)
+        if hit is not None and hit[0] is compiled:
+            out[compiled.recipe_id] = hit[1]
+        else:
+            stale.append(compiled)
+    if stale:
+        view = StockView.load(session, {line.item_id for c in stale for line in c.lines})
+        for compiled in stale:
+            out[compiled.recipe_id] = compute_cost(compiled, view)
+        with _lock:
+            if generation == _generation:
+                for compiled in stale:
+                    _cache[compiled.recipe_id] = (compiled, out[compiled.recipe_id])
+                    for line in compiled.lines:
+                        _users.setdefault(line.item_id, set()).add(compiled.recipe_id)
+    return out
+
+
+def invalidate_items(item_ids: Iterable[int]) -> Set[int]:
+    """Drop cached costs of recipes that use any of ``item_ids``; returns their ids."""
+
+    global _generation
+    dropped: Set[int] = set()
+    with _lock:
+        _generation += 1
+        for item_id in item_ids:
+            dropped |= _users.pop(int(item_id), set())
+        for recipe_id in dropped:
+            _cache.pop(recipe_id, None)
+    return dropped
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
+        _users.clear()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _drop_after_commit(session: Session) -> None:
+    changed = session.info.pop(LAYERS_CHANGED_KEY, None)
+    if changed:
+        invalidate_items(changed)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _forget_after_rollback(session: Session, previous_transaction) -> None:
+    if not session.in_transaction():
+        session.info.pop(LAYERS_CHANGED_KEY, None)
+
+
+__all__ = ["RecipeCost", "clear", "compute_cost", "get_costs", "invalidate_items"]
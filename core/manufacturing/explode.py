@@ -0,0 +1,177 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Multi-level BOM explosion.
+
+:func:`plan_build` walks a recipe whose components may themselves be the
+output of other (non-archived) recipes. A component the stock cannot cover is
+built first from its producing recipe, recursively, for exactly the
+shortfall. Stock for every item in the tree is read once into a
+:class:`~core.appdb.fifo_simulator.StockView`, so the plan's FIFO allocations
+and costs are computed bottom-up in memory. Each sub-build's per-output cost
+becomes a planned layer that its parent consumes. Compiled recipes come from
+:mod:`core.manufacturing.bom`.
+
+A recipe that (indirectly) needs to build itself raises :class:`BomCycleError`.
+Components that stock already covers are never expanded, so a cycle in the
+recipe graph only matters when the plan has to walk it.
+
+:func:`core.manufacturing.service.execute_plan_txn` runs a plan's builds
+children-first in one transaction.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.appdb.fifo_simulator import StockView
+from core.appdb.models_recipes import Recipe
+from core.manufacturing import bom
+from core.money import round_half_up_cents
+
+
+class BomCycleError(ValueError):
+    def __init__(self, cycle: List[int]):
+        super().__init__("bom_cycle")
+        self.cycle = cycle
+
+
+@dataclass
+class BuildNode:
+    recipe_id: int
+    output_item_id: int
+    output_qty: int
+    k: float
+    required: List[dict] = field(default_factory=list)
+    children: List["BuildNode"] = field(default_factory=list)
+    allocations: List[dict] = field(default_factory=list)
+    cost_inputs_cents: int = 0
+    per_output_cents: int = 0
+
+    def post_order(self) -> List["BuildNode"]:
+        out: List[BuildNode] = []
+        for child in self.children:
+            out.extend(child.post_order())
+        out.append(self)
+        return out
+
+    def as_dict(self) -> dict:
+        return {
+            "recipe_id": self.recipe_id,
+            "output_item_id": self.output_item_id,
+            "output_qty": self.output_qty,
+            "allocations": self.allocations,
+            "cost_inputs_cents": self.cost_inputs_cents,
+            "per_output_cents": self.per_output_cents,
+            "children": [c.as_dict() for c in self.children],
+        }
+
+
+@dataclass
+class BuildPlan:
+    root: BuildNode
+    shortages: List[dict] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.shortages
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "builds": len(self.root.post_order()),
+            "tree": self.root.as_dict(),
+            "shortages": self.shortages,
+        }
+
+
+class _Planner:
+    def __init__(self, session: Session):
+        self.session = session
+        self.compiled: Dict[int, bom.CompiledRecipe] = {}
+        self.producers: Dict[int, int] = {}
+        for recipe_id, output_item_id in session.execute(
+            select(Recipe.id, Recipe.output_item_id).where(Recipe.archived.is_(False)).order_by(Recipe.id.desc())
+        ):
+            # Lowest id wins when several recipes make the same item.
+            self.producers[int(output_item_id)] = int(recipe_id)
+        self.shortages: List[dict] = []
+        self.view: Optional[StockView] = None
+
+    def recipe(self, recipe_id: int) -> bom.CompiledRecipe:
+        hit = self.compiled.get(recipe_id)
+        if hit is None:
+            row = self.session.get(Recipe, recipe_id)
+            if row is None:
+                raise LookupError(recipe_id)
+            hit = self.compiled[recipe_id] = bom.get_compiled(self.session, row)
+        return hit
+
+    def reachable_items(self, recipe_id: int) -> Set[int]:
+        items: Set[int] = set()
+        seen: Set[int] = set()
+        stack = [recipe_id]
+        while stack:
+            rid = stack.pop()
+            if rid in seen:
+                continue
+            seen.add(rid)
+            for line in self.recipe(rid).lines:
+                items.add(line.item_id)
+                if line.item_id in self.producers:
+                    stack.append(self.producers[line.item_id])
+        return items
+
+    def plan(self, recipe_id: int, qty: int, path: List[int]) -> BuildNode:
+        if recipe_id in path:
+            raise BomCycleError(path[path.index(recipe_id) :] + [recipe_id])
+        compiled = self.recipe(recipe_id)
+        k = qty / (compiled.output_qty or 1.0)
+        node = BuildNode(recipe_id=recipe_id, output_item_id=int(compiled.output_item_id), output_qty=qty, k=k)
+        view = self.view
+        for line in compiled.lines:
+            need = float(line.qty_required) * k
+            node.required.append({"item_id": line.item_id, "qty": need, "is_optional": line.is_optional})
+            if need <= 0:
+                continue
+            short = need - view.available(line.item_id)
+            if short > 1e-9:
+                if line.is_optional:
+                    continue
+                producer = self.producers.get(line.item_id)
+                if producer is None:
+                    self.shortages.append(
+                        {"item_id": line.item_id, "required": need, "available": view.available(line.item_id)}
+                    )
+                    continue
+                child = self.plan(producer, math.ceil(short - 1e-9), path + [recipe_id])
+                node.children.append(child)
+                view.add_layer(line.item_id, None, child.output_qty, child.per_output_cents)
+            sim = view.simulate([(line.item_id, int(need))], apply=True)
+            if not sim.ok:
+                self.shortages.extend(
+                    {"item_id": s["item_id"], "required": need, "available": s["on_hand"]} for s in sim.shortages
+                )
+                continue
+            for piece in sim.slices:
+                node.allocations.append(piece.as_dict())
+                if piece.unit_cost_cents is not None:
+                    node.cost_inputs_cents += int(round(piece.unit_cost_cents * (piece.qty / float(line.multiplier))))
+        output_qty_uom = qty / float(compiled.output_multiplier)
+        node.per_output_cents = round_half_up_cents(node.cost_inputs_cents / max(output_qty_uom, 1e-9))
+        return node
+
+
+def plan_build(session: Session, recipe_id: int, output_qty: int) -> BuildPlan:
+    """Plan ``output_qty`` of ``recipe_id`` including any sub-assemblies; read-only."""
+
+    planner = _Planner(session)
+    planner.view = StockView.load(session, planner.reachable_items(int(recipe_id)))
+    root = planner.plan(int(recipe_id), int(output_qty), [])
+    return BuildPlan(root=root, shortages=planner.shortages)
+
+
+__all__ = ["BomCycleError", "BuildNode", "BuildPlan", "plan_build"]
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Manufacturing run history from ``manufacturing_runs``.
+
+Completed runs are listed newest first by ``executed_at`` (run id breaks
+ties) through the ``ix_manufacturing_runs_*`` indexes, so a page costs the
+same however long the shop has been running. Paging is keyset: the cursor is
+the id of the last run on the previous page, and the next page starts
+strictly after its ``(executed_at, id)``.
+
+``manufacturing.jsonl`` is still appended to as an audit trail but is no
+longer read back.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from core.appdb.models_recipes import ManufacturingRun, Recipe
+
+PAGE_LIMIT = 100
+
+
+def _row_dict(row) -> dict:
+    executed = row.executed_at
+    return {
+        "type": "manufacturing.run",
+        "run_id": int(row.id),
+        "recipe_id": int(row.recipe_id) if row.recipe_id is not None else None,
+        "recipe_name": row.recipe_name,
+        "output_item_id": int(row.output_item_id),
+        "output_qty": int(row.output_qty),
+        # Same shape the journal-backed listing returned.
+        "timestamp": executed.isoformat() + "Z",
+        "_ts": executed.isoformat() + "+00:00",
+    }
+
+
+def list_runs(
+    session: Session,
+    *,
+    days: int,
+    recipe_id: Optional[int] = None,
+    output_item_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: int = PAGE_LIMIT,
+    now: Optional[datetime] = None,
+) -> Tuple[List[dict], Optional[int]]:
+    """Completed runs from the last ``days`` days; returns ``(runs, next_cursor)``."""
+
+    cutoff = (now or datetime.utcnow()) - timedelta(days=int(days))
+    stmt = (
+        select(
+            ManufacturingRun.id,
+            ManufacturingRun.recipe_id,
+            ManufacturingRun.output_item_id,
+            ManufacturingRun.output_qty,
+            ManufacturingRun.executed_at,
+            Recipe.name.label("recipe_name"),
+        )
+        .outerjoin(Recipe, Recipe.id == ManufacturingRun.recipe_id)
+        .where(
+            ManufacturingRun.executed_at >= cutoff,
+            ManufacturingRun.status == "completed",
+        )
+    )
+    if recipe_id is not None:
+        stmt = stmt.where(ManufacturingRun.recipe_id == int(recipe_id))
+    if output_item_id is not None:
+        stmt = stmt.where(ManufacturingRun.output_item_id == int(output_item_id))
+    if cursor is not None:
+        after = session.execute(
+            select(ManufacturingRun.executed_at).where(ManufacturingRun.id == int(cursor))
+        ).scalar_one_or_none()
+        if after is None:
+            return [], None
+        stmt = stmt.where(
+            or_(
+                ManufacturingRun.executed_at < after,
+                and_(ManufacturingRun.executed_at == after, ManufacturingRun.id < int(cursor)),
+            )
+        )
+    stmt = stmt.order_by(ManufacturingRun.executed_at.desc(), ManufacturingRun.id.desc()).limit(int(limit) + 1)
+
+    rows = session.execute(stmt).all()
+    more = len(rows) > limit
+    runs = [_row_dict(r) for r in rows[:limit]]
+    return runs, (runs[-1]["run_id"] if more else None)
+
+
+__all__ = ["PAGE_LIMIT", "list_runs"]
@@ -0,0 +1,304 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Queued manufacturing runs.
+
+``POST /app/manufacturing/jobs`` stores the run payload as a
+``manufacturing_jobs`` row and returns at once. One :class:`JobWorker` thread
+per process executes queued jobs oldest first, so runs submitted this way
+never contend with each other for the SQLite writer. A job's run and its
+``completed`` status commit in the same transaction (via
+``on_before_commit``), so a job left ``running`` by a crash has no effects
+and :func:`requeue_interrupted` can safely put it back in the queue.
+
+Jobs live in the database, so queued work survives a restart; the app
+starts the worker at startup when anything is waiting.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from core.api.schemas.manufacturing import parse_run_request
+from core.appdb.ledger import InsufficientStock
+from core.appdb.models_recipes import ManufacturingJob, Recipe
+from core.manufacturing.explode import BomCycleError, plan_build
+from core.manufacturing.service import (
+    execute_plan_txn,
+    execute_run_txn,
+    format_shortages,
+    record_failed_run,
+    validate_run,
+)
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 5.0
+_INSUFFICIENT = {"error": "insufficient_stock"}
+
+SessionFactory = Callable[[], Session]
+Journal = Callable[[List[dict]], None]
+
+
+def enqueue(session: Session, payload: dict) -> ManufacturingJob:
+    """Queue a run payload (as accepted by ``POST /manufacturing/run``). Caller commits."""
+    job = ManufacturingJob(status="queued", payload=json.dumps(payload, separators=(",", ":")))
+    session.add(job)
+    session.flush()
+    return job
+
+
+def job_dict(session: Session, job: ManufacturingJob) -> dict:
+    result = json.loads(job.result) if job.result else {}
+    out = {
+        "id": job.id,
+        "status": job.status,
+        "run_id": job.run_id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "output_unit_cost_cents": result.get("output_unit_cost_cents"),
+        "cost_inputs_cents": result.get("cost_inputs_cents"),
+        "allocations": result.get("allocations", []),
+        "sub_run_ids": result.get("sub_run_ids", []),
+        "shortages": result.get("shortages", []),
+        "error": json.loads(job.error) if job.error else None,
+    }
+    if job.status == "queued":
+        out["queue_position"] = session.execute(
+            select(func.count())
+            .select_from(ManufacturingJob)
+            .where(ManufacturingJob.status == "queued", ManufacturingJob.id <= job.id)
+        ).scalar_one()
+    return out
+
+
+def requeue_interrupted(session: Session) -> int:
+    """Put jobs a previous process left ``running`` back in the queue. Caller commits."""
+    res = session.execute(
+        update(ManufacturingJob)
+        .where(ManufacturingJob.status == "running")
+        .values(status="queued", started_at=None)
+    )
+    return int(res.rowcount or 0)
+
+
+def has_queued(session: Session) -> bool:
+    return (
+        session.execute(select(ManufacturingJob.id).where(ManufacturingJob.status == "queued").limit(1)).first()
+        is not None
+    )
+
+
+def _claim_next(session: Session) -> Optional[ManufacturingJob]:
+    job_id = session.execute(
+        select(ManufacturingJob.id)
+        .where(ManufacturingJob.status == "queued")
+        .order_by(ManufacturingJob.id)
+        .limit(1)
+    ).scalar_one_or_none()
+    if job_id is None:
+        return None
+    claimed = session.execute(
+        update(ManufacturingJob)
+        .where(ManufacturingJob.id == job_id, ManufacturingJob.status == "queued")
+        .values(status="running", started_at=datetime.utcnow())
+    ).rowcount
+    session.commit()
+    return session.get(ManufacturingJob, job_id) if claimed else None
+
+
+def _finish(job: ManufacturingJob, status: str, *, run_id=None, result=None, error=None) -> None:
+    job.status = status
+    job.run_id = run_id
+    job.result = json.dumps(result) if result is not None else None
+    job.error = json.dumps(error) if error is not None else None
+    job.finished_at = datetime.utcnow()
+
+
+def _journal_entry(session: Session, recipe_id, output_item_id, output_qty) -> dict:
+    recipe = session.get(Recipe, int(recipe_id)) if recipe_id is not None else None
+    return {
+        "type": "manufacturing.run",
+        "recipe_id": int(recipe_id) if recipe_id is not None else None,
+        "recipe_name": getattr(recipe, "name", None) or None,
+        "output_item_id": int(output_item_id) if output_item_id is not None else None,
+        "output_qty": int(output_qty),
+    }
+
+
+def _execute(session: Session, job: ManufacturingJob) -> List[dict]:
+    """Run one claimed job; returns journal entries for the builds it committed."""
+    body = parse_run_request(json.loads(job.payload))
+    recipe_id = getattr(body, "recipe_id", None)
+    if recipe_id is not None:
+        recipe = session.get(Recipe, recipe_id)
+        # It was runnable when queued; it may have been archived since.
+        if recipe is None or recipe.archived:
+            raise HTTPException(status_code=400, detail="Recipe is archived or missing")
+
+    if getattr(body, "explode", False):
+        try:
+            plan = plan_build(session, body.recipe_id, body.output_qty)
+        except BomCycleError as exc:
+            _finish(job, "failed", error={"error": "bom_cycle", "cycle": exc.cycle})
+            session.commit()
+            return []
+        if plan.shortages:
+            shortages = format_shortages(plan.shortages)
+            run = record_failed_run(session, body, plan.root.output_item_id, shortages)
+            _finish(job, "failed", run_id=run.id, result={"shortages": shortages}, error=_INSUFFICIENT)
+            session.commit()
+            return []
+
+        def _done(results: List[dict]) -> None:
+            root = results[-1]
+            _finish(
+                job,
+                "completed",
+                run_id=root["run"].id,
+                result={
+                    "output_unit_cost_cents": root["output_unit_cost_cents"],
+                    "cost_inputs_cents": root["journal_entry"]["cost_inputs_cents"],
+                    "allocations": root["journal_entry"]["allocations"],
+                    "sub_run_ids": [r["run"].id for r in results[:-1]],
+                },
+            )
+
+        execute_plan_txn(session, plan, body, on_before_commit=_done)
+        return [
+            _journal_entry(session, node.recipe_id, node.output_item_id, node.output_qty)
+            for node in plan.root.post_order()
+        ]
+
+    output_item_id, required, k, shortages = validate_run(session, body)
+    if shortages:
+        run = record_failed_run(session, body, output_item_id, shortages)
+        _finish(job, "failed", run_id=run.id, result={"shortages": shortages}, error=_INSUFFICIENT)
+        session.commit()
+        return []
+
+    def _done(result: dict) -> None:
+        _finish(
+            job,
+            "completed",
+            run_id=result["run"].id,
+            result={
+                "output_unit_cost_cents": result["output_unit_cost_cents"],
+                "cost_inputs_cents": result["journal_entry"]["cost_inputs_cents"],
+                "allocations": result["journal_entry"]["allocations"],
+            },
+        )
+
+    execute_run_txn(session, body, output_item_id, required, k, on_before_commit=_done)
+    return [_journal_entry(session, getattr(body, "recipe_id", None), output_item_id, body.output_qty)]
+
+
+def run_next(session_factory: SessionFactory, journal: Optional[Journal] = None) -> Optional[int]:
+    """Claim and execute the oldest queued job; returns its id, or ``None`` if the queue is empty."""
+    with session_factory() as session:
+        job = _claim_next(session)
+        if job is None:
+            return None
+        job_id = job.id
+        try:
+            entries = _execute(session, job)
+        except Exception as exc:
+            session.rollback()
+            if isinstance(exc, InsufficientStock):
+                error = {"error": "insufficient_stock", "shortages": format_shortages(exc.shortages)}
+            elif isinstance(exc, HTTPException):
+                error = {"error": "invalid", "detail": exc.detail}
+            else:
+                logger.exception("manufacturing job %s failed", job_id)
+                error = {"error": "failed_error"}
+            job = session.get(ManufacturingJob, job_id)
+            _finish(job, "failed", error=error)
+            session.commit()
+            return job_id
+    if entries and journal is not None:
+        journal(entries)
+    return job_id
+
+
+def run_pending(session_factory: SessionFactory, journal: Optional[Journal] = None) -> int:
+    """Drain the queue on the calling thread; returns how many jobs ran."""
+    count = 0
+    while run_next(session_factory, journal) is not None:
+        count += 1
+    return count
+
+
+class JobWorker:
+    """The single thread that executes queued jobs in order."""
+
+    def __init__(self, session_factory: SessionFactory, journal: Optional[Journal] = None):
+        self._session_factory = session_factory
+        self._journal = journal
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            with self._session_factory() as session:
+                if requeue_interrupted(session):
+                    session.commit()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="manufacturing-jobs", daemon=True)
+            self._thread.start()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            # Clear before draining so a job queued meanwhile is not missed.
+            self._wake.clear()
+            try:
+                while not self._stop.is_set() and run_next(self._session_factory, self._journal) is not None:
+                    pass
+            except Exception:  # pragma: no cover - defensive; keep the worker alive
+                logger.exception("manufacturing job worker iteration failed")
+            self._wake.wait(POLL_SECONDS)
+
+
+_worker: Optional[JobWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker(session_factory: SessionFactory, journal: Optional[Journal] = None) -> JobWorker:
+    """The process-wide worker, started on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker(session_factory, journal)
+        _worker.start()
+        return _worker
+
+
+__all__ = [
+    "JobWorker",
+    "enqueue",
+    "get_worker",
+    "has_queued",
+    "job_dict",
+    "requeue_interrupted",
+    "run_next",
+    "run_pending",
+]
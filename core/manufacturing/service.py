@@ -6,9 +6,10 @@ from __future__ import annotations
 import json
 from contextlib import wraps
 from datetime import datetime
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, List, Sequence, Tuple
 
 from fastapi import HTTPException
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from core.api.schemas.manufacturing import (
@@ -17,9 +18,13 @@ from core.api.schemas.manufacturing import (
     RecipeRunRequest,
 )
 from core.metrics.metric import uom_multiplier  # normalized unit multipliers
-from core.appdb.ledger import InsufficientStock, on_hand_qty
+from core.appdb import queries
+from core.appdb.fifo_simulator import StockView
+from core.appdb.ledger import InsufficientStock, on_hand_many
 from core.appdb.models import Item, ItemBatch, ItemMovement
-from core.appdb.models_recipes import Recipe, RecipeItem
+from core.appdb.models_recipes import ManufacturingRun, Recipe
+from core.appdb.stock_summary import ensure_summaries, record_consumption, record_layer_added
+from core.manufacturing import bom
 from core.money import round_half_up_cents
 
 
@@ -46,52 +51,79 @@ def transactional(func: Callable):
 class fifo:
     @staticmethod
     def allocate(session: Session, item_id: int, qty: float) -> List[dict]:
-        qty_int = int(qty)
-        if qty_int <= 0:
+        return fifo.allocate_many(session, [{"item_id": item_id, "qty": qty, "is_optional": False}])
+
+    @staticmethod
+    def allocate_many(session: Session, lines: Sequence[dict]) -> List[dict]:
+        """Allocate ``{"item_id", "qty", "is_optional"}`` lines FIFO from one layer query.
+
+        Lines are served in order from what earlier lines left. An optional line
+        that cannot be covered is skipped; a required one raises
+        :class:`InsufficientStock`. Caller commits.
+        """
+        wanted = [r for r in lines if int(r["qty"]) > 0]
+        item_ids = sorted({int(r["item_id"]) for r in wanted})
+        if not item_ids:
             return []
 
-        batches = (
-            session.query(ItemBatch)
-            .filter(ItemBatch.item_id == item_id, ItemBatch.qty_remaining > 0)
-            .order_by(ItemBatch.created_at, ItemBatch.id)
-            .with_for_update()
-            .all()
-        )
-        available = sum(int(b.qty_remaining) for b in batches)
-        if available < qty_int:
-            raise InsufficientStock(
-                [
-                    {
-                        "item_id": item_id,
-                        "required": qty,
-                        "on_hand": available,
-                        "missing": qty - available,
-                    }
-                ]
-            )
+        layers: Dict[int, List[ItemBatch]] = {i: [] for i in item_ids}
+        for batch in session.execute(queries.OPEN_LAYERS_FOR_UPDATE, {"item_ids": item_ids}).scalars():
+            layers[batch.item_id].append(batch)
+        available = {i: sum(int(b.qty_remaining) for b in layers[i]) for i in item_ids}
 
         allocations: List[dict] = []
-        remaining = qty_int
-        for batch in batches:
-            if remaining <= 0:
-                break
-            take = min(int(batch.qty_remaining), int(remaining))
-            if take <= 0:
+        consumed: Dict[int, Tuple[int, int]] = {}
+        for r in wanted:
+            item_id = int(r["item_id"])
+            qty_int = int(r["qty"])
+            if available[item_id] + 1e-9 < r["qty"] and r.get("is_optional"):
                 continue
-            batch.qty_remaining = int(batch.qty_remaining) - take
-            remaining -= take
-            allocations.append(
-                {
-                    "item_id": item_id,
-                    "batch_id": batch.id,
-                    "qty": take,
-                    "unit_cost_cents": batch.unit_cost_cents,
-                }
-            )
+            if available[item_id] < qty_int:
+                raise InsufficientStock(
+                    [
+                        {
+                            "item_id": item_id,
+                            "required": r["qty"],
+                            "on_hand": available[item_id],
+                            "missing": r["qty"] - available[item_id],
+                        }
+                    ]
+                )
+            remaining = qty_int
+            value_cents = 0
+            for batch in layers[item_id]:
+                if remaining <= 0:
+                    break
+                take = min(int(batch.qty_remaining), int(remaining))
+                if take <= 0:
+                    continue
+                batch.qty_remaining = int(batch.qty_remaining) - take
+                remaining -= take
+                value_cents += take * int(batch.unit_cost_cents or 0)
+                allocations.append(
+                    {
+                        "item_id": item_id,
+                        "batch_id": batch.id,
+                        "qty": take,
+                        "unit_cost_cents": batch.unit_cost_cents,
+                    }
+                )
+            available[item_id] -= qty_int
+            qty_total, value_total = consumed.get(item_id, (0, 0))
+            consumed[item_id] = (qty_total + qty_int, value_total + value_cents)
 
+        for item_id, (qty_total, value_total) in consumed.items():
+            record_consumption(session, item_id, layers[item_id], qty_total, value_total)
         return allocations
 
 
+def _item_uom(session: Session, item_id: int) -> tuple[str, str, int]:
+    item_obj = session.get(Item, item_id)
+    dim = getattr(item_obj, "dimension", "count") or "count"
+    uom = getattr(item_obj, "uom", "ea") or "ea"
+    return dim, uom, uom_multiplier(dim, uom)
+
+
 def format_shortages(shortages: List[dict]) -> List[dict]:
     formatted = []
     for shortage in shortages:
@@ -105,14 +137,8 @@ def format_shortages(shortages: List[dict]) -> List[dict]:
     return formatted
 
 
-def validate_run(
-    session: Session, body: ManufacturingRunRequest
-) -> Tuple[int, list[dict], float, list[dict]]:
-    """Validate a manufacturing run request before any writes occur.
-
-    Returns a tuple of (output_item_id, required_components, scale_k, shortages).
-    Shortages are returned formatted but do not raise; caller decides how to respond.
-    """
+def resolve_requirements(session: Session, body: ManufacturingRunRequest) -> Tuple[int, list[dict], float]:
+    """Return (output_item_id, required_components, scale_k) for a run request."""
     if isinstance(body, RecipeRunRequest):
         recipe = session.get(Recipe, body.recipe_id)
         if not recipe:
@@ -122,20 +148,10 @@ def validate_run(
 
         output_item_id = recipe.output_item_id
         k = body.output_qty / (recipe.output_qty or 1.0)
-        required = []
-        for it in (
-            session.query(RecipeItem)
-            .filter(RecipeItem.recipe_id == recipe.id)
-            .order_by(RecipeItem.sort_order)
-            .all()
-        ):
-            required.append(
-                {
-                    "item_id": it.item_id,
-                    "qty": float(it.qty_required) * k,
-                    "is_optional": bool(it.is_optional),
-                }
-            )
+        required = [
+            {"item_id": line.item_id, "qty": float(line.qty_required) * k, "is_optional": line.is_optional}
+            for line in bom.get_compiled(session, recipe).lines
+        ]
     elif isinstance(body, AdhocRunRequest):
         output_item_id = body.output_item_id
         k = 1.0
@@ -145,12 +161,25 @@ def validate_run(
         ]
     else:  # pragma: no cover - defensive
         raise HTTPException(status_code=400, detail="invalid payload")
+    return output_item_id, required, k
 
+
+def validate_run(
+    session: Session, body: ManufacturingRunRequest
+) -> Tuple[int, list[dict], float, list[dict]]:
+    """Validate a manufacturing run request before any writes occur.
+
+    Returns a tuple of (output_item_id, required_components, scale_k, shortages).
+    Shortages are returned formatted but do not raise; caller decides how to respond.
+    """
+    output_item_id, required, k = resolve_requirements(session, body)
+
+    on_hand_by_item = on_hand_many(session, [r["item_id"] for r in required])
     shortages: List[dict] = []
     for r in required:
         if r["is_optional"]:
             continue
-        on_hand = on_hand_qty(session, r["item_id"])
+        on_hand = on_hand_by_item[int(r["item_id"])]
         if on_hand + 1e-9 < r["qty"]:
             shortages.append({"item_id": r["item_id"], "required": r["qty"], "available": on_hand})
 
@@ -159,8 +188,106 @@ def validate_run(
     return output_item_id, required, k, formatted_shortages
 
 
-@transactional
-def execute_run_txn(
+def preview_run(session: Session, body: ManufacturingRunRequest) -> dict:
+    """Cost a run against a read-only FIFO snapshot; nothing is locked or written.
+
+    Mirrors :func:`validate_run` and :func:`execute_run_txn`: the same shortage
+    check, the same optional-component skipping and the same per-output cost.
+    """
+    output_item_id, required, k = resolve_requirements(session, body)
+    view = StockView.load(session, [r["item_id"] for r in required])
+    return _preview_on_view(session, view, body, output_item_id, required, k)
+
+
+def preview_batch(
+    session: Session, bodies: Sequence[ManufacturingRunRequest]
+) -> List[Tuple[dict, Tuple[int, list[dict], float]]]:
+    """Preview runs in order against one shared stock view.
+
+    Each successful run consumes from the view and adds its output as a new
+    layer, so later runs see what earlier ones leave (and make). Returns
+    ``(preview, (output_item_id, required, k))`` per run.
+    """
+    resolved = [resolve_requirements(session, body) for body in bodies]
+    item_ids = {r["item_id"] for _, required, _ in resolved for r in required}
+    item_ids |= {output_item_id for output_item_id, _, _ in resolved}
+    view = StockView.load(session, item_ids)
+    out = []
+    for body, (output_item_id, required, k) in zip(bodies, resolved):
+        trial = view.copy()
+        preview = _preview_on_view(session, trial, body, output_item_id, required, k)
+        if preview["ok"]:
+            trial.add_layer(output_item_id, None, int(body.output_qty), preview["per_output_cents"])
+            view = trial
+        out.append((preview, (output_item_id, required, k)))
+    return out
+
+
+def _preview_on_view(
+    session: Session,
+    view: StockView,
+    body: ManufacturingRunRequest,
+    output_item_id: int,
+    required: list[dict],
+    k: float,
+) -> dict:
+    preview = {
+        "ok": True,
+        "output_item_id": output_item_id,
+        "output_qty": body.output_qty,
+        "k": k,
+        "allocations": [],
+        "skipped_optional": [],
+        "cost_inputs_cents": 0,
+        "per_output_cents": None,
+        "shortages": [],
+    }
+
+    shortages = [
+        {"item_id": r["item_id"], "required": r["qty"], "available": view.available(r["item_id"])}
+        for r in required
+        if not r["is_optional"] and view.available(r["item_id"]) + 1e-9 < r["qty"]
+    ]
+    if shortages:
+        preview.update(ok=False, shortages=format_shortages(shortages))
+        return preview
+
+    cost_inputs_cents = 0
+    item_uom_cache: dict[int, tuple[str, str, int]] = {}
+    for r in required:
+        if r["qty"] <= 0:
+            continue
+        if r["is_optional"] and view.available(r["item_id"]) + 1e-9 < r["qty"]:
+            preview["skipped_optional"].append(r["item_id"])
+            continue
+        sim = view.simulate([(r["item_id"], int(r["qty"]))], apply=True)
+        if not sim.ok:
+            # Only reachable when a component is listed more than once.
+            preview.update(ok=False, allocations=[], shortages=format_shortages(sim.shortages))
+            return preview
+        for piece in sim.slices:
+            preview["allocations"].append(
+                {
+                    "item_id": piece.item_id,
+                    "batch_id": piece.batch_id,
+                    "qty": piece.qty,
+                    "unit_cost_cents": piece.unit_cost_cents,
+                }
+            )
+            if piece.unit_cost_cents is not None:
+                cached = item_uom_cache.get(piece.item_id)
+                if cached is None:
+                    cached = item_uom_cache[piece.item_id] = _item_uom(session, piece.item_id)
+                cost_inputs_cents += int(round(piece.unit_cost_cents * (piece.qty / float(cached[2]))))
+
+    _, _, out_mult = _item_uom(session, output_item_id)
+    output_qty_uom = (body.output_qty or 0) / float(out_mult)
+    preview["cost_inputs_cents"] = cost_inputs_cents
+    preview["per_output_cents"] = round_half_up_cents(cost_inputs_cents / max(output_qty_uom, 1e-9))
+    return preview
+
+
+def _execute_run(
     session: Session,
     body: ManufacturingRunRequest,
     output_item_id: int,
@@ -178,56 +305,57 @@ def execute_run_txn(
     )
     session.add(mfg_run)
     session.flush()
+    ensure_summaries(session, [r["item_id"] for r in required] + [output_item_id])
+
+    # Load every involved item once; later session.get() calls hit the identity map.
+    items_by_id = {
+        item.id: item
+        for item in session.execute(
+            queries.ITEMS_BY_IDS, {"item_ids": sorted({r["item_id"] for r in required} | {output_item_id})}
+        ).scalars()
+    }
 
-    allocations: List[dict] = []
+    allocations: List[dict] = fifo.allocate_many(session, required)
     cost_inputs_cents = 0
     consumed_per_item: dict[int, float] = {}
     # cache item -> (dimension, uom, multiplier) to avoid repeated lookups
     item_uom_cache: dict[int, tuple[str, str, int]] = {}
-    for r in required:
-        if r["qty"] <= 0:
-            continue
-        if r["is_optional"]:
-            if on_hand_qty(session, r["item_id"]) + 1e-9 < r["qty"]:
-                continue
-        slices = fifo.allocate(session, r["item_id"], r["qty"])
-        for alloc in slices:
-            allocations.append(alloc)
-            consumed_per_item[alloc["item_id"]] = consumed_per_item.get(alloc["item_id"], 0) + alloc[
-                "qty"
-            ]
-            # Convert alloc qty from base units back to the item's UOM before multiplying by UOM-priced cents
-            if alloc["unit_cost_cents"] is not None:
-                cached = item_uom_cache.get(alloc["item_id"])
-                if cached is None:
-                    item_obj = session.get(Item, alloc["item_id"])
-                    dim = getattr(item_obj, "dimension", "count") or "count"
-                    uom = getattr(item_obj, "uom", "ea") or "ea"
-                    mult = uom_multiplier(dim, uom)
-                    cached = (dim, uom, mult)
-                    item_uom_cache[alloc["item_id"]] = cached
-                _, _, mult = cached
-                qty_in_uom = alloc["qty"] / float(mult)
-                cost_inputs_cents += int(round(alloc["unit_cost_cents"] * qty_in_uom))
-
     for alloc in allocations:
-        session.add(
-            ItemMovement(
-                item_id=alloc["item_id"],
-                batch_id=alloc["batch_id"],
-                qty_change=-alloc["qty"],
-                unit_cost_cents=alloc["unit_cost_cents"],
-                source_kind="manufacturing",
-                source_id=mfg_run.id,
-                is_oversold=False,
-            )
+        consumed_per_item[alloc["item_id"]] = consumed_per_item.get(alloc["item_id"], 0) + alloc["qty"]
+        # Convert alloc qty from base units back to the item's UOM before multiplying by UOM-priced cents
+        if alloc["unit_cost_cents"] is not None:
+            cached = item_uom_cache.get(alloc["item_id"])
+            if cached is None:
+                cached = item_uom_cache[alloc["item_id"]] = _item_uom(session, alloc["item_id"])
+            _, _, mult = cached
+            qty_in_uom = alloc["qty"] / float(mult)
+            cost_inputs_cents += int(round(alloc["unit_cost_cents"] * qty_in_uom))
+
+    # Plain executemany: ORM inserts would need RETURNING, which SQLite runs one row at a time.
+    last_consume_move: Dict[int, int] = {}
+    if allocations:
+        session.flush()
+        conn = session.connection()
+        move_mark = conn.execute(queries.LAST_MOVEMENT_ID).scalar_one()
+        conn.execute(
+            insert(ItemMovement.__table__),
+            [
+                {
+                    "item_id": alloc["item_id"],
+                    "batch_id": alloc["batch_id"],
+                    "qty_change": -alloc["qty"],
+                    "unit_cost_cents": alloc["unit_cost_cents"],
+                    "source_kind": "manufacturing",
+                    "source_id": mfg_run.id,
+                    "is_oversold": False,
+                }
+                for alloc in allocations
+            ],
         )
+        last_consume_move = dict(conn.execute(queries.LAST_MOVEMENT_PER_ITEM, {"after_id": move_mark}).all())
 
     # Price per OUTPUT UOM (not per base). Convert output base qty back to its UOM.
-    out_item = session.get(Item, output_item_id)
-    out_dim = getattr(out_item, "dimension", "count") or "count"
-    out_uom = getattr(out_item, "uom", "ea") or "ea"
-    out_mult = uom_multiplier(out_dim, out_uom)
+    out_dim, out_uom, out_mult = _item_uom(session, output_item_id)
     output_qty_uom = (body.output_qty or 0) / float(out_mult)
     per_output_cents = round_half_up_cents(cost_inputs_cents / max(output_qty_uom, 1e-9))
     output_batch = ItemBatch(
@@ -261,24 +389,31 @@ def execute_run_txn(
     except Exception:
         pass
 
-    session.add(
-        ItemMovement(
-            item_id=output_item_id,
-            batch_id=output_batch.id,
-            qty_change=body.output_qty,
-            unit_cost_cents=per_output_cents,
-            source_kind="manufacturing",
-            source_id=mfg_run.id,
-            is_oversold=False,
-        )
+    output_move = ItemMovement(
+        item_id=output_item_id,
+        batch_id=output_batch.id,
+        qty_change=body.output_qty,
+        unit_cost_cents=per_output_cents,
+        source_kind="manufacturing",
+        source_id=mfg_run.id,
+        is_oversold=False,
+    )
+    session.add(output_move)
+    session.flush()
+    summaries = ensure_summaries(session, consumed_per_item)
+    for item_id, move_id in last_consume_move.items():
+        summary = summaries[item_id]
+        summary.last_movement_id = max(int(summary.last_movement_id or 0), int(move_id))
+    record_layer_added(
+        session, output_item_id, output_batch.id, int(body.output_qty), per_output_cents, output_move.id
     )
 
     for item_id, qty in consumed_per_item.items():
-        item = session.get(Item, item_id)
+        item = items_by_id.get(item_id)
         if item:
             item.qty_stored = (item.qty_stored or 0) - qty
 
-    output_item = session.get(Item, output_item_id)
+    output_item = items_by_id.get(output_item_id)
     if output_item:
         output_item.qty_stored = (output_item.qty_stored or 0) + body.output_qty
 
@@ -312,4 +447,62 @@ def execute_run_txn(
     }
 
 
-__all__ = ["execute_run_txn", "fifo", "format_shortages", "validate_run"]
+execute_run_txn = transactional(_execute_run)
+
+
+def record_failed_run(
+    session: Session, body: ManufacturingRunRequest, output_item_id: int | None, shortages: list[dict]
+) -> ManufacturingRun:
+    """Add a ``failed_insufficient_stock`` run carrying its shortages. Caller commits."""
+    run = ManufacturingRun(
+        recipe_id=getattr(body, "recipe_id", None),
+        output_item_id=output_item_id or getattr(body, "output_item_id", None),
+        output_qty=getattr(body, "output_qty", 0.0),
+        status="failed_insufficient_stock",
+        notes=getattr(body, "notes", None),
+        meta=json.dumps({"shortages": shortages}),
+    )
+    session.add(run)
+    session.flush()
+    return run
+
+
+@transactional
+def execute_batch_txn(
+    session: Session, planned: Sequence[Tuple[ManufacturingRunRequest, int, list[dict], float]]
+) -> List[dict]:
+    """Execute pre-validated ``(body, output_item_id, required, k)`` runs in order, all or nothing."""
+    return [_execute_run(session, body, output_item_id, required, k) for body, output_item_id, required, k in planned]
+
+
+@transactional
+def execute_plan_txn(session: Session, plan, body: RecipeRunRequest) -> List[dict]:
+    """Run every build of an exploded plan, sub-assemblies first, in one transaction.
+
+    Each build is a normal recipe run (its own ``ManufacturingRun``, output
+    layer and FIFO allocations). Returns the per-build results with the
+    requested (root) build last; any shortage rolls the whole tree back.
+    """
+    results = []
+    for node in plan.root.post_order():
+        node_body = RecipeRunRequest(
+            recipe_id=node.recipe_id,
+            output_qty=node.output_qty,
+            notes=body.notes if node is plan.root else None,
+        )
+        results.append(_execute_run(session, node_body, node.output_item_id, node.required, node.k))
+    return results
+
+
+__all__ = [
+    "execute_batch_txn",
+    "execute_plan_txn",
+    "execute_run_txn",
+    "fifo",
+    "format_shortages",
+    "preview_batch",
+    "preview_run",
+    "record_failed_run",
+    "resolve_requirements",
+    "validate_run",
+]
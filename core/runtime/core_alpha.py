@@ -371,5 +371,9 @@ class CoreAlpha:
         self.update_capabilities_after_probe(results)
         return results
 
+    def close(self) -> None:
+        """Snapshot and close the journal files; called at app shutdown."""
+        self.journal.close()
+
 
 __all__ = ["CoreAlpha", "PluginRecord"]
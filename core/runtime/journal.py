@@ -20,29 +20,29 @@
 from __future__ import annotations
 
 import json
+import os
 import threading
 import time
 import uuid
 import hashlib
 import tempfile
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from core.runtime.seglog import DEFAULT_SEGMENT_BYTES, SegmentedLog
+
+SNAPSHOT_FORMAT = 1
+DEFAULT_SNAPSHOT_EVERY = 10_000
+# Older snapshots kept as a fallback when the newest does not load.
+SNAPSHOTS_KEPT = 2
 
-def _atomic_append(path: Path, lines: List[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    existing = ""
-    if path.exists():
-        existing = path.read_text(encoding="utf-8")
-    with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=str(path.parent)) as tf:
-        if existing:
-            tf.write(existing)
-            if not existing.endswith("\n"):
-                tf.write("\n")
-        for line in lines:
-            tf.write(line.rstrip("\n") + "\n")
-        tmp_name = tf.name
-    Path(tmp_name).replace(path)
+
+def _adopt_legacy(path: Path, directory: Path) -> None:
+    """Turn a single-file log from older releases into the first segment."""
+
+    if path.exists() and not any(directory.glob("*.log")):
+        directory.mkdir(parents=True, exist_ok=True)
+        path.replace(directory / "00000001.log")
 
 
 def _json_hash(obj: Dict[str, Any]) -> str:
@@ -50,18 +50,64 @@ def _json_hash(obj: Dict[str, Any]) -> str:
     return hashlib.sha256(payload).hexdigest()
 
 
+def _write_snapshot(path: Path, state: Dict[str, Any]) -> None:
+    with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=str(path.parent)) as tf:
+        # dumps() runs the C encoder; dump() would stream through the Python one.
+        tf.write(json.dumps(state, separators=(",", ":")))
+        tf.flush()
+        os.fsync(tf.fileno())
+        tmp_name = tf.name
+    Path(tmp_name).replace(path)
+
+
 class JournalManager:
-    """Append-only journal + audit chain."""
+    """Append-only journal + audit chain.
+
+    Both logs are :class:`~core.runtime.seglog.SegmentedLog` directories under
+    ``data_dir``. ``segment_bytes`` and ``fsync`` default to
+    ``BUS_JOURNAL_SEGMENT_BYTES`` and ``BUS_JOURNAL_FSYNC`` (``always``).
 
-    def __init__(self, data_dir: Path) -> None:
+    Every ``snapshot_every`` records (``BUS_JOURNAL_SNAPSHOT_EVERY``), on
+    :meth:`close` and after a recovery that replayed a long tail, the idempotency
+    map, the open prepares, both hash heads and both log positions are written
+    to ``data_dir/snapshots``. Recovery starts from the newest snapshot that
+    still matches the logs and replays only what follows it. Entries settled
+    before that snapshot are not re-indexed; their idempotency status is kept.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        *,
+        segment_bytes: Optional[int] = None,
+        fsync: Optional[str] = None,
+        snapshot_every: Optional[int] = None,
+    ) -> None:
         self._data_dir = data_dir
-        self._journal_path = data_dir / "journal.log"
-        self._audit_path = data_dir / "audit.log"
+        self._journal_path = data_dir / "journal"
+        self._audit_path = data_dir / "audit"
+        self._snapshot_dir = data_dir / "snapshots"
+        if segment_bytes is None:
+            segment_bytes = int(os.getenv("BUS_JOURNAL_SEGMENT_BYTES", DEFAULT_SEGMENT_BYTES))
+        if fsync is None:
+            fsync = os.getenv("BUS_JOURNAL_FSYNC", "always").strip().lower()
+        if snapshot_every is None:
+            snapshot_every = int(os.getenv("BUS_JOURNAL_SNAPSHOT_EVERY", DEFAULT_SNAPSHOT_EVERY))
+        self.snapshot_every = snapshot_every
+        _adopt_legacy(data_dir / "journal.log", self._journal_path)
+        _adopt_legacy(data_dir / "audit.log", self._audit_path)
+        self._journal = SegmentedLog(self._journal_path, segment_bytes=segment_bytes, fsync=fsync)
+        self._audit = SegmentedLog(self._audit_path, segment_bytes=segment_bytes, fsync=fsync)
         self._lock = threading.Lock()
         self._last_journal_hash = ""
         self._last_audit_hash = ""
         self._idempotency: Dict[str, str] = {}
         self._journal_index: Dict[str, Dict[str, Any]] = {}
+        # Prepared entries without an audit record yet.
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._since_snapshot = 0
+        self._snapshot_seq = 0
+        self._recovery: Dict[str, Any] = {}
         self._recover()
 
     @property
@@ -72,52 +118,106 @@ class JournalManager:
     def audit_path(self) -> Path:
         return self._audit_path
 
-    def _load_lines(self, path: Path) -> List[Dict[str, Any]]:
-        if not path.exists():
+    def _snapshots(self) -> List[Tuple[int, Path]]:
+        if not self._snapshot_dir.exists():
             return []
-        out: List[Dict[str, Any]] = []
-        for line in path.read_text(encoding="utf-8").splitlines():
-            line = line.strip()
-            if not line:
-                continue
+        found = [(int(p.stem), p) for p in self._snapshot_dir.glob("*.json") if p.stem.isdigit()]
+        return sorted(found)
+
+    def _load_snapshot(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Newest snapshot whose positions still lie within the logs."""
+
+        for seq, path in reversed(self._snapshots()):
             try:
-                out.append(json.loads(line))
-            except json.JSONDecodeError:
+                state = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
                 continue
-        return out
+            if state.get("format") != SNAPSHOT_FORMAT:
+                continue
+            journal_pos = tuple(state.get("journal_pos") or (0, 0))
+            audit_pos = tuple(state.get("audit_pos") or (0, 0))
+            # A log cut back below the snapshot (torn tail, restored backup) makes it unusable.
+            if self._journal.holds(journal_pos) and self._audit.holds(audit_pos):
+                return seq, state
+        return None
+
+    def _snapshot_locked(self) -> None:
+        # Positions must not run ahead of what is on disk.
+        self._journal.flush()
+        self._audit.flush()
+        self._snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self._snapshot_seq += 1
+        _write_snapshot(
+            self._snapshot_dir / f"{self._snapshot_seq:08d}.json",
+            {
+                "format": SNAPSHOT_FORMAT,
+                "journal_pos": list(self._journal.position()),
+                "audit_pos": list(self._audit.position()),
+                "last_journal_hash": self._last_journal_hash,
+                "last_audit_hash": self._last_audit_hash,
+                "idempotency": self._idempotency,
+                "open": self._open,
+            },
+        )
+        for _, old in self._snapshots()[:-SNAPSHOTS_KEPT]:
+            old.unlink(missing_ok=True)
+        self._since_snapshot = 0
 
     def _recover(self) -> None:
         with self._lock:
-            journal_entries = self._load_lines(self._journal_path)
-            audit_entries = self._load_lines(self._audit_path)
-            committed = {a.get("journal_id") for a in audit_entries if a.get("result") == "commit"}
-            rolled_back = {a.get("journal_id") for a in audit_entries if a.get("result") in {"rollback", "replay"}}
-            self._journal_index = {}
+            started = time.perf_counter()
+            loaded = self._load_snapshot()
+            journal_pos, audit_pos = (0, 0), (0, 0)
             self._idempotency = {}
+            self._open = {}
             self._last_journal_hash = ""
-            for entry in journal_entries:
+            self._last_audit_hash = ""
+            snapshots = self._snapshots()
+            if snapshots:
+                self._snapshot_seq = snapshots[-1][0]
+            if loaded is not None:
+                _, state = loaded
+                journal_pos = tuple(state["journal_pos"])
+                audit_pos = tuple(state["audit_pos"])
+                self._idempotency = dict(state.get("idempotency") or {})
+                self._open = dict(state.get("open") or {})
+                self._last_journal_hash = state.get("last_journal_hash", "")
+                self._last_audit_hash = state.get("last_audit_hash", "")
+            self._journal_index = dict(self._open)
+
+            replayed = 0
+            for entry in self._journal.records(journal_pos):
+                replayed += 1
                 jid = str(entry.get("journal_id"))
                 if not jid:
                     continue
                 self._journal_index[jid] = entry
+                self._open[jid] = entry
                 self._last_journal_hash = _json_hash(entry)
                 self._idempotency[str(entry.get("idempotency_key"))] = "pending"
-            self._last_audit_hash = ""
-            for entry in audit_entries:
+            for entry in self._audit.records(audit_pos):
+                replayed += 1
                 self._last_audit_hash = entry.get("hash", "")
                 jid = str(entry.get("journal_id"))
-                if jid and entry.get("result") == "commit":
-                    self._idempotency[str(self._journal_index.get(jid, {}).get("idempotency_key"))] = "committed"
-                elif jid:
-                    self._idempotency[str(self._journal_index.get(jid, {}).get("idempotency_key"))] = "rolled_back"
-            pending = {
-                jid: entry
-                for jid, entry in self._journal_index.items()
-                if jid not in committed and jid not in rolled_back
-            }
-            for jid, entry in pending.items():
+                self._open.pop(jid, None)
+                prepared = self._journal_index.get(jid)
+                if prepared is None:
+                    continue
+                key = str(prepared.get("idempotency_key"))
+                self._idempotency[key] = "committed" if entry.get("result") == "commit" else "rolled_back"
+            for jid, entry in list(self._open.items()):
                 self._record_audit_locked(jid, "rollback", detail="recovered_pending")
                 self._idempotency[str(entry.get("idempotency_key"))] = "rolled_back"
+            # A short tail is cheaper to replay again than to snapshot on every boot.
+            if replayed and (loaded is None or replayed >= self.snapshot_every):
+                self._snapshot_locked()
+            else:
+                self._since_snapshot = replayed
+            self._recovery = {
+                "snapshot": loaded[0] if loaded is not None else None,
+                "replayed": replayed,
+                "ms": round((time.perf_counter() - started) * 1000.0, 3),
+            }
 
     def prepare(
         self,
@@ -148,10 +248,12 @@ class JournalManager:
                 "prev_hash": self._last_journal_hash,
             }
             digest = _json_hash(entry)
-            _atomic_append(self._journal_path, [json.dumps(entry, separators=(",", ":"))])
+            self._journal.append(entry)
             self._last_journal_hash = digest
             self._journal_index[journal_id] = entry
+            self._open[journal_id] = entry
             self._idempotency[idempotency_key] = "pending"
+            self._tick_locked()
             return entry
 
     def commit(self, journal_id: str, *, result: str = "commit") -> Dict[str, Any]:
@@ -171,20 +273,55 @@ class JournalManager:
             record["detail"] = detail
         record_hash = _json_hash(record)
         record["hash"] = record_hash
-        _atomic_append(self._audit_path, [json.dumps(record, separators=(",", ":"))])
+        self._audit.append(record)
         self._last_audit_hash = record_hash
+        self._open.pop(journal_id, None)
         entry = self._journal_index.get(journal_id)
         if entry:
             self._idempotency[str(entry.get("idempotency_key"))] = "committed" if result == "commit" else "rolled_back"
+        self._tick_locked()
         return record
 
+    def _tick_locked(self) -> None:
+        self._since_snapshot += 1
+        if self.snapshot_every > 0 and self._since_snapshot >= self.snapshot_every:
+            self._snapshot_locked()
+
     def status_for_idempotency(self, key: str) -> Optional[str]:
         return self._idempotency.get(key)
 
+    def verify_chain(self) -> List[Dict[str, Any]]:
+        """Walk both hash chains across every segment; returns one entry per broken link."""
+
+        breaks: List[Dict[str, Any]] = []
+        with self._lock:
+            prev = ""
+            for n, entry in enumerate(self._journal.records()):
+                if entry.get("prev_hash", "") != prev:
+                    breaks.append({"log": "journal", "index": n, "journal_id": entry.get("journal_id")})
+                prev = _json_hash(entry)
+            prev = ""
+            for n, record in enumerate(self._audit.records()):
+                body = {k: v for k, v in record.items() if k != "hash"}
+                if record.get("prev_hash", "") != prev or record.get("hash") != _json_hash(body):
+                    breaks.append({"log": "audit", "index": n, "journal_id": record.get("journal_id")})
+                prev = record.get("hash", "")
+        return breaks
+
+    def close(self) -> None:
+        with self._lock:
+            if self._since_snapshot:
+                self._snapshot_locked()
+            self._journal.close()
+            self._audit.close()
+
     def as_dict(self) -> Dict[str, Any]:
         with self._lock:
             return {
                 "journal_path": str(self._journal_path),
                 "audit_path": str(self._audit_path),
+                "journal_log": self._journal.stats(),
+                "audit_log": self._audit.stats(),
+                "recovery": dict(self._recovery),
                 "idempotency": dict(self._idempotency),
             }
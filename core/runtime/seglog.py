@@ -0,0 +1,247 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# TGC BUS Core (Business Utility System Core)
+# Copyright (C) 2025 True Good Craft
+#
+# This file is part of TGC BUS Core.
+#
+# TGC BUS Core is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# TGC BUS Core is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with TGC BUS Core.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Append-only JSON-lines log split into fixed-size segment files.
+
+Records go to the newest segment, ``<dir>/00000001.log`` onwards, with a
+plain append; once a segment reaches ``segment_bytes`` the next record opens
+a new one. An append therefore costs the same however long the history is.
+
+``fsync`` decides when appends reach the disk: ``"always"`` after every
+record, ``"interval"`` at most once per ``fsync_interval`` seconds (and on
+rotation and close), ``"off"`` leaves it to the OS.
+
+A crash can leave a half-written record at the end of the newest segment.
+Opening the log cuts the segment back to its last complete record.
+
+:meth:`SegmentedLog.position` names the end of the log as ``(segment,
+offset)``; :meth:`SegmentedLog.records` can start reading there, which is how
+recovery skips what a snapshot already covers.
+
+The log does not lock; :class:`core.runtime.journal.JournalManager`
+serialises appends.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+FSYNC_POLICIES = ("always", "interval", "off")
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+_SUFFIX = ".log"
+
+# ``(segment number, byte offset)``; ``(0, 0)`` is the start of an empty log.
+Position = Tuple[int, int]
+
+
+def _segment_no(path: Path) -> int:
+    return int(path.stem)
+
+
+def _fsync_dir(path: Path) -> None:
+    # Makes a new segment's directory entry durable; not possible on Windows.
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SegmentedLog:
+    """Fixed-size segments of newline-terminated JSON records."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        fsync: str = "always",
+        fsync_interval: float = 1.0,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        if segment_bytes <= 0:
+            raise ValueError("segment_bytes must be positive")
+        self._dir = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._fh: Optional[BinaryIO] = None
+        self._active = 0
+        self._size = 0
+        self._synced_at = time.monotonic()
+        self._dirty = False
+        self.repaired_bytes = 0
+        segments = self.segments()
+        if segments:
+            self.repaired_bytes = self._repair_tail(segments[-1])
+            self._open(_segment_no(segments[-1]))
+
+    @property
+    def directory(self) -> Path:
+        return self._dir
+
+    def segments(self) -> List[Path]:
+        """Segment files, oldest first."""
+
+        return sorted(
+            (p for p in self._dir.glob(f"*{_SUFFIX}") if p.stem.isdigit()),
+            key=_segment_no,
+        )
+
+    def _path(self, number: int) -> Path:
+        return self._dir / f"{number:08d}{_SUFFIX}"
+
+    @staticmethod
+    def _repair_tail(path: Path) -> int:
+        """Cut a torn final record off ``path``; returns the bytes removed."""
+
+        size = path.stat().st_size
+        if size == 0:
+            return 0
+        with path.open("r+b") as fh:
+            # Read back far enough to hold the last complete record whole.
+            start = size
+            tail = b""
+            while start > 0 and tail.count(b"\n") < 2:
+                step = min(start, 64 * 1024)
+                start -= step
+                fh.seek(start)
+                tail = fh.read(step) + tail
+            lines = tail.split(b"\n")
+            # Whatever follows the final newline is a torn record.
+            keep = size - len(lines[-1])
+            last = lines[-2] if len(lines) >= 2 else b""
+            if last.strip():
+                try:
+                    json.loads(last)
+                except ValueError:
+                    # Newline-terminated but garbled: torn inside a buffered write.
+                    keep -= len(last) + 1
+            if keep == size:
+                return 0
+            fh.truncate(keep)
+            fh.flush()
+            os.fsync(fh.fileno())
+        return size - keep
+
+    def _open(self, number: int) -> None:
+        path = self._path(number)
+        created = not path.exists()
+        self._fh = path.open("ab")
+        self._active = number
+        self._size = self._fh.tell()
+        if created:
+            _fsync_dir(self._dir)
+
+    def _sync(self) -> None:
+        if self._fh is not None and self._dirty:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._synced_at = time.monotonic()
+            self._dirty = False
+
+    def append(self, record: Dict[str, Any]) -> None:
+        data = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._fh is None:
+            self._open(1)
+        elif self._size and self._size + len(data) > self.segment_bytes:
+            self._sync()
+            self._fh.close()
+            self._open(self._active + 1)
+        assert self._fh is not None
+        self._fh.write(data)
+        self._size += len(data)
+        self._dirty = True
+        if self.fsync == "always":
+            self._sync()
+        elif self.fsync == "interval":
+            if time.monotonic() - self._synced_at >= self.fsync_interval:
+                self._sync()
+            else:
+                self._fh.flush()
+        else:
+            self._fh.flush()
+
+    def position(self) -> Position:
+        """Where the next record will start, i.e. the end of what is written so far."""
+
+        return (self._active, self._size)
+
+    def holds(self, position: Position) -> bool:
+        """True if ``position`` lies within the log as it is on disk."""
+
+        segment, offset = position
+        if segment == 0:
+            return offset == 0
+        path = self._path(segment)
+        return path.exists() and offset <= path.stat().st_size
+
+    def records(self, start: Position = (0, 0)) -> Iterator[Dict[str, Any]]:
+        """Records from ``start`` on, oldest first; lines that do not parse are skipped."""
+
+        first, offset = start
+        for path in self.segments():
+            number = _segment_no(path)
+            if number < first:
+                continue
+            with path.open("rb") as fh:
+                if number == first:
+                    fh.seek(offset)
+                for line in fh:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def flush(self) -> None:
+        self._sync()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._sync()
+            self._fh.close()
+            self._fh = None
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            "directory": str(self._dir),
+            "segments": len(segments),
+            "active_segment": self._active,
+            "active_bytes": self._size,
+            "segment_bytes": self.segment_bytes,
+            "fsync": self.fsync,
+            "repaired_bytes": self.repaired_bytes,
+        }
+
+
+__all__ = ["DEFAULT_SEGMENT_BYTES", "FSYNC_POLICIES", "Position", "SegmentedLog"]
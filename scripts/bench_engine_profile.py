@@ -0,0 +1,91 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Request-shaped database latency for each engine profile.
+
+Builds a throwaway database per profile and times what a request does: open a
+session, run a query (a stock read or a purchase commit), close it. The
+``legacy`` profile is the old ``NullPool`` engine with SQLite defaults; the
+others come from :data:`core.appdb.engine.PROFILES`.
+
+    python scripts/bench_engine_profile.py [--items 2000] [--requests 2000] [--profiles legacy,tuned,durable]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from core.appdb.engine import PROFILES, create_app_engine  # noqa: E402
+from core.appdb.ledger import add_batch  # noqa: E402
+from core.appdb.models import Base, Item, ItemStockSummary  # noqa: E402
+
+
+def _seed(engine, items: int) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM items")
+        conn.execute(
+            Item.__table__.insert(),
+            [
+                {"id": i, "name": f"item {i}", "uom": "ea", "dimension": "count", "qty_stored": 0, "is_product": 0}
+                for i in range(1, items + 1)
+            ],
+        )
+
+
+def _median_ms(samples) -> float:
+    return statistics.median(samples) * 1000.0
+
+
+def _bench(profile_name: str, items: int, requests: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_app_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", PROFILES[profile_name])
+        Base.metadata.create_all(bind=engine)
+        _seed(engine, items)
+        factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+        reads = []
+        for n in range(requests):
+            t0 = time.perf_counter()
+            with factory() as db:
+                db.execute(select(Item).where(Item.id == (n % items) + 1)).scalar_one()
+                db.execute(select(ItemStockSummary).limit(50)).all()
+            reads.append(time.perf_counter() - t0)
+
+        writes = []
+        for n in range(requests):
+            t0 = time.perf_counter()
+            with factory() as db:
+                add_batch(db, (n % items) + 1, 1, 100, "purchase", None)
+                db.commit()
+            writes.append(time.perf_counter() - t0)
+        engine.dispose()
+    return _median_ms(reads), _median_ms(writes)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--profiles", default="legacy,tuned,durable")
+    args = ap.parse_args(argv)
+
+    print(f"{'profile':>8} {'read ms':>9} {'write ms':>9}")
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        read_ms, write_ms = _bench(name, args.items, args.requests)
+        print(f"{name:>8} {read_ms:>9.3f} {write_ms:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
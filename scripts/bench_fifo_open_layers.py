@@ -0,0 +1,106 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""FIFO allocation latency as depleted batches pile up.
+
+Builds a throwaway database with one hot item, grows its depleted batch history
+and times ``fifo_consume_many`` (rolled back after every call) with and without
+``ix_item_batches_open_fifo``. With the partial index the latency should stay
+flat; without it each call walks the item's whole history.
+
+    python scripts/bench_fifo_open_layers.py [--sizes 0,10000,100000,300000] [--repeat 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from core.appdb.ledger import fifo_consume_many  # noqa: E402
+from core.appdb.migrate import FIFO_OPEN_INDEX_DDL  # noqa: E402
+from core.appdb.models import Base  # noqa: E402
+from core.appdb.stock_summary import rebuild_summary  # noqa: E402
+
+OPEN_LAYERS = 5
+
+
+def _grow_history(engine, item_id: int, depleted: int) -> None:
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany(
+            "INSERT INTO item_batches(item_id, qty_initial, qty_remaining, unit_cost_cents, source_kind, is_oversold, created_at)"
+            " VALUES (?, 1, 0, 100, 'purchase', 0, datetime('2020-01-01', ?))",
+            ((item_id, f"+{i} seconds") for i in range(depleted)),
+        )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _time_consume(engine, item_id: int, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        with Session(bind=engine) as db:
+            t0 = time.perf_counter()
+            fifo_consume_many(db, [(item_id, OPEN_LAYERS - 1)], "bench", None)
+            samples.append(time.perf_counter() - t0)
+            db.rollback()
+    return statistics.median(samples) * 1000.0
+
+
+def run(sizes, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO items(id, name, uom, dimension, qty_stored, is_product) VALUES (1, 'hot', 'ea', 'count', 0, 0)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_item_batches_item ON item_batches(item_id, created_at)")
+            for n in range(OPEN_LAYERS):
+                conn.exec_driver_sql(
+                    "INSERT INTO item_batches(item_id, qty_initial, qty_remaining, unit_cost_cents, source_kind, is_oversold, created_at)"
+                    f" VALUES (1, 1, 1, 100, 'purchase', 0, datetime('2030-01-01', '+{n} seconds'))"
+                )
+
+        print(f"{'depleted':>10} {'with index ms':>14} {'without ms':>11}")
+        have = 0
+        for size in sizes:
+            _grow_history(engine, 1, size - have)
+            have = size
+            with Session(bind=engine) as db:
+                rebuild_summary(db)
+                db.commit()
+            with engine.begin() as conn:
+                conn.exec_driver_sql(FIFO_OPEN_INDEX_DDL)
+                conn.exec_driver_sql("ANALYZE")
+            with_idx = _time_consume(engine, 1, repeat)
+            with engine.begin() as conn:
+                conn.exec_driver_sql("DROP INDEX ix_item_batches_open_fifo")
+                conn.exec_driver_sql("ANALYZE")
+            without = _time_consume(engine, 1, repeat)
+            print(f"{size:>10} {with_idx:>14.3f} {without:>11.3f}")
+        engine.dispose()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="0,10000,100000,300000")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args(argv)
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    run(sizes, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
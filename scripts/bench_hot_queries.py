@@ -0,0 +1,168 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Per-call cost of the hot inventory statements: rebuilt each call vs prebuilt.
+
+Seeds a throwaway database, then runs each statement ``--calls`` times inside
+one session, once building the ``select()`` per call the way the callers used
+to and once executing the prebuilt statement from :mod:`core.appdb.queries`.
+
+    python scripts/bench_hot_queries.py [--items 500] [--layers 4] [--calls 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import asc, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from core.appdb import queries  # noqa: E402
+from core.appdb.engine import create_app_engine  # noqa: E402
+from core.appdb.models import Base, Item, ItemBatch, ItemMovement, ItemStockSummary, Vendor  # noqa: E402
+from core.appdb.stock_summary import rebuild_summary  # noqa: E402
+
+IDS = [3, 7, 11, 19]
+
+
+def _listing_row(item_id):
+    on_hand = func.coalesce(ItemStockSummary.on_hand, 0)
+    return (
+        select(Item, Vendor.name, on_hand, ItemBatch.unit_cost_cents)
+        .outerjoin(ItemStockSummary, ItemStockSummary.item_id == Item.id)
+        .outerjoin(ItemBatch, ItemBatch.id == ItemStockSummary.oldest_open_batch_id)
+        .outerjoin(Vendor, Vendor.id == Item.vendor_id)
+        .where(Item.id == item_id)
+    )
+
+
+def _fifo(stmt):
+    return stmt.order_by(asc(ItemBatch.item_id), asc(ItemBatch.created_at), asc(ItemBatch.id))
+
+
+_open = (ItemBatch.item_id.in_(IDS), ItemBatch.qty_remaining > 0)
+
+# name -> (rebuilt per call, prebuilt statement, params)
+CASES = {
+    "on_hand_one": (
+        lambda: select(func.coalesce(func.sum(ItemBatch.qty_remaining), 0)).where(ItemBatch.item_id == 7),
+        queries.ON_HAND_ONE,
+        {"item_id": 7},
+    ),
+    "on_hand_many": (
+        lambda: select(ItemBatch.item_id, func.sum(ItemBatch.qty_remaining)).where(*_open).group_by(ItemBatch.item_id),
+        queries.ON_HAND_MANY,
+        {"item_ids": IDS},
+    ),
+    "open_layers": (lambda: _fifo(select(ItemBatch).where(*_open)), queries.OPEN_LAYERS, {"item_ids": IDS}),
+    "open_layers_for_update": (
+        lambda: _fifo(select(ItemBatch).where(*_open)).with_for_update(),
+        queries.OPEN_LAYERS_FOR_UPDATE,
+        {"item_ids": IDS},
+    ),
+    "open_layer_tuples": (
+        lambda: _fifo(
+            select(ItemBatch.item_id, ItemBatch.id, ItemBatch.qty_remaining, ItemBatch.unit_cost_cents).where(*_open)
+        ),
+        queries.OPEN_LAYER_TUPLES,
+        {"item_ids": IDS},
+    ),
+    "item_batches": (
+        lambda: select(ItemBatch).where(ItemBatch.item_id == 7).order_by(asc(ItemBatch.created_at), asc(ItemBatch.id)),
+        queries.ITEM_BATCHES,
+        {"item_id": 7},
+    ),
+    "items_by_ids": (lambda: select(Item).where(Item.id.in_(IDS)), queries.ITEMS_BY_IDS, {"item_ids": IDS}),
+    "summaries_by_ids": (
+        lambda: select(ItemStockSummary).where(ItemStockSummary.item_id.in_(IDS)),
+        queries.SUMMARIES_BY_IDS,
+        {"item_ids": IDS},
+    ),
+    "item_row": (lambda: _listing_row(7), queries.ITEM_ROW, {"item_id": 7}),
+    "last_movement_id": (
+        lambda: select(func.coalesce(func.max(ItemMovement.id), 0)),
+        queries.LAST_MOVEMENT_ID,
+        {},
+    ),
+    "last_movement_per_item": (
+        lambda: select(ItemMovement.item_id, func.max(ItemMovement.id))
+        .where(ItemMovement.id > 0)
+        .group_by(ItemMovement.item_id),
+        queries.LAST_MOVEMENT_PER_ITEM,
+        {"after_id": 0},
+    ),
+}
+
+
+def _seed(engine, items: int, layers: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            Item.__table__.insert(),
+            [
+                {"id": i, "name": f"item {i}", "uom": "ea", "dimension": "count", "qty_stored": layers * 10}
+                for i in range(1, items + 1)
+            ],
+        )
+        conn.execute(
+            ItemBatch.__table__.insert(),
+            [
+                {
+                    "item_id": i,
+                    "qty_initial": 10,
+                    "qty_remaining": 10,
+                    "unit_cost_cents": 100 + n,
+                    "source_kind": "purchase",
+                    "is_oversold": False,
+                }
+                for i in range(1, items + 1)
+                for n in range(layers)
+            ],
+        )
+
+
+def _per_call_us(db, build, params, calls: int) -> float:
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        db.execute(build(), params).all()
+        samples.append(time.perf_counter() - t0)
+        db.expunge_all()
+    return statistics.median(samples) * 1e6
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=500)
+    ap.add_argument("--layers", type=int, default=4)
+    ap.add_argument("--calls", type=int, default=5000)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_app_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        _seed(engine, args.items, args.layers)
+        factory = sessionmaker(bind=engine, autoflush=False, future=True)
+        with factory() as db:
+            rebuild_summary(db)
+            db.commit()
+
+        print(f"{'statement':>24} {'rebuilt us':>11} {'prebuilt us':>12} {'saved':>7}")
+        with factory() as db:
+            for name, (rebuild, prebuilt, params) in CASES.items():
+                before = _per_call_us(db, lambda: rebuild(), {}, args.calls)
+                after = _per_call_us(db, lambda: prebuilt, params, args.calls)
+                print(f"{name:>24} {before:>11.1f} {after:>12.1f} {1 - after / before:>7.0%}")
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Journal append and boot cost as the history grows.
+
+Appends: ``rewrite`` is the old ``_atomic_append`` (read the log, copy it to a
+temp file, add a line, replace); ``segmented`` is
+:class:`core.runtime.seglog.SegmentedLog`. Both run with fsync off so the
+numbers show the algorithm, not the disk.
+
+Boot: time to construct a :class:`core.runtime.journal.JournalManager` over a
+history of prepare/commit pairs, replaying every record (snapshots removed)
+vs starting from the snapshot written at close plus ``--tail`` newer pairs.
+
+    python scripts/bench_journal.py [--sizes 1000,10000,50000] [--samples 200] [--tail 100]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from core.runtime.journal import JournalManager  # noqa: E402
+from core.runtime.seglog import SegmentedLog  # noqa: E402
+
+
+def _record(n: int) -> dict:
+    return {
+        "journal_id": f"{n:032x}",
+        "run_id": "bench",
+        "actor": "bench",
+        "intent": "inventory.adjust",
+        "idempotency_key": f"key-{n}",
+        "ts": "2025-01-01T00:00:00Z",
+        "prev_hash": "0" * 64,
+    }
+
+
+def _rewrite_append(path: Path, line: str) -> None:
+    existing = path.read_text(encoding="utf-8") if path.exists() else ""
+    with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=str(path.parent)) as tf:
+        tf.write(existing)
+        tf.write(line + "\n")
+        tmp_name = tf.name
+    Path(tmp_name).replace(path)
+
+
+def _bench_rewrite(tmp: Path, size: int, samples: int) -> float:
+    path = tmp / "journal.log"
+    path.write_text("".join(json.dumps(_record(n)) + "\n" for n in range(size)), encoding="utf-8")
+    times = []
+    for n in range(samples):
+        t0 = time.perf_counter()
+        _rewrite_append(path, json.dumps(_record(size + n)))
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1e6
+
+
+def _bench_segmented(tmp: Path, size: int, samples: int) -> float:
+    log = SegmentedLog(tmp / "journal", fsync="off")
+    for n in range(size):
+        log.append(_record(n))
+    times = []
+    for n in range(samples):
+        t0 = time.perf_counter()
+        log.append(_record(size + n))
+        times.append(time.perf_counter() - t0)
+    log.close()
+    return statistics.median(times) * 1e6
+
+
+def _pairs(journal: JournalManager, start: int, count: int) -> None:
+    for n in range(start, start + count):
+        entry = journal.prepare(
+            run_id="bench",
+            actor="bench",
+            intent="inventory.adjust",
+            idempotency_key=f"key-{n}",
+            inputs_hash="in",
+            proposal_hash="prop",
+            policy_version="v1",
+        )
+        journal.commit(entry["journal_id"])
+
+
+def _boot_ms(data: Path) -> float:
+    t0 = time.perf_counter()
+    journal = JournalManager(data, fsync="off")
+    elapsed = time.perf_counter() - t0
+    journal.close()
+    return elapsed * 1000.0
+
+
+def _bench_boot(tmp: Path, size: int, tail: int):
+    journal = JournalManager(tmp, fsync="off", snapshot_every=0)
+    _pairs(journal, 0, size)
+    journal.close()
+    # Records written after the last snapshot, as after a crash.
+    journal = JournalManager(tmp, fsync="off", snapshot_every=0)
+    _pairs(journal, size, tail)
+    journal._journal.close()
+    journal._audit.close()
+
+    full_dir = tmp.parent / (tmp.name + "-full")
+    shutil.copytree(tmp, full_dir)
+    shutil.rmtree(full_dir / "snapshots")
+    full = _boot_ms(full_dir)
+    snap = _boot_ms(tmp)
+    shutil.rmtree(full_dir)
+    return full, snap
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="1000,10000,50000")
+    ap.add_argument("--samples", type=int, default=200)
+    ap.add_argument("--tail", type=int, default=100)
+    args = ap.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    print(f"{'history':>8} {'rewrite us':>11} {'segmented us':>13}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            old = _bench_rewrite(Path(a), size, args.samples)
+            new = _bench_segmented(Path(b), size, args.samples)
+        print(f"{size:>8} {old:>11.1f} {new:>13.1f}")
+
+    print(f"\n{'pairs':>8} {'full replay ms':>15} {'snapshot ms':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            full, snap = _bench_boot(Path(tmp) / "data", size, args.tail)
+        print(f"{size:>8} {full:>15.1f} {snap:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
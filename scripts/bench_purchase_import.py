@@ -0,0 +1,88 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Throughput of the streaming purchase import.
+
+Generates CSV lines lazily and imports them into a throwaway database with
+``core.appdb.purchase_import``; prints rows/second. ``--trace-memory`` also
+reports peak traced memory (tracemalloc slows the run down several times).
+
+    python scripts/bench_purchase_import.py [--rows 100000] [--items 50] [--chunk 5000] [--trace-memory]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from core.appdb.models import Base, Item  # noqa: E402
+from core.appdb.purchase_import import DEFAULT_CHUNK_SIZE, import_purchases, iter_rows  # noqa: E402
+
+
+class _CsvSource(io.TextIOBase):
+    """Produces CSV lines on demand so the input itself takes no memory."""
+
+    def __init__(self, rows: int, items: int):
+        self._rows, self._items, self._n = rows, items, -1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        self._n += 1
+        if self._n == 0:
+            return "item_id,qty,uom,unit_cost_cents\n"
+        if self._n > self._rows:
+            raise StopIteration
+        n = self._n
+        return f"{n % self._items + 1},{n % 7 + 1},ea,{n % 90}\n"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--items", type=int, default=50)
+    ap.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument("--trace-memory", action="store_true")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(bind=engine)
+        with Session(bind=engine) as db:
+            db.add_all(Item(name=f"item {n}", uom="ea", qty_stored=0) for n in range(args.items))
+            db.commit()
+
+        if args.trace_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        with Session(bind=engine) as db:
+            result = import_purchases(
+                db, iter_rows(_CsvSource(args.rows, args.items), "csv"), chunk_size=args.chunk
+            )
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        tracemalloc.stop()
+        engine.dispose()
+
+    line = f"imported {result.imported} rows ({result.failed} failed) in {elapsed:.2f}s"
+    line += f" = {result.imported / elapsed:,.0f} rows/s"
+    if peak is not None:
+        line += f", peak traced memory {peak / 1e6:.1f} MB"
+    print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,8 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import os, sys
-from core.appdb.ensure import DB_PATH, ensure_schema
+from core.appdb.engine import DB_PATH, get_engine
+from core.appdb.migrate import run_migrations
 
 if __name__ == "__main__":
     try:
@@ -13,5 +14,5 @@ if __name__ == "__main__":
         print(f"[reset] could not remove {DB_PATH}: {e}")
         sys.exit(1)
 
-    res = ensure_schema()
-    print(f"[reset] recreated baseline: {res}")
+    report = run_migrations(get_engine())
+    print(f"[reset] recreated baseline: {report.summary()}")
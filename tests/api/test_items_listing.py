@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture()
+def listing_setup(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("BUS_DB", str(db_path))
+
+    for module_name in list(sys.modules):
+        if module_name.startswith(("core.api", "core.appdb", "core.ledger", "core.manufacturing")):
+            sys.modules.pop(module_name, None)
+
+    import core.appdb.engine as engine_module
+    import core.appdb.models as models_module
+    import core.api.http as api_http
+
+    from tgc.settings import Settings
+    from tgc.state import init_state
+
+    api_http.app.state.app_state = init_state(Settings())
+    engine = engine_module.get_engine()
+    models_module.Base.metadata.create_all(bind=engine)
+
+    client = TestClient(api_http.APP)
+    session_token = api_http._load_or_create_token()
+    api_http.app.state.app_state.tokens._rec.token = session_token
+    client.headers.update({"Cookie": f"bus_session={session_token}"})
+
+    t0 = datetime(2025, 1, 1)
+    with engine_module.SessionLocal(bind=engine) as db:
+        acme = models_module.Vendor(name="Acme")
+        db.add(acme)
+        db.flush()
+        bolts = models_module.Item(name="Bolts", uom="ea", vendor_id=acme.id, item_type="part", location="A1")
+        nuts = models_module.Item(name="Nuts", uom="ea", item_type="part", location="B2")
+        glue = models_module.Item(name="Glue", uom="ea", item_type="supply", location="A1")
+        db.add_all([bolts, nuts, glue])
+        db.flush()
+        db.add_all(
+            [
+                # depleted layer is ignored for both on-hand and FIFO cost
+                models_module.ItemBatch(
+                    item_id=bolts.id, qty_initial=5, qty_remaining=0, unit_cost_cents=5,
+                    source_kind="purchase", created_at=t0,
+                ),
+                models_module.ItemBatch(
+                    item_id=bolts.id, qty_initial=5, qty_remaining=3, unit_cost_cents=12,
+                    source_kind="purchase", created_at=t0 + timedelta(days=1),
+                ),
+                models_module.ItemBatch(
+                    item_id=bolts.id, qty_initial=4, qty_remaining=4, unit_cost_cents=15,
+                    source_kind="purchase", created_at=t0 + timedelta(days=2),
+                ),
+                models_module.ItemBatch(
+                    item_id=nuts.id, qty_initial=1, qty_remaining=1, unit_cost_cents=250,
+                    source_kind="purchase", created_at=t0,
+                ),
+            ]
+        )
+        # Raw batch inserts bypass the ledger helpers, so rebuild the summary.
+        from core.appdb.stock_summary import rebuild_summary
+
+        rebuild_summary(db)
+        db.commit()
+        ids = {"bolts": bolts.id, "nuts": nuts.id, "glue": glue.id, "acme": acme.id}
+
+    yield {"client": client, "ids": ids}
+
+
+def test_listing_computes_onhand_fifo_and_vendor(listing_setup):
+    client = listing_setup["client"]
+    ids = listing_setup["ids"]
+
+    resp = client.get("/app/items")
+    assert resp.status_code == 200, resp.text
+    rows = {r["id"]: r for r in resp.json()}
+    assert list(rows) == [ids["bolts"], ids["nuts"], ids["glue"]]
+
+    bolts = rows[ids["bolts"]]
+    assert bolts["vendor"] == "Acme"
+    assert bolts["stock_on_hand_int"] == 7
+    assert bolts["fifo_unit_cost_cents"] == 12
+    assert bolts["fifo_unit_cost_display"] == "$0.12 / ea"
+
+    glue = rows[ids["glue"]]
+    assert glue["stock_on_hand_int"] == 0
+    assert glue["fifo_unit_cost_cents"] is None
+    assert glue["fifo_unit_cost_display"] is None
+
+
+def test_listing_filters_sorts_and_paginates(listing_setup):
+    client = listing_setup["client"]
+    ids = listing_setup["ids"]
+
+    resp = client.get("/app/items", params={"item_type": "part", "location": "B2"})
+    assert [r["id"] for r in resp.json()] == [ids["nuts"]]
+
+    resp = client.get("/app/items", params={"vendor_id": ids["acme"]})
+    assert [r["id"] for r in resp.json()] == [ids["bolts"]]
+
+    resp = client.get("/app/items", params={"low_stock": 1})
+    assert [r["id"] for r in resp.json()] == [ids["nuts"], ids["glue"]]
+
+    resp = client.get("/app/items", params={"sort": "on_hand", "order": "desc", "limit": 2})
+    assert dict(resp.headers)["x-total-count"] == "3"
+    assert [r["id"] for r in resp.json()] == [ids["bolts"], ids["nuts"]]
+
+    resp = client.get("/app/items", params={"sort": "name", "limit": 2, "offset": 2})
+    assert [r["name"] for r in resp.json()] == ["Nuts"]
+
+    resp = client.get("/app/items", params={"sort": "bogus"})
+    assert resp.status_code == 400
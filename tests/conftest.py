@@ -6,7 +6,59 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import pytest
+
 # Ensure local stub packages (e.g., httpx) are importable during tests
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture()
+def ledger_app(tmp_path, monkeypatch):
+    """Fresh app + database with writes and dev routes enabled."""
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("BUS_DB", str(tmp_path / "app.db"))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "appdata"))
+    monkeypatch.setenv("BUS_DEV", "1")
+
+    for module_name in list(sys.modules):
+        if module_name.startswith(("core.api", "core.appdb", "core.ledger", "core.manufacturing")):
+            sys.modules.pop(module_name, None)
+
+    import core.appdb.engine as engine_module
+    import core.appdb.models as models_module
+    import core.api.http as api_http
+
+    from core.config.writes import set_writes_enabled
+    from tgc.settings import Settings
+    from tgc.state import init_state
+
+    api_http.app.state.app_state = init_state(Settings())
+    engine = engine_module.get_engine()
+    models_module.Base.metadata.create_all(bind=engine)
+    set_writes_enabled(True)
+
+    client = TestClient(api_http.APP)
+    session_token = api_http._load_or_create_token()
+    api_http.app.state.app_state.tokens._rec.token = session_token
+    client.headers.update({"Cookie": f"bus_session={session_token}"})
+
+    def session():
+        return engine_module.SessionLocal(bind=engine)
+
+    def make_item(name: str, uom: str = "ea") -> int:
+        with session() as db:
+            item = models_module.Item(name=name, uom=uom, qty_stored=0)
+            db.add(item)
+            db.commit()
+            return item.id
+
+    yield {
+        "client": client,
+        "engine": engine,
+        "models": models_module,
+        "session": session,
+        "make_item": make_item,
+    }
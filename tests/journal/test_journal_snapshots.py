@@ -0,0 +1,72 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+from core.runtime.journal import JournalManager
+
+
+def _prepare(journal, key):
+    return journal.prepare(
+        run_id="run",
+        actor="tester",
+        intent="inventory.adjust",
+        idempotency_key=key,
+        inputs_hash="in",
+        proposal_hash="prop",
+        policy_version="v1",
+    )
+
+
+def test_recovery_replays_only_what_follows_the_snapshot(tmp_path):
+    journal = JournalManager(tmp_path, fsync="off", snapshot_every=10)
+    for n in range(25):
+        journal.commit(_prepare(journal, f"k{n}")["journal_id"])
+    journal.close()
+
+    reopened = JournalManager(tmp_path, fsync="off", snapshot_every=10)
+    assert reopened.as_dict()["recovery"]["replayed"] == 0
+    assert reopened.status_for_idempotency("k0") == "committed"
+    # Left open, as if the process died: one settled, one still pending.
+    reopened.commit(_prepare(reopened, "late")["journal_id"])
+    _prepare(reopened, "crashed")
+
+    booted = JournalManager(tmp_path, fsync="off", snapshot_every=10)
+    recovery = booted.as_dict()["recovery"]
+    assert recovery["snapshot"] is not None and recovery["replayed"] == 3
+    assert booted.status_for_idempotency("k24") == "committed"
+    assert booted.status_for_idempotency("late") == "committed"
+    assert booted.status_for_idempotency("crashed") == "rolled_back"
+    # Hash heads came from the snapshot, so the chains stay unbroken.
+    booted.commit(_prepare(booted, "after")["journal_id"])
+    assert booted.verify_chain() == []
+    booted.close()
+
+
+def test_unusable_snapshot_falls_back_to_an_older_one(tmp_path):
+    journal = JournalManager(tmp_path, fsync="off", snapshot_every=4)
+    _prepare(journal, "open")
+    for n in range(6):
+        journal.commit(_prepare(journal, f"k{n}")["journal_id"])
+    journal.close()
+    snapshots = sorted((tmp_path / "snapshots").glob("*.json"))
+    assert len(snapshots) == 2
+    snapshots[-1].write_text("{not json", encoding="utf-8")
+
+    reopened = JournalManager(tmp_path, fsync="off", snapshot_every=4)
+    recovery = reopened.as_dict()["recovery"]
+    assert recovery["snapshot"] == int(snapshots[0].stem) and recovery["replayed"] > 0
+    assert reopened.status_for_idempotency("k5") == "committed"
+    # Still open at the older snapshot; closed out by recovery.
+    assert reopened.status_for_idempotency("open") == "rolled_back"
+    reopened.close()
+
+
+def test_app_shutdown_closes_the_journal(ledger_app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import core.api.http as api_http
+
+    with TestClient(api_http.APP):
+        core = api_http.CORE
+        closed = []
+        monkeypatch.setattr(core.journal, "close", lambda: closed.append(True))
+    assert closed == [True]
@@ -0,0 +1,72 @@
+# Copyright (C) 2025 BUS Core Authors
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+
+from core.runtime.journal import JournalManager
+
+
+def _prepare(journal, n):
+    return journal.prepare(
+        run_id="run",
+        actor="tester",
+        intent="inventory.adjust",
+        idempotency_key=f"key-{n}",
+        inputs_hash="in",
+        proposal_hash="prop",
+        policy_version="v1",
+    )
+
+
+def test_segments_rotate_and_chain_carries_across_them(tmp_path):
+    journal = JournalManager(tmp_path, segment_bytes=1024, fsync="off")
+    for n in range(40):
+        entry = _prepare(journal, n)
+        journal.commit(entry["journal_id"], result="commit" if n % 2 == 0 else "rollback")
+    stats = journal.as_dict()
+    assert stats["journal_log"]["segments"] > 3 and stats["audit_log"]["segments"] > 3
+    assert all(p.stat().st_size <= 1024 for p in (tmp_path / "journal").glob("*.log"))
+    assert journal.verify_chain() == []
+    journal.close()
+
+    reopened = JournalManager(tmp_path, segment_bytes=1024, fsync="off")
+    assert reopened.status_for_idempotency("key-0") == "committed"
+    assert reopened.status_for_idempotency("key-1") == "rolled_back"
+    # The chain continues from the last record of the newest segment.
+    _prepare(reopened, 99)
+    assert reopened.verify_chain() == []
+    reopened.close()
+
+
+def test_torn_tail_is_cut_back_on_open(tmp_path):
+    journal = JournalManager(tmp_path, fsync="always")
+    first = _prepare(journal, 1)
+    journal.commit(first["journal_id"])
+    _prepare(journal, 2)
+    journal.close()
+
+    segment = sorted((tmp_path / "journal").glob("*.log"))[-1]
+    intact = segment.read_bytes()
+    with segment.open("ab") as fh:
+        fh.write(b'{"journal_id":"torn","run_')
+
+    reopened = JournalManager(tmp_path)
+    assert reopened.as_dict()["journal_log"]["repaired_bytes"] > 0
+    assert segment.read_bytes() == intact
+    # The pending prepare was rolled back by recovery; the log is still one chain.
+    assert reopened.status_for_idempotency("key-2") == "rolled_back"
+    _prepare(reopened, 3)
+    assert reopened.verify_chain() == []
+    reopened.close()
+
+
+def test_single_file_logs_become_the_first_segment(tmp_path):
+    entry = {"journal_id": "j1", "idempotency_key": "old", "prev_hash": ""}
+    (tmp_path / "journal.log").write_text(json.dumps(entry) + "\n", encoding="utf-8")
+
+    journal = JournalManager(tmp_path)
+    assert not (tmp_path / "journal.log").exists()
+    assert (tmp_path / "journal" / "00000001.log").exists()
+    # No audit record for it: recovered as rolled back.
+    assert journal.status_for_idempotency("old") == "rolled_back"
+    journal.close()
@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+
+def _buy(client, item_id, qty, cents):
+    resp = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": qty, "unit_cost_cents": cents})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["batch_id"]
+
+
+def _age_batches(ledger_app, days):
+    models = ledger_app["models"]
+    with ledger_app["session"]() as db:
+        db.execute(update(models.ItemBatch).values(created_at=datetime.utcnow() - timedelta(days=days)))
+        db.commit()
+
+
+def test_archive_moves_old_depleted_layers_and_keeps_them_resolvable(ledger_app):
+    from core.appdb.batch_archive import resolve_batches
+
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    item_id = ledger_app["make_item"]("Widget")
+    b1 = _buy(client, item_id, 2, 10)
+    b2 = _buy(client, item_id, 3, 20)
+    b3 = _buy(client, item_id, 4, 30)
+    assert client.post("/app/ledger/consume", json={"item_id": item_id, "qty": 6}).status_code == 200
+    _age_batches(ledger_app, 400)
+
+    resp = client.post("/app/ledger/batches/archive", json={"min_age_days": 30})
+    assert resp.json() == {"ok": True, "archived": 2, "min_age_days": 30}
+
+    with ledger_app["session"]() as db:
+        live = db.execute(select(models.ItemBatch.id)).scalars().all()
+        assert live == [b3]
+        batch_ids = db.execute(select(models.ItemMovement.batch_id)).scalars().all()
+        resolved = resolve_batches(db, batch_ids)
+        assert set(resolved) == {b1, b2, b3}
+        assert resolved[b1].qty_initial == 2 and resolved[b1].qty_remaining == 0
+
+    movements = client.get("/app/ledger/movements", params={"item_id": item_id}).json()["movements"]
+    archived = {m["batch_id"] for m in movements if m["batch_archived"]}
+    assert archived == {b1, b2}
+
+    detail = client.get(f"/app/items/{item_id}").json()
+    assert len(detail["batches_summary"]) == 1
+    assert "archived_batches_summary" not in detail
+    assert detail["stock_on_hand_int"] == 3
+
+    detail = client.get(f"/app/items/{item_id}", params={"archived_limit": 1, "archived_offset": 1}).json()
+    assert detail["archived_batches_total"] == 2
+    assert [r["original_int"] for r in detail["archived_batches_summary"]] == [3]
+
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def test_archive_respects_age_and_archived_ids_are_never_reused(ledger_app):
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    item_id = ledger_app["make_item"]("Widget")
+    _buy(client, item_id, 1, 10)
+    newest = _buy(client, item_id, 1, 10)
+    assert client.post("/app/ledger/consume", json={"item_id": item_id, "qty": 2}).status_code == 200
+
+    _age_batches(ledger_app, 10)
+    assert client.post("/app/ledger/batches/archive", json={"min_age_days": 30}).json()["archived"] == 0
+
+    _age_batches(ledger_app, 40)
+    assert client.post("/app/ledger/batches/archive", json={"min_age_days": 30}).json()["archived"] == 2
+    with ledger_app["session"]() as db:
+        assert db.execute(select(models.ItemBatch.id)).scalars().all() == []
+
+    # The next layer must not reuse an id that now lives in the archive.
+    assert _buy(client, item_id, 1, 10) > newest
+
+
+def test_migration_rebuilds_plain_rowid_batches_with_autoincrement(ledger_app, tmp_path):
+    import sqlite3
+
+    from core.appdb import engine as engine_mod
+    from core.appdb import migrate
+
+    path = tmp_path / "rowid.db"
+    engine = engine_mod.create_app_engine(f"sqlite:///{path}")
+    migrate.run_migrations(engine, [m for m in migrate.MIGRATIONS if m.version < 8])
+    with sqlite3.connect(path) as con:
+        # item_batches as it was before migration 8: a plain rowid table.
+        con.execute("DROP TABLE item_batches")
+        con.execute(
+            "CREATE TABLE item_batches (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, qty_initial INTEGER NOT NULL,"
+            " qty_remaining INTEGER NOT NULL, unit_cost_cents INTEGER NOT NULL, source_kind TEXT NOT NULL,"
+            " source_id TEXT, is_oversold BOOLEAN DEFAULT 0, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+        con.execute("CREATE INDEX ix_item_batches_item ON item_batches(item_id, created_at)")
+        con.execute("INSERT INTO items (id, name, uom, dimension, qty_stored) VALUES (1, 'Widget', 'ea', 'count', 0)")
+        con.execute(
+            "INSERT INTO item_batches (id, item_id, qty_initial, qty_remaining, unit_cost_cents, source_kind)"
+            " VALUES (3, 1, 1, 1, 10, 'purchase')"
+        )
+        # Layer 7 was deleted; only its movement still names it.
+        con.execute(
+            "INSERT INTO item_movements (item_id, batch_id, qty_change, unit_cost_cents, source_kind, is_oversold)"
+            " VALUES (1, 7, 1, 10, 'purchase', 0)"
+        )
+    con.close()
+
+    migrate.run_migrations(engine)
+    with sqlite3.connect(path) as con:
+        assert "AUTOINCREMENT" in con.execute("SELECT sql FROM sqlite_master WHERE name='item_batches'").fetchone()[0]
+        indexes = {r[1] for r in con.execute("PRAGMA index_list(item_batches)")}
+        assert {"ix_item_batches_item", "ix_item_batches_open_fifo"} <= indexes
+        assert con.execute("SELECT id, qty_remaining FROM item_batches").fetchall() == [(3, 1)]
+        con.execute(
+            "INSERT INTO item_batches (item_id, qty_initial, qty_remaining, unit_cost_cents, source_kind, is_oversold)"
+            " VALUES (1, 1, 1, 10, 'purchase', 0)"
+        )
+        assert con.execute("SELECT max(id) FROM item_batches").fetchone()[0] == 8
+    con.close()
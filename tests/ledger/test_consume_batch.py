@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+from sqlalchemy import func, select
+
+
+def _buy(client, item_id, qty, cents):
+    resp = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": qty, "unit_cost_cents": cents})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["batch_id"]
+
+
+def test_consume_batch_allocates_fifo_across_items(ledger_app):
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    a = ledger_app["make_item"]("A")
+    b = ledger_app["make_item"]("B")
+    a1 = _buy(client, a, 3, 10)
+    a2 = _buy(client, a, 5, 20)
+    b1 = _buy(client, b, 4, 7)
+
+    resp = client.post(
+        "/app/ledger/consume/batch",
+        json={"lines": [{"item_id": a, "qty": 2}, {"item_id": b, "qty": 4}, {"item_id": a, "qty": 2}]},
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["lines"] == [
+        {"item_id": a, "batch_id": a1, "qty": 3, "unit_cost_cents": 10},
+        {"item_id": a, "batch_id": a2, "qty": 1, "unit_cost_cents": 20},
+        {"item_id": b, "batch_id": b1, "qty": 4, "unit_cost_cents": 7},
+    ]
+
+    with ledger_app["session"]() as db:
+        assert db.get(models.Item, a).qty_stored == 4
+        assert db.get(models.Item, b).qty_stored == 0
+        assert db.get(models.ItemStockSummary, a).total_value_cents == 80
+        assert db.get(models.ItemStockSummary, b).open_layer_count == 0
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def test_consume_batch_is_atomic_and_reports_every_shortage(ledger_app):
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    a = ledger_app["make_item"]("A")
+    b = ledger_app["make_item"]("B")
+    c = ledger_app["make_item"]("C")
+    _buy(client, a, 5, 10)
+    _buy(client, b, 1, 10)
+
+    with ledger_app["session"]() as db:
+        moves_before = db.execute(select(func.count(models.ItemMovement.id))).scalar_one()
+
+    resp = client.post(
+        "/app/ledger/consume/batch",
+        json={"lines": [{"item_id": a, "qty": 2}, {"item_id": b, "qty": 3}, {"item_id": c, "qty": 1}]},
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"]["shortages"] == [
+        {"item_id": b, "required": 3, "on_hand": 1, "missing": 2},
+        {"item_id": c, "required": 1, "on_hand": 0, "missing": 1},
+    ]
+
+    with ledger_app["session"]() as db:
+        assert db.execute(select(func.count(models.ItemMovement.id))).scalar_one() == moves_before
+        assert db.get(models.ItemStockSummary, a).on_hand == 5
+
+
+def test_consume_many_writes_movements_with_one_executemany(ledger_app):
+    from sqlalchemy import event
+
+    from core.appdb.ledger import fifo_consume_many
+
+    client = ledger_app["client"]
+    a = ledger_app["make_item"]("A")
+    b = ledger_app["make_item"]("B")
+    _buy(client, a, 1, 10)
+    _buy(client, a, 1, 20)
+    _buy(client, b, 2, 7)
+
+    inserts = []
+
+    def record(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO ITEM_MOVEMENTS"):
+            inserts.append((executemany, len(params) if executemany else 1))
+
+    engine = ledger_app["engine"]
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with ledger_app["session"]() as db:
+            moves = fifo_consume_many(db, [(b, 2), (a, 2)], "sold", None)
+            db.commit()
+            assert [(m.item_id, m.qty_change, m.unit_cost_cents) for m in moves] == [
+                (b, -2, 7),
+                (a, -1, 10),
+                (a, -1, 20),
+            ]
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert inserts == [(True, 3)]
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
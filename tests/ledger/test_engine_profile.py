@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def test_tuned_profile_pools_and_applies_pragmas(ledger_app, tmp_path):
+    from core.appdb import engine as engine_mod
+
+    engine = engine_mod.create_app_engine(f"sqlite:///{tmp_path / 'p.db'}", engine_mod.PROFILES["tuned"])
+    assert isinstance(engine.pool, QueuePool)
+    with engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()  # noqa: E731
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1
+        assert pragma("cache_size") == -16384
+        assert pragma("temp_store") == 2
+    engine.dispose()
+
+    # The default keeps synchronous=FULL.
+    assert engine_mod.engine_profile().name == "durable"
+    with engine_mod.get_engine().connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 2
+
+    legacy = engine_mod.create_app_engine(f"sqlite:///{tmp_path / 'l.db'}", engine_mod.PROFILES["legacy"])
+    assert isinstance(legacy.pool, NullPool)
+    with legacy.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+
+
+def test_dispose_engine_closes_connections_still_checked_out(ledger_app):
+    from core.appdb import engine as engine_mod
+
+    engine = engine_mod.get_engine()
+    db = Session(bind=engine)
+    db.connection()
+    raw = db.connection().connection.dbapi_connection
+    engine_mod.dispose_engine()
+    db.close()
+    # The handle is closed rather than parked in the disposed pool.
+    try:
+        raw.execute("SELECT 1")
+    except Exception as exc:
+        assert "closed" in str(exc).lower()
+    else:  # pragma: no cover
+        raise AssertionError("connection left open after dispose_engine()")
+
+
+def test_failed_pragma_is_logged(ledger_app, tmp_path, caplog):
+    from dataclasses import replace
+
+    from core.appdb import engine as engine_mod
+
+    profile = replace(engine_mod.PROFILES["tuned"], journal_mode="NOT_A_MODE)")
+    engine = engine_mod.create_app_engine(f"sqlite:///{tmp_path / 'bad.db'}", profile)
+    with caplog.at_level("WARNING", logger="core.appdb.engine"):
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT 1").scalar() == 1
+    engine.dispose()
+    assert any("PRAGMA journal_mode=NOT_A_MODE)" in r.getMessage() for r in caplog.records)
@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import func, select
+
+
+@pytest.fixture()
+def sim_setup(ledger_app):
+    client = ledger_app["client"]
+    item_id = ledger_app["make_item"]("Widget")
+    batches = []
+    for qty, cost in ((5, 10), (5, 20), (5, 30)):
+        resp = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": qty, "unit_cost_cents": cost})
+        assert resp.status_code == 200, resp.text
+        batches.append(resp.json()["batch_id"])
+    return dict(ledger_app, item_id=item_id, batches=batches)
+
+
+def _ledger_state(setup):
+    models = setup["models"]
+    with setup["session"]() as db:
+        remaining = db.execute(
+            select(models.ItemBatch.id, models.ItemBatch.qty_remaining).order_by(models.ItemBatch.id)
+        ).all()
+        moves = db.execute(select(func.count()).select_from(models.ItemMovement)).scalar_one()
+    return remaining, moves
+
+
+def test_simulate_matches_real_consumption_without_writing(sim_setup):
+    client = sim_setup["client"]
+    item_id = sim_setup["item_id"]
+    first, second, _ = sim_setup["batches"]
+    before = _ledger_state(sim_setup)
+
+    resp = client.post("/app/ledger/simulate", json={"scenarios": [{"lines": [{"item_id": item_id, "qty": 7}]}]})
+    assert resp.status_code == 200, resp.text
+    scenario = resp.json()["scenarios"][0]
+    assert scenario["ok"] is True
+    assert scenario["cogs_cents"] == 5 * 10 + 2 * 20
+    assert scenario["lines"] == [
+        {"item_id": item_id, "batch_id": first, "qty": 5, "unit_cost_cents": 10},
+        {"item_id": item_id, "batch_id": second, "qty": 2, "unit_cost_cents": 20},
+    ]
+    assert scenario["items"][0]["on_hand_before"] == 15
+    assert scenario["items"][0]["on_hand_after"] == 8
+    assert _ledger_state(sim_setup) == before
+
+    real = client.post("/app/ledger/consume", json={"item_id": item_id, "qty": 7})
+    assert real.status_code == 200, real.text
+    assert real.json()["lines"] == [
+        {k: v for k, v in line.items() if k != "item_id"} for line in scenario["lines"]
+    ]
+
+
+def test_simulate_independent_and_cumulative_scenarios(sim_setup):
+    client = sim_setup["client"]
+    item_id = sim_setup["item_id"]
+    payload = {"scenarios": [{"lines": [{"item_id": item_id, "qty": 6}]}] * 3}
+
+    independent = client.post("/app/ledger/simulate", json=payload).json()
+    assert independent["ok"] is True
+    assert [s["cogs_cents"] for s in independent["scenarios"]] == [70, 70, 70]
+
+    cumulative = client.post("/app/ledger/simulate", json=dict(payload, cumulative=True)).json()
+    assert cumulative["ok"] is False
+    first, second, third = cumulative["scenarios"]
+    assert first["cogs_cents"] == 5 * 10 + 1 * 20
+    assert second["cogs_cents"] == 4 * 20 + 2 * 30
+    assert third["ok"] is False
+    assert third["lines"] == []
+    assert third["shortages"] == [{"item_id": item_id, "required": 6, "on_hand": 3, "missing": 3}]
+
+
+def test_manufacturing_preview_matches_run(sim_setup):
+    client = sim_setup["client"]
+    item_id = sim_setup["item_id"]
+    output_id = sim_setup["make_item"]("Gadget")
+    payload = {"output_item_id": output_id, "output_qty": 4, "components": [{"item_id": item_id, "qty_required": 8}]}
+    before = _ledger_state(sim_setup)
+
+    preview = client.post("/app/manufacturing/preview", json=payload)
+    assert preview.status_code == 200, preview.text
+    body = preview.json()
+    assert body["ok"] is True
+    assert body["cost_inputs_cents"] == 5 * 10 + 3 * 20
+    assert body["per_output_cents"] == 28
+    assert [a["qty"] for a in body["allocations"]] == [5, 3]
+    assert _ledger_state(sim_setup) == before
+
+    run = client.post("/app/manufacturing/run", json=payload)
+    assert run.status_code == 200, run.text
+    assert run.json()["output_unit_cost_cents"] == body["per_output_cents"]
+
+    short = client.post(
+        "/app/manufacturing/preview",
+        json=dict(payload, components=[{"item_id": item_id, "qty_required": 50}]),
+    ).json()
+    assert short["ok"] is False
+    assert short["allocations"] == []
+    assert short["shortages"] == [{"component": item_id, "required": 50.0, "available": 7.0}]
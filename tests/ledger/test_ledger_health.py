@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def health_setup(ledger_app):
+    client = ledger_app["client"]
+    ids = [ledger_app["make_item"](name) for name in ("A", "B")]
+    for item_id in ids:
+        resp = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": 5, "unit_cost_cents": 10})
+        assert resp.status_code == 200, resp.text
+    return dict(ledger_app, ids=ids)
+
+
+def _set_qty_stored(setup, item_id, qty):
+    with setup["session"]() as db:
+        db.get(setup["models"].Item, item_id).qty_stored = qty
+        db.commit()
+
+
+def _after_audit(client):
+    """The health report once the background full audit has finished."""
+    import time
+
+    from core.ledger.health import audit_status
+
+    deadline = time.monotonic() + 10
+    while audit_status()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return client.get("/app/ledger/health").json()
+
+
+def test_first_call_audits_then_only_touched_items_are_rechecked(health_setup):
+    client = health_setup["client"]
+    a, b = health_setup["ids"]
+
+    # The first call seeds the mark and leaves the audit to a worker thread.
+    pending = client.get("/app/ledger/health").json()
+    assert pending["last_full_audit_at"] is None
+    assert pending["audit"]["started_at"] is not None
+
+    first = _after_audit(client)
+    assert first["desync"] is False
+    assert first["last_full_audit_at"] is not None
+    assert first["items_checked"] == 2
+
+    # No movement: the drift is invisible to the incremental pass.
+    _set_qty_stored(health_setup, a, 99)
+    idle = client.get("/app/ledger/health").json()
+    assert idle["desync"] is False
+    assert idle["checked_through_movement_id"] == first["checked_through_movement_id"]
+
+    # A movement on B re-checks B only.
+    client.post("/app/ledger/consume", json={"item_id": b, "qty": 1})
+    after = client.get("/app/ledger/health").json()
+    assert after["items_checked"] == 1
+    assert after["checked_through_movement_id"] > first["checked_through_movement_id"]
+    assert after["desync"] is False
+
+    # A movement on A exposes its drift, and a later fix clears it.
+    client.post("/app/ledger/consume", json={"item_id": a, "qty": 1})
+    drift = client.get("/app/ledger/health").json()
+    assert drift["desync"] is True
+    assert drift["problems"] == [{"item_id": a, "name": "A", "items_qty": 98, "batch_sum": 4}]
+
+    _set_qty_stored(health_setup, a, 4)
+    client.post("/app/ledger/purchase", json={"item_id": a, "qty": 1, "unit_cost_cents": 10})
+    assert client.get("/app/ledger/health").json()["desync"] is False
+
+
+def test_full_audit_runs_in_worker_thread(health_setup, monkeypatch):
+    client = health_setup["client"]
+    a, _ = health_setup["ids"]
+    _after_audit(client)
+    _set_qty_stored(health_setup, a, 7)
+
+    import core.ledger.health as health
+
+    started = []
+    real_start = health.start_full_audit
+
+    def _capture(factory):
+        worker = real_start(factory)
+        started.append(worker)
+        return worker
+
+    monkeypatch.setattr("core.api.routes.ledger_api.start_full_audit", _capture)
+    resp = client.get("/app/ledger/health", params={"full": "true"})
+    assert resp.status_code == 200, resp.text
+    assert started and started[0] is not None
+    started[0].join(timeout=10)
+
+    report = client.get("/app/ledger/health").json()
+    assert report["audit"]["running"] is False
+    assert report["audit"]["items_checked"] == 2
+    assert report["problems"] == [{"item_id": a, "name": "A", "items_qty": 7, "batch_sum": 5}]
+
+
+def test_busy_writer_serves_the_stored_report_without_queueing(health_setup):
+    import time
+
+    from core.appdb import engine as engine_mod
+
+    client = health_setup["client"]
+    a, _b = health_setup["ids"]
+    _after_audit(client)
+    client.post("/app/ledger/consume", json={"item_id": a, "qty": 1})
+
+    owner = object()
+    assert engine_mod.WRITE_GATE.acquire(owner)
+    try:
+        start = time.perf_counter()
+        busy = client.get("/app/ledger/health")
+        assert time.perf_counter() - start < engine_mod.WRITE_GATE.timeout / 2
+    finally:
+        engine_mod.WRITE_GATE.release(owner)
+    assert busy.status_code == 200
+    assert engine_mod.WRITE_GATE.stats()["waiting"] == 0
+
+    # The writer left: the next call catches up on A's consume.
+    after = client.get("/app/ledger/health").json()
+    assert after["checked_through_movement_id"] > busy.json()["checked_through_movement_id"]
@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, func, select
+
+
+@pytest.fixture()
+def bom_setup(ledger_app):
+    client = ledger_app["client"]
+    components = [ledger_app["make_item"](f"C{i}") for i in range(40)]
+    for item_id in components:
+        for cost in (10, 20):
+            resp = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": 3, "unit_cost_cents": cost})
+            assert resp.status_code == 200, resp.text
+    return dict(ledger_app, components=components, output_id=ledger_app["make_item"]("Out"))
+
+
+@contextmanager
+def _count_statements(engine):
+    seen = []
+
+    def _before(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", _before)
+
+
+def test_forty_component_run_uses_a_handful_of_queries(bom_setup):
+    client = bom_setup["client"]
+    payload = {
+        "output_item_id": bom_setup["output_id"],
+        "output_qty": 1,
+        "components": [{"item_id": i, "qty_required": 4} for i in bom_setup["components"]],
+    }
+    with _count_statements(bom_setup["engine"]) as seen:
+        resp = client.post("/app/manufacturing/run", json=payload)
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["output_unit_cost_cents"] == 40 * (3 * 10 + 1 * 20)
+    # Validation, allocation and summary upkeep no longer scale with the BOM.
+    assert len(seen) < 25, "\n".join(seen)
+
+    models = bom_setup["models"]
+    with bom_setup["session"]() as db:
+        on_hand = dict(
+            db.execute(
+                select(models.ItemBatch.item_id, func.sum(models.ItemBatch.qty_remaining)).group_by(
+                    models.ItemBatch.item_id
+                )
+            ).all()
+        )
+        qty_stored = dict(db.execute(select(models.Item.id, models.Item.qty_stored)).all())
+    for item_id in bom_setup["components"]:
+        assert on_hand[item_id] == 2 == qty_stored[item_id]
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def test_repeated_and_optional_components_share_the_loaded_layers(bom_setup):
+    client = bom_setup["client"]
+    first, second = bom_setup["components"][:2]
+    payload = {
+        "output_item_id": bom_setup["output_id"],
+        "output_qty": 1,
+        "components": [
+            {"item_id": first, "qty_required": 4},
+            {"item_id": first, "qty_required": 2},
+            {"item_id": first, "qty_required": 1, "is_optional": True},
+            {"item_id": second, "qty_required": 1, "is_optional": True},
+        ],
+    }
+    resp = client.post("/app/manufacturing/run", json=payload)
+    assert resp.status_code == 200, resp.text
+    # first: 3*10 + 3*20, optional third line skipped (nothing left); second: 1*10
+    assert resp.json()["output_unit_cost_cents"] == 90 + 10
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
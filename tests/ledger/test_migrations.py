@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+
+def _engine(tmp_path, name="m.db"):
+    from core.appdb import engine as engine_mod
+
+    return engine_mod.create_app_engine(f"sqlite:///{tmp_path / name}")
+
+
+def test_runner_applies_every_step_then_costs_two_reads(ledger_app, tmp_path):
+    from core.appdb import migrate
+
+    engine = _engine(tmp_path)
+    report = migrate.run_migrations(engine)
+    assert (report.from_version, report.to_version) == (0, migrate.SCHEMA_VERSION)
+    assert [s["version"] for s in report.steps] == [m.version for m in migrate.MIGRATIONS]
+    assert all(s["ms"] >= 0 for s in report.steps)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda c, cur, stmt, *a: statements.append(stmt))
+    again = migrate.run_migrations(engine)
+    assert again.steps == [] and again.to_version == migrate.SCHEMA_VERSION
+    assert statements == ["PRAGMA user_version", "SELECT name FROM sqlite_master WHERE type='table'"]
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == migrate.SCHEMA_VERSION
+
+
+def test_missing_table_is_recreated_at_current_version(ledger_app, tmp_path):
+    from core.appdb import migrate
+
+    engine = _engine(tmp_path)
+    migrate.run_migrations(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE manufacturing_jobs")
+
+    report = migrate.run_migrations(engine)
+    assert report.steps == [] and report.created_tables == ["manufacturing_jobs"]
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM manufacturing_jobs").scalar() == 0
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == migrate.SCHEMA_VERSION
+
+
+def test_failed_step_rolls_back_the_whole_batch(ledger_app, tmp_path):
+    from core.appdb import migrate
+
+    engine = _engine(tmp_path)
+
+    def boom(conn):
+        raise RuntimeError("boom")
+
+    steps = (
+        migrate.Migration(1, "t1", lambda conn: conn.exec_driver_sql("CREATE TABLE t1 (id INTEGER)")),
+        migrate.Migration(2, "boom", boom),
+    )
+    with pytest.raises(RuntimeError):
+        migrate.run_migrations(engine, steps)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == 0
+        assert conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE name='t1'").first() is None
+
+
+def test_legacy_database_is_brought_up_to_date(ledger_app, tmp_path):
+    from core.appdb import migrate
+
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as con:
+        con.execute("CREATE TABLE vendors (id INTEGER PRIMARY KEY, name TEXT)")
+        con.execute("CREATE UNIQUE INDEX ux_vendors_name ON vendors(name)")
+        con.execute("INSERT INTO vendors (name) VALUES ('Acme')")
+        con.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL, uom TEXT, qty_stored INTEGER)")
+    con.close()
+
+    report = migrate.run_migrations(_engine(tmp_path, "legacy.db"))
+    assert report.to_version == migrate.SCHEMA_VERSION
+    with sqlite3.connect(path) as con:
+        vendor_cols = {r[1] for r in con.execute("PRAGMA table_info(vendors)")}
+        assert {"role", "kind", "is_vendor", "is_org", "meta", "organization_id"} <= vendor_cols
+        assert "item_type" in {r[1] for r in con.execute("PRAGMA table_info(items)")}
+        indexes = {r[1]: r[2] for r in con.execute("PRAGMA index_list(vendors)")}
+        assert "ux_vendors_name" not in indexes and indexes["ix_vendors_name"] == 0
+        assert con.execute("SELECT role, kind FROM vendors").fetchone() == ("contact", "org")
+    con.close()
+
+
+def test_pre_model_tables_get_the_columns_and_indexes_ensure_schema_added(ledger_app, tmp_path):
+    from core.appdb import migrate
+
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as con:
+        con.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL, qty REAL, unit TEXT)")
+        con.executemany(
+            "INSERT INTO items (name, qty, unit) VALUES (?, ?, ?)", [("Bolt", 3.0, None), ("Wire", 1.25, "mm")]
+        )
+        con.execute(
+            "CREATE TABLE item_batches (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, "
+            "qty_initial INTEGER NOT NULL, qty_remaining INTEGER NOT NULL, unit_cost_cents INTEGER NOT NULL, "
+            "source_kind TEXT NOT NULL, source_id TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+        con.execute(
+            "INSERT INTO item_batches (item_id, qty_initial, qty_remaining, unit_cost_cents, source_kind) "
+            "VALUES (1, 3, 3, 10, 'purchase')"
+        )
+        con.execute(
+            "CREATE TABLE item_movements (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, batch_id INTEGER, "
+            "qty_change INTEGER NOT NULL, unit_cost_cents INTEGER DEFAULT 0, source_kind TEXT NOT NULL, "
+            "source_id TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+        con.execute("CREATE TABLE recipes (id INTEGER PRIMARY KEY, name TEXT NOT NULL, notes TEXT)")
+        con.execute("INSERT INTO recipes (name) VALUES ('Kit')")
+        con.execute(
+            "CREATE TABLE recipe_items (id INTEGER PRIMARY KEY, recipe_id INTEGER NOT NULL, item_id INTEGER NOT NULL)"
+        )
+    con.close()
+
+    engine = _engine(tmp_path, "old.db")
+    migrate.run_migrations(engine)
+    with sqlite3.connect(path) as con:
+        cols = lambda table: {r[1] for r in con.execute(f"PRAGMA table_info({table})")}  # noqa: E731
+        assert {"uom", "qty_stored", "dimension", "is_product"} <= cols("items")
+        assert "is_oversold" in cols("item_batches") and "is_oversold" in cols("item_movements")
+        assert {"code", "output_item_id", "output_qty", "archived", "created_at", "updated_at"} <= cols("recipes")
+        assert {"qty_required", "is_optional", "sort_order", "created_at", "updated_at"} <= cols("recipe_items")
+        assert con.execute("SELECT uom, qty_stored FROM items ORDER BY id").fetchall() == [("ea", 3), ("mm", 125)]
+        assert con.execute("SELECT is_oversold FROM item_batches").fetchall() == [(0,)]
+        assert con.execute("SELECT created_at IS NOT NULL FROM recipes").fetchone() == (1,)
+        indexes = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        assert {"idx_item_batches_item_created", "idx_item_batches_item_qtyrem", "idx_recipes_code"} <= indexes
+    con.close()
+
+    # Nothing left to do on a second start.
+    assert migrate.run_migrations(engine).steps == []
@@ -0,0 +1,77 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import csv
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture()
+def export_setup(ledger_app):
+    client = ledger_app["client"]
+    a = ledger_app["make_item"]("A")
+    b = ledger_app["make_item"]("B")
+    for i in range(5):
+        client.post("/app/ledger/purchase", json={"item_id": a, "qty": 2, "unit_cost_cents": 10 + i})
+        client.post("/app/ledger/purchase", json={"item_id": b, "qty": 1, "unit_cost_cents": 5})
+    client.post("/app/ledger/consume", json={"item_id": a, "qty": 3, "source_kind": "sale"})
+    return dict(ledger_app, a=a, b=b)
+
+
+def _ndjson(resp):
+    assert resp.status_code == 200, resp.text
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+def test_export_filters_and_keyset_pages_both_directions(export_setup):
+    client = export_setup["client"]
+    a = export_setup["a"]
+
+    rows = _ndjson(client.get("/app/ledger/movements/export", params={"item_id": a}))
+    assert [r["qty_change"] for r in rows] == [2, 2, 2, 2, 2, -2, -1]
+    assert rows == sorted(rows, key=lambda r: r["id"])
+
+    sales = _ndjson(client.get("/app/ledger/movements/export", params={"source_kind": "sale"}))
+    assert {r["source_kind"] for r in sales} == {"sale"} and len(sales) == 2
+
+    first = client.get("/app/ledger/movements/export", params={"item_id": a, "limit": 3})
+    page = _ndjson(first)
+    assert [r["id"] for r in page] == [r["id"] for r in rows[:3]]
+    cursor = dict(first.headers)["x-next-cursor"]
+    assert int(cursor) == rows[2]["id"]
+
+    second = _ndjson(
+        client.get("/app/ledger/movements/export", params={"item_id": a, "limit": 10, "cursor": cursor})
+    )
+    assert [r["id"] for r in second] == [r["id"] for r in rows[3:]]
+
+    back = client.get(
+        "/app/ledger/movements/export",
+        params={"item_id": a, "order": "desc", "cursor": rows[3]["id"], "limit": 3},
+    )
+    assert [r["id"] for r in _ndjson(back)] == [r["id"] for r in reversed(rows[:3])]
+    assert "x-next-cursor" not in dict(back.headers)
+
+    future = _ndjson(client.get("/app/ledger/movements/export", params={"since": "2999-01-01"}))
+    assert future == []
+    bad = client.get("/app/ledger/movements/export", params={"until": "not-a-date"})
+    assert bad.status_code == 400
+
+
+def test_export_csv_and_small_pages(export_setup):
+    client = export_setup["client"]
+    resp = client.get("/app/ledger/movements/export", params={"format": "csv"})
+    assert resp.status_code == 200, resp.text
+    assert dict(resp.headers)["content-type"].startswith("text/csv")
+    table = list(csv.DictReader(io.StringIO(resp.text)))
+    assert len(table) == 12
+    assert table[0]["item_id"] == str(export_setup["a"])
+
+    from core.appdb.movement_export import MovementQuery, iter_movements
+
+    pages = list(iter_movements(export_setup["session"], MovementQuery(limit=8), page_size=3))
+    assert [len(p) for p in pages] == [3, 3, 2]
+    ids = [r["id"] for p in pages for r in p]
+    assert ids == sorted(ids) and len(set(ids)) == 8
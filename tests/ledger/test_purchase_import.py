@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import json
+
+from sqlalchemy import func, select
+
+
+def test_csv_import_converts_units_and_reports_bad_rows(ledger_app):
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    bolts = ledger_app["make_item"]("Bolts")
+    with ledger_app["session"]() as db:
+        rope = models.Item(name="Rope", uom="m", dimension="length", qty_stored=0)
+        db.add(rope)
+        db.commit()
+        rope_id = rope.id
+
+    body = "\n".join(
+        [
+            "item_id,qty,uom,unit_cost_cents,source_id",
+            f"{bolts},10,,5,inv-1",
+            f"{rope_id},1.5,m,2,inv-1",
+            f"{rope_id},2,kg,2,inv-1",
+            "999,1,,1,inv-1",
+            f"{bolts},-3,,1,inv-1",
+            f"{bolts},4,ea,7,inv-1",
+        ]
+    )
+    resp = client.post(
+        "/app/ledger/purchase/import", content=body.encode(), headers={"Content-Type": "text/csv"}
+    )
+    assert resp.status_code == 200, resp.text
+    result = resp.json()
+    assert result["imported"] == 3
+    assert result["failed"] == 3
+    assert [e["line"] for e in result["errors"]] == [4, 5, 6]
+    assert result["errors"][1]["error"] == "item_not_found"
+
+    with ledger_app["session"]() as db:
+        assert db.get(models.Item, bolts).qty_stored == 14
+        assert db.get(models.Item, rope_id).qty_stored == 1500
+        assert db.get(models.ItemStockSummary, bolts).total_value_cents == 10 * 5 + 4 * 7
+        assert db.execute(select(func.count(models.ItemMovement.id))).scalar_one() == 3
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def test_ndjson_import_commits_in_chunks(ledger_app):
+    from core.appdb.purchase_import import import_purchases
+
+    models = ledger_app["models"]
+    item_id = ledger_app["make_item"]("Widget")
+    rows = [(n, {"item_id": item_id, "qty": 1, "unit_cost_cents": n}) for n in range(1, 26)]
+    rows.insert(3, (99, ValueError))  # not a dict: rejected, not fatal
+
+    with ledger_app["session"]() as db:
+        result = import_purchases(db, iter(rows), chunk_size=10)
+    assert (result.imported, result.failed, result.chunks) == (25, 1, 3)
+
+    resp = ledger_app["client"].post(
+        "/app/ledger/purchase/import",
+        params={"format": "ndjson"},
+        content=(json.dumps({"item_id": item_id, "qty": "2"}) + "\n{oops\n").encode(),
+    )
+    body = resp.json()
+    assert body["imported"] == 1
+    assert body["errors"][0]["line"] == 2 and body["errors"][0]["error"].startswith("invalid_json")
+
+    with ledger_app["session"]() as db:
+        assert db.get(models.ItemStockSummary, item_id).on_hand == 27
+        assert db.get(models.ItemStockSummary, item_id).open_layer_count == 26
+
+
+def test_batch_committed_by_another_writer_mid_chunk_is_not_copied(ledger_app):
+    import threading
+
+    from sqlalchemy import event
+
+    from core.appdb.ledger import add_batch
+    from core.appdb.purchase_import import import_purchases
+
+    models = ledger_app["models"]
+    engine = ledger_app["engine"]
+    item_id = ledger_app["make_item"]("Bolts")
+    with ledger_app["session"]() as db:
+        add_batch(db, item_id, 1, 1, "purchase", None)  # the summary row now exists
+        db.commit()
+
+    other = threading.Thread(target=lambda: _commit_batch(ledger_app, add_batch, item_id), daemon=True)
+
+    def race(conn, cursor, statement, params, context, executemany):
+        if "max(item_batches.id)" in statement and other.ident is None:
+            # Give the other writer a chance to slip in after the high-water mark read.
+            other.start()
+            other.join(0.3)
+
+    event.listen(engine, "after_cursor_execute", race)
+    try:
+        with ledger_app["session"]() as db:
+            result = import_purchases(db, [(1, {"item_id": item_id, "qty": 5, "unit_cost_cents": 2})])
+        other.join(5)
+    finally:
+        event.remove(engine, "after_cursor_execute", race)
+    assert result.imported == 1
+
+    with ledger_app["session"]() as db:
+        batches = db.execute(select(func.count(models.ItemBatch.id))).scalar_one()
+        moves = db.execute(select(func.count(models.ItemMovement.id))).scalar_one()
+        assert (batches, moves) == (3, 3)
+        assert db.get(models.Item, item_id).qty_stored == 1 + 5 + 7
+    assert ledger_app["client"].get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def _commit_batch(ledger_app, add_batch, item_id):
+    from core.appdb.engine import write_session
+
+    with write_session(ledger_app["engine"]) as db:
+        add_batch(db, item_id, 7, 3, "purchase", None)
+        db.commit()
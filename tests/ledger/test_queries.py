@@ -0,0 +1,27 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+
+def test_prebuilt_statements_bind_per_call_and_reuse_compiled_sql(ledger_app):
+    from core.appdb import ledger, queries
+
+    client = ledger_app["client"]
+    a, b, c = (ledger_app["make_item"](name) for name in ("A", "B", "C"))
+    for item_id, qty in ((a, 3), (b, 5), (a, 4)):
+        client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": qty, "unit_cost_cents": 10})
+
+    engine = ledger_app["engine"]
+    with ledger_app["session"]() as db:
+        # Expanding ids: lists of different lengths share one statement.
+        assert ledger.on_hand_many(db, [a]) == {a: 7}
+        assert ledger.on_hand_qty(db, b) == 5
+        compiled = len(engine._compiled_cache)
+        assert ledger.on_hand_many(db, [a, b, c]) == {a: 7, b: 5, c: 0}
+        assert ledger.on_hand_qty(db, a) == 7
+        assert len(engine._compiled_cache) == compiled
+
+        layers = db.execute(queries.OPEN_LAYERS, {"item_ids": [b, a]}).scalars().all()
+        assert [(x.item_id, x.qty_remaining) for x in layers] == [(a, 3), (a, 4), (b, 5)]
+
+    body = client.get(f"/app/items/{a}").json()
+    assert [row["remaining_int"] for row in body["batches_summary"]] == [3, 4]
@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+
+def test_transactions_summary_reports_margin_and_waste_from_rollups(ledger_app):
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    mug = ledger_app["make_item"]("Mug")
+    with ledger_app["session"]() as db:
+        db.execute(update(models.Item).where(models.Item.id == mug).values(price=5.0))
+        db.commit()
+
+    client.post("/app/ledger/purchase", json={"item_id": mug, "qty": 10, "unit_cost_cents": 100})
+    client.post("/app/ledger/purchase", json={"item_id": mug, "qty": 10, "unit_cost_cents": 200})
+    for qty, reason in ((12, "sold"), (1, "loss")):
+        resp = client.post("/app/ledger/stock/out", json={"item_id": mug, "qty": qty, "reason": reason})
+        assert resp.status_code == 200, resp.text
+
+    s = client.get("/app/transactions/summary", params={"window": "30d"}).json()
+    assert s["totals"] == {"count": 5, "in": 20, "out": 13}
+    assert s["sales_cents"] == 6000
+    # 10 @ 100 + 2 @ 200 went out as sales, one more @ 200 as loss.
+    assert s["cogs_cents"] == 1400
+    assert s["margin_cents"] == 4600
+    assert s["waste"] == {"loss": 200, "theft": 0}
+    assert s["income"]["total_cents"] == 6000
+    assert s["expense"]["total_cents"] == 3000 + 200
+
+    items = client.get("/app/transactions", params={"limit": 10}).json()["items"]
+    assert {(i["type"], i["notes"], i["amount_cents"]) for i in items} == {
+        ("revenue", "sold", 6000),
+        ("expense", "loss", 200),
+        ("expense", "purchase", 3000),
+    }
+
+    # Only movements above the high-water mark are folded in on the next call.
+    client.post("/app/ledger/stock/out", json={"item_id": mug, "qty": 1, "reason": "sold"})
+    s = client.get("/app/transactions/summary").json()
+    assert s["sales_cents"] == 6500 and s["cogs_cents"] == 1600
+    assert s["totals"]["count"] == 6
+
+
+def test_transactions_summary_windows(ledger_app):
+    client = ledger_app["client"]
+    models = ledger_app["models"]
+    bolt = ledger_app["make_item"]("Bolt")
+    client.post("/app/ledger/purchase", json={"item_id": bolt, "qty": 5, "unit_cost_cents": 10})
+    client.post("/app/ledger/purchase", json={"item_id": bolt, "qty": 5, "unit_cost_cents": 10})
+    with ledger_app["session"]() as db:
+        first = db.query(models.ItemMovement.id).order_by(models.ItemMovement.id).first()[0]
+        db.execute(
+            update(models.ItemMovement)
+            .where(models.ItemMovement.id == first)
+            .values(created_at=datetime.utcnow() - timedelta(days=60))
+        )
+        db.commit()
+
+    assert client.get("/app/transactions/summary", params={"window": "30d"}).json()["totals"]["in"] == 5
+    assert client.get("/app/transactions/summary", params={"window": "90d"}).json()["totals"]["in"] == 10
+    assert client.get("/app/transactions/summary", params={"window": "week"}).status_code == 400
+    assert client.get("/app/transactions/summary", params={"window": "0d"}).status_code == 400
+
+
+def test_busy_writer_serves_the_stored_rollups_without_queueing(ledger_app):
+    import time
+
+    from core.appdb import engine as engine_mod
+
+    client = ledger_app["client"]
+    item_id = ledger_app["make_item"]("Widget")
+    client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": 5, "unit_cost_cents": 10})
+
+    owner = object()
+    assert engine_mod.WRITE_GATE.acquire(owner)
+    try:
+        start = time.perf_counter()
+        resp = client.get("/app/transactions/summary", params={"window": "30d"})
+        assert time.perf_counter() - start < engine_mod.WRITE_GATE.timeout / 2
+    finally:
+        engine_mod.WRITE_GATE.release(owner)
+    assert resp.status_code == 200
+    assert engine_mod.WRITE_GATE.stats()["waiting"] == 0
@@ -0,0 +1,51 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import threading
+
+from fastapi.testclient import TestClient
+
+
+def test_slow_manufacturing_run_does_not_stall_other_requests(ledger_app, monkeypatch):
+    base = ledger_app["client"]
+    make = ledger_app["make_item"]
+    wood, chair = make("Wood"), make("Chair")
+    base.post("/app/ledger/purchase", json={"item_id": wood, "qty": 5, "unit_cost_cents": 1})
+    items = [{"item_id": wood, "qty_required": 1}]
+    recipe = base.post("/app/recipes", json={"name": "Chair", "output_item_id": chair, "items": items}).json()["id"]
+
+    import core.api.routes.manufacturing as mfg_routes
+
+    entered, release = threading.Event(), threading.Event()
+    real = mfg_routes.execute_run_txn
+
+    def slow_execute(*args, **kwargs):
+        entered.set()
+        release.wait(10)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(mfg_routes, "execute_run_txn", slow_execute)
+
+    # One portal for the whole block, so every request shares one event loop.
+    with TestClient(base.app) as client:
+        # Startup rotates the session token; pick up the new one.
+        token = client.get("/session/token").json()["token"]
+        client.headers.update({"Cookie": f"bus_session={token}"})
+        result = {}
+
+        def run():
+            result["resp"] = client.post("/app/manufacturing/run", json={"recipe_id": recipe, "output_qty": 1})
+
+        worker = threading.Thread(target=run)
+        worker.start()
+        assert entered.wait(10)
+        try:
+            assert client.get("/health").status_code == 200
+            assert client.get("/app/items").status_code == 200
+            # Both answered while the run was still inside its commit.
+            assert not release.is_set() and worker.is_alive()
+        finally:
+            release.set()
+            worker.join(10)
+
+    assert result["resp"].status_code == 200, result["resp"].text
@@ -0,0 +1,77 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def summary_setup(ledger_app):
+    return dict(ledger_app, item_id=ledger_app["make_item"]("Widget"))
+
+
+def _summary(setup):
+    with setup["session"]() as db:
+        row = db.get(setup["models"].ItemStockSummary, setup["item_id"])
+        return None if row is None else {
+            "on_hand": row.on_hand,
+            "total_value_cents": row.total_value_cents,
+            "open_layer_count": row.open_layer_count,
+            "oldest_open_batch_id": row.oldest_open_batch_id,
+            "last_movement_id": row.last_movement_id,
+        }
+
+
+def test_summary_tracks_purchases_and_fifo_consumption(summary_setup):
+    client = summary_setup["client"]
+    item_id = summary_setup["item_id"]
+
+    first = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": 5, "unit_cost_cents": 10})
+    second = client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": 5, "unit_cost_cents": 20})
+    assert first.status_code == 200, first.text
+    first_batch, second_batch = first.json()["batch_id"], second.json()["batch_id"]
+
+    summary = _summary(summary_setup)
+    assert summary["on_hand"] == 10
+    assert summary["total_value_cents"] == 150
+    assert summary["open_layer_count"] == 2
+    assert summary["oldest_open_batch_id"] == first_batch
+
+    resp = client.post("/app/ledger/consume", json={"item_id": item_id, "qty": 7})
+    assert resp.status_code == 200, resp.text
+
+    summary = _summary(summary_setup)
+    assert summary["on_hand"] == 3
+    assert summary["total_value_cents"] == 60
+    assert summary["open_layer_count"] == 1
+    assert summary["oldest_open_batch_id"] == second_batch
+
+    with summary_setup["session"]() as db:
+        from sqlalchemy import func, select
+
+        last_move = db.execute(select(func.max(summary_setup["models"].ItemMovement.id))).scalar_one()
+    assert summary["last_movement_id"] == last_move
+
+    resp = client.get("/app/ledger/valuation", params={"item_id": item_id})
+    assert resp.json()["total_value_cents"] == 60
+
+    resp = client.get("/app/ledger/summary/verify")
+    assert resp.json() == {"ok": True, "problems": []}
+
+
+def test_summary_verify_detects_drift_and_rebuild_repairs(summary_setup):
+    client = summary_setup["client"]
+    item_id = summary_setup["item_id"]
+
+    client.post("/app/ledger/purchase", json={"item_id": item_id, "qty": 4, "unit_cost_cents": 25})
+
+    with summary_setup["session"]() as db:
+        db.get(summary_setup["models"].ItemStockSummary, item_id).on_hand = 99
+        db.commit()
+
+    body = client.get("/app/ledger/summary/verify").json()
+    assert body["ok"] is False
+    assert body["problems"][0]["fields"]["on_hand"] == {"expected": 4, "stored": 99}
+
+    assert client.post("/app/ledger/summary/rebuild").json() == {"ok": True, "items": 1}
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+    assert _summary(summary_setup)["on_hand"] == 4
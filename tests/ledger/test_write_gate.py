@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+def test_writers_queue_on_the_gate_and_wait_is_reported(ledger_app):
+    from core.appdb import engine as engine_mod
+
+    models = ledger_app["models"]
+    ledger_app["make_item"]("Seed")
+    session = ledger_app["session"]
+    first = session()
+    first.add(models.Item(name="A", uom="ea", qty_stored=0))
+    first.flush()  # holds the gate until commit
+    assert engine_mod.WRITE_GATE.stats()["held"]
+
+    done = threading.Event()
+
+    def second_writer():
+        with session() as db:
+            db.add(models.Item(name="B", uom="ea", qty_stored=0))
+            db.commit()
+        done.set()
+
+    worker = threading.Thread(target=second_writer)
+    worker.start()
+    deadline = time.time() + 5
+    while engine_mod.WRITE_GATE.stats()["waiting"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert engine_mod.WRITE_GATE.stats()["waiting"] == 1
+    time.sleep(0.05)
+    assert not done.is_set()
+    first.commit()
+    first.close()
+    worker.join(5)
+    assert done.is_set()
+
+    stats = ledger_app["client"].get("/dev/db/stats").json()["write_gate"]
+    assert stats["contended"] >= 1 and stats["wait_ms_max"] >= 50
+    assert stats["waiting"] == 0 and not stats["held"]
+
+
+def test_gate_timeout_surfaces_as_database_locked(ledger_app, monkeypatch):
+    from core.appdb import engine as engine_mod
+
+    models = ledger_app["models"]
+    session = ledger_app["session"]
+    ledger_app["make_item"]("Seed")
+    monkeypatch.setattr(engine_mod.WRITE_GATE, "timeout", 0.1)
+    holder = session()
+    holder.add(models.Item(name="A", uom="ea", qty_stored=0))
+    holder.flush()
+    try:
+        with session() as db:
+            db.add(models.Item(name="B", uom="ea", qty_stored=0))
+            with pytest.raises(OperationalError, match="locked"):
+                db.flush()
+    finally:
+        holder.rollback()
+        holder.close()
+    # Rolling back handed the gate on.
+    assert not engine_mod.WRITE_GATE.stats()["held"]
+    assert engine_mod.WRITE_GATE.stats()["timeouts"] == 1
+
+
+def test_get_routes_read_through_read_only_connections(ledger_app):
+    from core.appdb import engine as engine_mod
+
+    client = ledger_app["client"]
+    item = ledger_app["make_item"]("Widget")
+    assert client.get(f"/app/items/{item}").status_code == 200
+    with engine_mod.get_read_engine().connect() as conn:
+        assert conn.execute(text("SELECT name FROM items WHERE id = :i"), {"i": item}).scalar() == "Widget"
+        with pytest.raises(OperationalError, match="readonly"):
+            conn.execute(text("UPDATE items SET name = 'x'"))
+
+
+def test_writer_sessions_hold_the_gate_from_their_first_read(ledger_app):
+    from core.appdb import engine as engine_mod
+
+    item = ledger_app["make_item"]("Widget")
+    models = ledger_app["models"]
+    writer = engine_mod.write_session()
+    refresher = engine_mod.SessionLocal(bind=engine_mod.get_engine())
+    try:
+        refresher.get(models.Item, item)
+        # A plain session reads without the gate...
+        assert not engine_mod.WRITE_GATE.stats()["held"]
+        writer.get(models.Item, item)
+        # ...a writer takes it before the read its writes may depend on.
+        assert engine_mod.WRITE_GATE.stats()["held"]
+        writer.commit()
+        assert not engine_mod.WRITE_GATE.stats()["held"]
+    finally:
+        writer.close()
+        refresher.close()
+    assert not engine_mod.WRITE_GATE.stats()["held"]
@@ -0,0 +1,39 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def buy(ledger_app):
+    """``buy(item_id, qty, unit_cost_cents)`` through the purchase route."""
+    client = ledger_app["client"]
+
+    def _buy(item_id, qty, unit_cost_cents=1):
+        resp = client.post(
+            "/app/ledger/purchase", json={"item_id": item_id, "qty": qty, "unit_cost_cents": unit_cost_cents}
+        )
+        assert resp.status_code == 200, resp.text
+
+    return _buy
+
+
+@pytest.fixture()
+def make_recipe(ledger_app):
+    """``make_recipe(name, output_item_id, lines)`` -> recipe id.
+
+    ``lines`` are ``(item_id, qty_required)`` pairs, sorted in the order
+    given, or full recipe item dicts.
+    """
+    client = ledger_app["client"]
+
+    def _make_recipe(name, output_id, lines):
+        items = [
+            line if isinstance(line, dict) else {"item_id": line[0], "qty_required": line[1], "sort": n}
+            for n, line in enumerate(lines)
+        ]
+        resp = client.post("/app/recipes", json={"name": name, "output_item_id": output_id, "items": items})
+        assert resp.status_code == 200, resp.text
+        return resp.json()["id"]
+
+    return _make_recipe
@@ -0,0 +1,64 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def recipe_setup(ledger_app, buy, make_recipe):
+    parts = [ledger_app["make_item"](name) for name in ("Bolt", "Nut")]
+    output_id = ledger_app["make_item"]("Bracket")
+    for item_id in parts:
+        buy(item_id, 20, 5)
+    recipe_id = make_recipe("Bracket", output_id, [(parts[0], 2), (parts[1], 1)])
+    return dict(ledger_app, parts=parts, output_id=output_id, recipe_id=recipe_id)
+
+
+def test_detail_and_runs_use_compiled_recipe(recipe_setup):
+    client = recipe_setup["client"]
+    recipe_id = recipe_setup["recipe_id"]
+    bolt, nut = recipe_setup["parts"]
+
+    from core.manufacturing import bom
+
+    detail = client.get(f"/app/recipes/{recipe_id}").json()
+    assert [(i["item_id"], i["qty_required"]) for i in detail["items"]] == [(bolt, 2), (nut, 1)]
+    assert detail["items"][0]["item"] == {"id": bolt, "name": "Bolt", "uom": "ea", "qty_stored": 20}
+    assert detail["output_item"]["name"] == "Bracket"
+    compiled = bom._cache[recipe_id]
+
+    run = client.post("/app/manufacturing/run", json={"recipe_id": recipe_id, "output_qty": 3})
+    assert run.status_code == 200, run.text
+    assert bom._cache[recipe_id] is compiled
+
+    # qty_stored is live even though the recipe is cached.
+    detail = client.get(f"/app/recipes/{recipe_id}").json()
+    assert detail["items"][0]["item"]["qty_stored"] == 14
+    assert detail["output_item"]["qty_stored"] == 3
+
+
+def test_update_and_item_rename_invalidate(recipe_setup):
+    client = recipe_setup["client"]
+    recipe_id = recipe_setup["recipe_id"]
+    bolt, nut = recipe_setup["parts"]
+    client.get(f"/app/recipes/{recipe_id}")
+
+    resp = client.put(
+        f"/app/recipes/{recipe_id}",
+        json={"items": [{"item_id": nut, "qty_required": 4}]},
+    )
+    assert resp.status_code == 200, resp.text
+    assert [(i["item_id"], i["qty_required"]) for i in resp.json()["items"]] == [(nut, 4)]
+
+    run = client.post("/app/manufacturing/run", json={"recipe_id": recipe_id, "output_qty": 1})
+    assert run.status_code == 200, run.text
+    assert run.json()["output_unit_cost_cents"] == 4 * 5
+
+    assert client.put(f"/app/items/{nut}", json={"name": "Hex nut"}).status_code == 200
+    detail = client.get(f"/app/recipes/{recipe_id}").json()
+    assert detail["items"][0]["item"]["name"] == "Hex nut"
+
+    assert client.delete(f"/app/recipes/{recipe_id}").status_code == 200
+    from core.manufacturing import bom
+
+    assert recipe_id not in bom._cache
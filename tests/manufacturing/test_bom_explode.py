@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def tree_setup(ledger_app, buy, make_recipe):
+    make = ledger_app["make_item"]
+    steel, bolt, bracket, frame = (make(n) for n in ("Steel", "Bolt", "Bracket", "Frame"))
+    for item_id, qty, cost in ((steel, 10, 10), (bolt, 8, 5), (bracket, 1, 30)):
+        buy(item_id, qty, cost)
+    bracket_recipe = make_recipe("Bracket", bracket, [(steel, 2)])
+    frame_recipe = make_recipe("Frame", frame, [(bracket, 3), (bolt, 4)])
+    return dict(
+        ledger_app,
+        make_recipe=make_recipe,
+        steel=steel,
+        bolt=bolt,
+        bracket=bracket,
+        frame=frame,
+        frame_recipe=frame_recipe,
+        bracket_recipe=bracket_recipe,
+    )
+
+
+def test_exploded_run_builds_sub_assemblies_in_one_transaction(tree_setup):
+    client = tree_setup["client"]
+    recipe_id = tree_setup["frame_recipe"]
+
+    flat = client.post("/app/manufacturing/run", json={"recipe_id": recipe_id, "output_qty": 1})
+    assert flat.status_code == 400
+
+    preview = client.post("/app/manufacturing/preview", json={"recipe_id": recipe_id, "output_qty": 1, "explode": True})
+    plan = preview.json()
+    assert plan["ok"] is True and plan["builds"] == 2
+    child = plan["tree"]["children"][0]
+    assert (child["recipe_id"], child["output_qty"], child["per_output_cents"]) == (
+        tree_setup["bracket_recipe"],
+        2,
+        20,
+    )
+    # 1 stocked bracket @30 + 2 built @20, plus 4 bolts @5
+    assert plan["tree"]["per_output_cents"] == 30 + 2 * 20 + 4 * 5
+
+    run = client.post("/app/manufacturing/run", json={"recipe_id": recipe_id, "output_qty": 1, "explode": True})
+    assert run.status_code == 200, run.text
+    body = run.json()
+    assert body["output_unit_cost_cents"] == plan["tree"]["per_output_cents"]
+    assert len(body["sub_run_ids"]) == 1
+
+    models = tree_setup["models"]
+    with tree_setup["session"]() as db:
+        stored = {i.id: i.qty_stored for i in db.query(models.Item)}
+    assert stored[tree_setup["steel"]] == 6
+    assert stored[tree_setup["bracket"]] == 0
+    assert stored[tree_setup["frame"]] == 1
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def test_cycles_and_leaf_shortages_are_reported(tree_setup):
+    client = tree_setup["client"]
+    make = tree_setup["make_item"]
+    p, q = make("P"), make("Q")
+    x = tree_setup["make_recipe"]("X", p, [(q, 1)])
+    y = tree_setup["make_recipe"]("Y", q, [(p, 1)])
+
+    resp = client.post("/app/manufacturing/run", json={"recipe_id": x, "output_qty": 1, "explode": True})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == {"error": "bom_cycle", "cycle": [x, y, x]}
+
+    short = client.post(
+        "/app/manufacturing/run", json={"recipe_id": tree_setup["frame_recipe"], "output_qty": 5, "explode": True}
+    )
+    assert short.status_code == 400
+    detail = short.json()["detail"]
+    assert detail["error"] == "insufficient_stock"
+    assert {s["component"] for s in detail["shortages"]} == {tree_setup["steel"], tree_setup["bolt"]}
@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def capacity_setup(ledger_app, buy, make_recipe):
+    make = ledger_app["make_item"]
+    wood, glue, screw, chair, table = (make(n) for n in ("Wood", "Glue", "Screw", "Chair", "Table"))
+    for item_id, qty in ((wood, 20), (glue, 3), (screw, 50)):
+        buy(item_id, qty)
+
+    chair_r = make_recipe(
+        "Chair",
+        chair,
+        [
+            {"item_id": wood, "qty_required": 4},
+            {"item_id": screw, "qty_required": 8},
+            {"item_id": glue, "qty_required": 5, "optional": True},
+        ],
+    )
+    table_r = make_recipe("Table", table, [(wood, 6), (glue, 1)])
+    return dict(ledger_app, wood=wood, glue=glue, screw=screw, chair_r=chair_r, table_r=table_r)
+
+
+def test_capacity_per_recipe_names_the_limiting_component(capacity_setup):
+    client = capacity_setup["client"]
+    body = client.get("/app/manufacturing/capacity").json()
+    by_id = {r["recipe_id"]: r for r in body["recipes"]}
+
+    chair = by_id[capacity_setup["chair_r"]]
+    assert (chair["max_units"], chair["limiting_item_id"]) == (5, capacity_setup["wood"])
+    assert {c["item_id"] for c in chair["components"]} == {capacity_setup["wood"], capacity_setup["screw"]}
+
+    table = by_id[capacity_setup["table_r"]]
+    assert (table["max_units"], table["limiting_item_id"]) == (3, capacity_setup["wood"])
+
+    # Capacity agrees with an actual run: 5 chairs go through, a 6th would not.
+    run = client.post("/app/manufacturing/run", json={"recipe_id": capacity_setup["chair_r"], "output_qty": 5})
+    assert run.status_code == 200, run.text
+    after = {r["recipe_id"]: r for r in client.get("/app/manufacturing/capacity").json()["recipes"]}
+    assert after[capacity_setup["chair_r"]]["max_units"] == 0
+
+
+def test_mix_capacity_shares_stock(capacity_setup):
+    client = capacity_setup["client"]
+    mix = {
+        "mix": [
+            {"recipe_id": capacity_setup["chair_r"], "qty": 2},
+            {"recipe_id": capacity_setup["table_r"], "qty": 1},
+        ]
+    }
+    body = client.post("/app/manufacturing/capacity", json=mix).json()
+    # One kit needs 2*4 + 6 = 14 wood; 20 wood covers one kit.
+    assert body["kits"] == 1
+    assert body["feasible"] is True
+    assert body["limiting_item_id"] == capacity_setup["wood"]
+    wood = next(i for i in body["items"] if i["item_id"] == capacity_setup["wood"])
+    assert (wood["per_kit"], wood["remaining"]) == (14.0, 6.0)
+
+    missing = client.post("/app/manufacturing/capacity", json={"mix": [{"recipe_id": 999, "qty": 1}]})
+    assert missing.status_code == 404
@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture()
+def jobs_setup(ledger_app, buy, make_recipe):
+    make = ledger_app["make_item"]
+    wood, chair = make("Wood"), make("Chair")
+    buy(wood, 5, 3)
+    recipe = make_recipe("Chair", chair, [(wood, 2)])
+    return dict(ledger_app, wood=wood, chair=chair, recipe=recipe)
+
+
+def _wait(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/app/manufacturing/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_jobs_run_in_order_and_report_cost(jobs_setup):
+    client = jobs_setup["client"]
+    queued = [
+        client.post("/app/manufacturing/jobs", json={"recipe_id": jobs_setup["recipe"], "output_qty": 2})
+        for _ in range(2)
+    ]
+    assert [r.status_code for r in queued] == [202, 202]
+    first, second = (_wait(client, r.json()["id"]) for r in queued)
+
+    assert first["status"] == "completed"
+    assert first["output_unit_cost_cents"] == 6
+    assert first["allocations"][0]["qty"] == 4
+    # Only one wood left for the second job.
+    assert second["status"] == "failed"
+    assert second["error"] == {"error": "insufficient_stock"}
+    assert second["shortages"][0]["item_id"] == jobs_setup["wood"]
+    assert second["run_id"] is not None
+
+    assert client.get("/app/manufacturing/jobs/999").status_code == 404
+    bad = client.post("/app/manufacturing/jobs", json={"recipe_id": 999, "output_qty": 1})
+    assert bad.status_code == 404
+
+
+def test_queued_jobs_survive_a_restart(jobs_setup):
+    models = jobs_setup["models"]
+    payload = json.dumps({"recipe_id": jobs_setup["recipe"], "output_qty": 1})
+    with jobs_setup["session"]() as db:
+        # One job was mid-flight when the process died, one never started.
+        db.add_all(
+            [
+                models.ManufacturingJob(status="running", payload=payload),
+                models.ManufacturingJob(status="queued", payload=payload),
+            ]
+        )
+        db.commit()
+
+    import core.api.routes.manufacturing as mfg_routes
+
+    mfg_routes.resume_jobs()
+    client = jobs_setup["client"]
+    assert [_wait(client, i)["status"] for i in (1, 2)] == ["completed", "completed"]
+    with jobs_setup["session"]() as db:
+        assert db.get(models.Item, jobs_setup["chair"]).qty_stored == 2
+
+
+def test_resume_without_a_jobs_table_does_not_stop_startup(jobs_setup):
+    with jobs_setup["session"]() as db:
+        db.execute(text("DROP TABLE manufacturing_jobs"))
+        db.commit()
+
+    import core.api.routes.manufacturing as mfg_routes
+
+    mfg_routes.resume_jobs()
@@ -0,0 +1,40 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+
+def _costs(client):
+    return {r["id"]: r for r in client.get("/app/recipes").json()}
+
+
+def test_projected_costs_follow_fifo_and_refresh_only_affected_recipes(ledger_app, buy, make_recipe):
+    client = ledger_app["client"]
+    make = ledger_app["make_item"]
+    wood, paint, chair, sign = make("Wood"), make("Paint"), make("Chair"), make("Sign")
+
+    buy(wood, 4, 10)
+    buy(wood, 10, 20)
+    buy(paint, 5, 7)
+    chair_r = make_recipe("Chair", chair, [(wood, 6)])
+    sign_r = make_recipe("Sign", sign, [(paint, 1)])
+
+    listed = _costs(client)
+    # 4 @10 + 2 @20
+    assert (listed[chair_r]["cost_inputs_cents"], listed[chair_r]["unit_cost_cents"]) == (80, 80)
+    assert listed[chair_r]["cost_complete"] is True
+    assert listed[sign_r]["unit_cost_cents"] == 7
+
+    from core.manufacturing import costs
+
+    sign_entry = costs._cache[sign_r]
+    run = client.post("/app/manufacturing/run", json={"recipe_id": chair_r, "output_qty": 1})
+    assert run.status_code == 200, run.text
+    assert chair_r not in costs._cache
+    assert costs._cache[sign_r] is sign_entry
+
+    # 8 wood @20 left.
+    assert _costs(client)[chair_r]["unit_cost_cents"] == 120
+    run = client.post("/app/manufacturing/run", json={"recipe_id": chair_r, "output_qty": 1})
+    assert run.status_code == 200, run.text
+    short = _costs(client)[chair_r]
+    # 2 wood on hand; the missing 4 are priced at the newest layer.
+    assert (short["unit_cost_cents"], short["cost_complete"]) == (120, False)
@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+
+def test_run_history_pages_and_filters_from_the_table(ledger_app, buy, make_recipe):
+    client = ledger_app["client"]
+    make = ledger_app["make_item"]
+    wood, chair, stool = make("Wood"), make("Chair"), make("Stool")
+    buy(wood, 100)
+
+    chair_r, stool_r = make_recipe("Chair", chair, [(wood, 1)]), make_recipe("Stool", stool, [(wood, 1)])
+    run_ids = []
+    for rid in (chair_r, stool_r, chair_r, chair_r, stool_r):
+        resp = client.post("/app/manufacturing/run", json={"recipe_id": rid, "output_qty": 1})
+        assert resp.status_code == 200, resp.text
+        run_ids.append(resp.json()["run_id"])
+    # A failed run never shows up in history.
+    client.post("/app/manufacturing/run", json={"recipe_id": chair_r, "output_qty": 1000})
+
+    models = ledger_app["models"]
+    base = datetime.utcnow() - timedelta(hours=1)
+    with ledger_app["session"]() as db:
+        for n, run_id in enumerate(run_ids):
+            db.execute(
+                update(models.ManufacturingRun)
+                .where(models.ManufacturingRun.id == run_id)
+                .values(executed_at=base + timedelta(minutes=n // 2))
+            )
+        # Outside the default 30-day window.
+        db.execute(
+            update(models.ManufacturingRun)
+            .where(models.ManufacturingRun.id == run_ids[0])
+            .values(executed_at=base - timedelta(days=40))
+        )
+        db.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get("/app/manufacturing/runs", params=params).json()
+        seen.extend(r["run_id"] for r in page["runs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [run_ids[4], run_ids[3], run_ids[2], run_ids[1]]
+
+    first = client.get("/app/manufacturing/history").json()["runs"][0]
+    assert first["recipe_name"] == "Stool" and first["timestamp"].endswith("Z")
+
+    chairs = client.get("/app/manufacturing/runs", params={"recipe_id": chair_r, "days": 365}).json()["runs"]
+    assert [r["run_id"] for r in chairs] == [run_ids[3], run_ids[2], run_ids[0]]
+    stools = client.get("/app/manufacturing/runs", params={"output_item_id": stool}).json()["runs"]
+    assert {r["run_id"] for r in stools} == {run_ids[1], run_ids[4]}
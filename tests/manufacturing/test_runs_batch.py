@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture()
+def batch_setup(ledger_app, buy, make_recipe):
+    make = ledger_app["make_item"]
+    steel, bolt, bracket, frame = (make(n) for n in ("Steel", "Bolt", "Bracket", "Frame"))
+    for item_id, qty, cost in ((steel, 10, 10), (bolt, 4, 5)):
+        buy(item_id, qty, cost)
+
+    bracket_r = make_recipe("Bracket", bracket, [(steel, 2)])
+    frame_r = make_recipe("Frame", frame, [(bracket, 2), (bolt, 4)])
+    return dict(ledger_app, steel=steel, bolt=bolt, bracket=bracket, frame=frame, bracket_r=bracket_r, frame_r=frame_r)
+
+
+def _stored(setup):
+    models = setup["models"]
+    with setup["session"]() as db:
+        return {i.id: i.qty_stored for i in db.query(models.Item)}
+
+
+def test_batch_runs_see_earlier_outputs_and_fail_independently(batch_setup):
+    client = batch_setup["client"]
+    runs = [
+        {"recipe_id": batch_setup["bracket_r"], "output_qty": 2},
+        # Uses the brackets made by the run before it.
+        {"recipe_id": batch_setup["frame_r"], "output_qty": 1},
+        # Bolts are gone after the frame.
+        {"recipe_id": batch_setup["frame_r"], "output_qty": 1},
+        {"recipe_id": 9999, "output_qty": 1},
+    ]
+    resp = client.post("/app/manufacturing/runs/batch", json={"runs": runs})
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["ok"] is False and body["completed"] == 2
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["completed", "completed", "failed_insufficient_stock", "invalid"]
+    assert body["results"][1]["output_unit_cost_cents"] == 2 * 20 + 4 * 5
+    assert {s["component"] for s in body["results"][2]["shortages"]} == {batch_setup["bracket"], batch_setup["bolt"]}
+    assert body["results"][2]["run_id"] is not None
+
+    stored = _stored(batch_setup)
+    assert stored[batch_setup["steel"]] == 6
+    assert stored[batch_setup["bracket"]] == 0
+    assert stored[batch_setup["frame"]] == 1
+    assert client.get("/app/ledger/summary/verify").json()["ok"] is True
+
+
+def test_atomic_batch_rejects_everything_on_one_failure(batch_setup):
+    client = batch_setup["client"]
+    runs = [
+        {"recipe_id": batch_setup["bracket_r"], "output_qty": 2},
+        {"recipe_id": batch_setup["frame_r"], "output_qty": 2},
+    ]
+    resp = client.post("/app/manufacturing/runs/batch", json={"runs": runs, "atomic": True})
+    assert resp.status_code == 400
+    detail = resp.json()["detail"]
+    assert detail["error"] == "batch_rejected"
+    assert [r["status"] for r in detail["results"]] == ["not_run", "failed_insufficient_stock"]
+    assert "run_id" not in detail["results"][1] and detail["results"][1]["shortages"]
+    assert _stored(batch_setup)[batch_setup["steel"]] == 10
+    # Nothing happened, so no failed-run rows were written either.
+    with batch_setup["session"]() as db:
+        assert db.query(batch_setup["models"].ManufacturingRun).count() == 0
+
+    runs[1]["output_qty"] = 1
+    resp = client.post("/app/manufacturing/runs/batch", json={"runs": runs, "atomic": True})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["ok"] is True
+    stored = _stored(batch_setup)
+    assert (stored[batch_setup["steel"]], stored[batch_setup["frame"]]) == (6, 1)
@@ -16,7 +16,6 @@ import asyncio
 from fastapi import APIRouter, Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
-from sqlalchemy import text
 from sqlalchemy.orm import Session
 from starlette.staticfiles import StaticFiles
 
@@ -26,9 +25,9 @@ from core.api.routes.recipes import router as recipes_router
 from core.api.routes.ledger_api import router as ledger_router
 from core.api.utils.devguard import require_dev
 from core.appdb.engine import DB_PATH as DB_FILE, get_engine, get_session
-from core.appdb.ensure import DB_PATH as ACTIVE_DB_PATH, ensure_schema
+from core.appdb.engine import DB_PATH as ACTIVE_DB_PATH
 from core.appdb.paths import ui_dir
-from core.appdb.migrate import ensure_vendors_flags
+from core.appdb.migrate import run_migrations
 from core.config.paths import APP_DIR, BUS_ROOT, DATA_DIR, JOURNALS_DIR
 from core.config.writes import require_writes
 from core.services.capabilities import registry
@@ -87,10 +86,6 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
 
 
 app = FastAPI(title="BUS Core Alpha", version=VERSION, lifespan=lifespan)
-try:
-    ensure_schema()
-except Exception:
-    pass
 
 app.mount("/ui", StaticFiles(directory="core/ui", html=True), name="ui")
 app.mount("/brand", StaticFiles(directory=str(REPO_ROOT)), name="brand")
@@ -190,63 +185,9 @@ if DEV_MODE:
 
 # ---- DB helpers ----
 
-def _ensure_schema_upgrades(db: Session) -> None:
-    def _col_exists(table: str, col: str) -> bool:
-        rows = db.execute(text(f"PRAGMA table_info('{table}')")).fetchall()
-        return any(r[1] == col for r in rows)
-
-    def _ensure_column(table: str, column: str, ddl: str) -> None:
-        if not _col_exists(table, column):
-            db.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
-
-    if not _col_exists("vendors", "role"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN role TEXT DEFAULT 'contact'"))
-    if not _col_exists("vendors", "kind"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN kind TEXT DEFAULT 'org'"))
-    if not _col_exists("vendors", "organization_id"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN organization_id INTEGER"))
-    if not _col_exists("vendors", "meta"):
-        db.execute(text("ALTER TABLE vendors ADD COLUMN meta TEXT"))
-
-    _ensure_column("items", "item_type", "item_type TEXT DEFAULT 'product'")
-    _ensure_column("items", "location", "location TEXT")
-
-    db.execute(text("UPDATE vendors SET role='vendor' WHERE role IS NULL"))
-    db.execute(text("UPDATE vendors SET kind='org' WHERE kind IS NULL"))
-    db.execute(text("UPDATE vendors SET meta='{}' WHERE meta IS NULL OR trim(meta)=''"))
-    db.execute(text("UPDATE items SET item_type='product' WHERE item_type IS NULL OR trim(item_type)=''"))
-
-    db.execute(text("CREATE INDEX IF NOT EXISTS vendors_role_idx ON vendors(role)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS vendors_kind_idx ON vendors(kind)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS vendors_org_idx  ON vendors(organization_id)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS items_item_type_idx ON items(item_type)"))
-
-    try:
-        idx_list = db.execute(text("PRAGMA index_list('vendors')")).fetchall()
-        for row in idx_list:
-            idx_name = row[1]
-            is_unique = bool(row[2])
-            if not is_unique:
-                continue
-            cols = db.execute(text(f"PRAGMA index_info('{idx_name}')")).fetchall()
-            col_names = [c[2] for c in cols]
-            if len(col_names) == 1 and col_names[0] == "name":
-                db.execute(text(f'DROP INDEX IF EXISTS "{idx_name}"'))
-        db.execute(text("CREATE INDEX IF NOT EXISTS ix_vendors_name ON vendors(name)"))
-    except Exception:
-        db.execute(text("DROP INDEX IF EXISTS ix_vendors_name"))
-        db.execute(text("CREATE INDEX IF NOT EXISTS ix_vendors_name ON vendors(name)"))
-
-    db.commit()
-
-
 def _run_startup_migrations() -> None:
-    ensure_vendors_flags(get_engine())
-    db = next(get_session())
-    try:
-        _ensure_schema_upgrades(db)
-    finally:
-        db.close()
+    report = run_migrations(get_engine())
+    print(f"[migrate] {report.summary()}")
 
 
 def get_db() -> Generator[Session, None, None]: